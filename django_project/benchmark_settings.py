@@ -0,0 +1,28 @@
+"""
+Settings for `manage.py benchmark_process_hotels`.
+
+Uses a throwaway SQLite database so the benchmark never touches the real
+hotels table:
+
+    python manage.py benchmark_process_hotels --settings=django_project.benchmark_settings
+"""
+import os
+import tempfile
+
+import django
+
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(tempfile.gettempdir(), 'process_hotels_benchmark.sqlite3'),
+        'OPTIONS': {'timeout': 30},
+    }
+}
+
+CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+# Take the write lock up front so concurrent workers wait instead of failing with "database is locked"
+if django.VERSION >= (5, 1):
+    DATABASES['default']['OPTIONS']['transaction_mode'] = 'IMMEDIATE'
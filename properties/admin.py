@@ -1,11 +1,110 @@
 # admin.py
 from django.contrib import admin
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from django.utils.text import Truncator
 from .models import Hotel, HotelSummary, HotelReview
 
+# Characters of long text shown per row in the changelists
+PREVIEW_LENGTH = 100
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that reads the planner's row estimate instead of COUNT(*) for whole tables.
+
+    Filtered or searched changelists, small tables and other databases still get exact counts.
+    """
+
+    # Below this many rows an exact count is cheap enough
+    EXACT_COUNT_BELOW = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = self.estimated_count(queryset)
+            if estimate is not None and estimate >= self.EXACT_COUNT_BELOW:
+                return estimate
+        return super().count
+
+    @staticmethod
+    def estimated_count(queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)",
+                [connection.ops.quote_name(queryset.model._meta.db_table)],
+            )
+            row = cursor.fetchone()
+        # reltuples is -1 (or 0) until the table has been vacuumed or analyzed
+        return row[0] if row and row[0] > 0 else None
+
+
+class CachedChoicesFilter(admin.SimpleListFilter):
+    """List filter on a model field whose choices are cached for an hour.
+
+    The default filter runs a SELECT DISTINCT over the whole table on every page load.
+    parameter_name is the field being filtered.
+    """
+
+    model = None
+    cache_seconds = 3600
+
+    def lookups(self, request, model_admin):
+        key = f"admin-filter:{self.model._meta.db_table}:{self.parameter_name}"
+        values = cache.get_or_set(key, self.distinct_values, self.cache_seconds)
+        return [(value, value) for value in values]
+
+    def distinct_values(self):
+        field = self.parameter_name
+        return list(
+            self.model.objects.exclude(**{f"{field}__isnull": True})
+            .order_by(field).values_list(field, flat=True).distinct()
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() is not None:
+            return queryset.filter(**{self.parameter_name: self.value()})
+        return queryset
+
+
+class CityFilter(CachedChoicesFilter):
+    title = 'city id'
+    parameter_name = 'city_id'
+    model = Hotel
+
+
+class RoomTypeFilter(CachedChoicesFilter):
+    title = 'room type'
+    parameter_name = 'room_type'
+    model = Hotel
+
+
+class ReviewRatingFilter(CachedChoicesFilter):
+    title = 'rating'
+    parameter_name = 'rating'
+    model = HotelReview
+
+
+def preview(text):
+    return Truncator(text or '').chars(PREVIEW_LENGTH)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist settings that keep page loads cheap on tables with millions of rows"""
+    paginator = EstimatedCountPaginator
+    # Skips the extra COUNT(*) of the whole table shown next to filtered results
+    show_full_result_count = False
+
+
 @admin.register(Hotel)
-class HotelAdmin(admin.ModelAdmin):
-    list_display = ('id','hotel_name', 'description')
-    list_filter = ('city_id', 'room_type')
+class HotelAdmin(LargeTableAdmin):
+    list_display = ('id','hotel_name', 'description_preview')
+    list_filter = (CityFilter, RoomTypeFilter)
     search_fields = ('hotel_name', 'hotel_address')
     readonly_fields = ('id', 'hotel_id')  # Since these are primary/foreign keys
     list_per_page = 25
@@ -26,13 +125,35 @@ class HotelAdmin(admin.ModelAdmin):
         })
     )
 
+    @admin.display(description='Description')
+    def description_preview(self, obj):
+        return preview(obj.description)
+
 @admin.register(HotelSummary)
-class HotelSummaryAdmin(admin.ModelAdmin):
-    list_display = ('property_id', 'summary')
+class HotelSummaryAdmin(LargeTableAdmin):
+    list_display = ('property_id', 'hotel_name', 'summary_preview')
+    list_select_related = ('hotel',)
     search_fields = ('hotel__hotel_name', 'summary')
 
+    @admin.display(description='Hotel', ordering='hotel__hotel_name')
+    def hotel_name(self, obj):
+        return obj.hotel.hotel_name
+
+    @admin.display(description='Summary')
+    def summary_preview(self, obj):
+        return preview(obj.summary)
+
 @admin.register(HotelReview)
-class HotelReviewAdmin(admin.ModelAdmin):
-    list_display = ('property_id', 'rating', 'review')
-    list_filter = ('rating',)
-    search_fields = ('hotel__hotel_name', 'review')
\ No newline at end of file
+class HotelReviewAdmin(LargeTableAdmin):
+    list_display = ('property_id', 'hotel_name', 'rating', 'review_preview')
+    list_filter = (ReviewRatingFilter,)
+    list_select_related = ('hotel',)
+    search_fields = ('hotel__hotel_name', 'review')
+
+    @admin.display(description='Hotel', ordering='hotel__hotel_name')
+    def hotel_name(self, obj):
+        return obj.hotel.hotel_name
+
+    @admin.display(description='Review')
+    def review_preview(self, obj):
+        return preview(obj.review)
@@ -0,0 +1,32 @@
+"""Cache keys for the read API, shared with the writer so new content invalidates them"""
+from django.core.cache import cache
+
+PREFIX = "hotel-api"
+
+
+def hotel_key(hotel_id):
+    return f"{PREFIX}:hotel:{hotel_id}"
+
+
+def city_version_key(city_id):
+    return f"{PREFIX}:city:{city_id}:version"
+
+
+def city_page_key(city_id, cursor, limit):
+    """Key of one list page; it changes whenever a hotel in the city is rewritten"""
+    version = cache.get_or_set(city_version_key(city_id), 1, timeout=None)
+    return f"{PREFIX}:city:{city_id}:v{version}:{cursor or ''}:{limit}"
+
+
+def invalidate_hotels(hotels):
+    """Drop cached responses for these hotels and the list pages of their cities"""
+    hotels = list(hotels)
+    if not hotels:
+        return
+    cache.delete_many([hotel_key(hotel.id) for hotel in hotels])
+    for city_id in {hotel.city_id for hotel in hotels}:
+        try:
+            cache.incr(city_version_key(city_id))
+        except ValueError:
+            # No page of this city has been cached yet
+            pass
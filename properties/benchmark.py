@@ -0,0 +1,154 @@
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class FakeOllamaServer:
+    """Local stand-in for the Ollama API that answers after a configurable latency"""
+
+    def __init__(self, latency=0.2, jitter=0.05, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def delay(self):
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def completion(self, payload):
+        """Return canned text shaped like what the real prompts ask for"""
+        prompt = payload.get("prompt", "")
+        if payload.get("format"):
+            return json.dumps({
+                "title": "Charming Stay in the City Centre",
+                "description": "A comfortable hotel close to the main sights.\nRooms are bright and quiet.",
+                "summary": "Central location, friendly staff and good value.",
+                "review": "Guests enjoyed the location and the clean rooms.",
+                "rating": 4.5,
+            })
+        if "review" in prompt:
+            return "Guests enjoyed the location and the clean rooms.\nRating: 4.5/5"
+        if "title" in prompt:
+            return "Charming Stay in the City Centre\nThis title captures the spirit of the hotel."
+        return "A comfortable hotel close to the main sights.\nRooms are bright, quiet and good value."
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; without this, Nagle's algorithm
+            # and delayed ACKs add ~40 ms to every keep-alive request
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                server.count_request()
+                if self.path == "/api/generate":
+                    self.generate(payload)
+                else:
+                    self.send_json({"status": "success"})
+
+            def send_json(self, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def generate(self, payload):
+                delay = server.delay()
+                text = server.completion(payload)
+                tokens = text.split(" ")
+                # Durations are reported in nanoseconds, like Ollama does
+                stats = {
+                    "done": True,
+                    "prompt_eval_count": len(payload.get("prompt", "").split()),
+                    "prompt_eval_duration": int(delay * 0.2 * 1e9),
+                    "eval_count": len(tokens),
+                    "eval_duration": int(delay * 0.8 * 1e9),
+                    "load_duration": 0,
+                    "total_duration": int(delay * 1e9),
+                }
+                if not payload.get("stream", True):
+                    time.sleep(delay)
+                    self.send_json({"response": text, **stats})
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                time.sleep(delay * 0.2)
+                try:
+                    for index, token in enumerate(tokens):
+                        token = token if index == 0 else " " + token
+                        self.write_line({"response": token, "done": False})
+                        time.sleep(delay * 0.8 / len(tokens))
+                    self.write_line({"response": "", **stats})
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client stopped reading early
+                    pass
+
+            def write_line(self, body):
+                self.wfile.write(json.dumps(body).encode("utf-8") + b"\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+class QueryCounter:
+    """Database execute wrapper that counts queries across every thread's connection"""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        return execute(sql, params, many, context)
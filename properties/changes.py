@@ -0,0 +1,131 @@
+"""Batches of hotels the scraper inserted or changed, read from the HotelChange log.
+
+Triggers on hotels (migration 0012) log each inserted hotel, and each update that changes
+a source field, then NOTIFY hotel_changes. ChangeFeed waits for the notification, or polls
+the log when it cannot LISTEN, and hands over a batch once no change has arrived for the
+debounce interval, once max_batch changes are waiting, or once the oldest waiting change is
+max_wait seconds old, so a scraper that never pauses still has its hotels processed.
+"""
+import select
+import time
+
+from django.db import connection, transaction
+
+from properties.models import HotelChange, HotelJob
+
+CHANNEL = "hotel_changes"
+
+
+def ready_changes():
+    """Logged changes, except those of hotels being processed right now.
+
+    A running job may already have read the hotel, so its changes wait until it finishes
+    and are then queued again.
+    """
+    running = HotelJob.objects.filter(status=HotelJob.RUNNING).values("hotel_id")
+    return HotelChange.objects.exclude(hotel_id__in=running)
+
+
+class ChangeFeed:
+    def __init__(self, debounce=2.0, max_batch=500, max_wait=30.0, poll_interval=5.0, listen=True):
+        self.debounce = debounce
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        self.listen = listen
+        self._listening_on = None
+
+    @property
+    def listening(self):
+        return self._listening_on is not None
+
+    def start(self):
+        """LISTEN on the current connection; the log is polled instead on databases without NOTIFY"""
+        if not self.listen or connection.vendor != "postgresql":
+            return False
+        connection.ensure_connection()
+        if not hasattr(connection.connection, "notifies"):
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANNEL}")
+        self._listening_on = connection.connection
+        return True
+
+    def wait(self, timeout):
+        """Sleep until a change is notified or timeout seconds pass"""
+        timeout = min(timeout, self.poll_interval)
+        if timeout <= 0:
+            return
+        if not self.listening:
+            time.sleep(timeout)
+            return
+        if connection.connection is not self._listening_on:
+            # Django reconnected, which dropped the LISTEN
+            self.start()
+        raw = connection.connection
+        # Notifications that arrived during the last query are already buffered
+        if not raw.notifies:
+            readable, _, _ = select.select([raw], [], [], timeout)
+            if readable:
+                raw.poll()
+        raw.notifies.clear()
+
+    def peek(self):
+        """Ids of up to max_batch waiting changes, newest first"""
+        return list(ready_changes().order_by("-id").values_list("id", flat=True)[:self.max_batch])
+
+    def claim(self):
+        """Remove the oldest max_batch waiting changes from the log and return their hotel ids.
+
+        Call inside a transaction, so the changes come back if queuing their hotels fails.
+        Locked rows are skipped, so several feeds can share the log.
+        """
+        rows = list(
+            ready_changes().select_for_update(skip_locked=True)
+            .order_by("id").values_list("id", "hotel_id")[:self.max_batch]
+        )
+        HotelChange.objects.filter(id__in=[change_id for change_id, _ in rows]).delete()
+        return list(dict.fromkeys(hotel_id for _, hotel_id in rows))
+
+    def run(self, handle, once=False):
+        """Call handle with each batch of changed hotel ids, in the transaction that claims them.
+
+        With once, everything waiting is handed over straight away and run returns when the
+        log is empty; otherwise it runs until interrupted.
+        """
+        self.start()
+        first_seen = newest = quiet_since = None
+        while True:
+            waiting = self.peek()
+            now = time.monotonic()
+            if not waiting:
+                if once:
+                    return
+                first_seen = newest = None
+                self.wait(self.poll_interval)
+                continue
+
+            if first_seen is None:
+                first_seen = now
+            if waiting[0] != newest:
+                newest, quiet_since = waiting[0], now
+            due = (
+                once
+                or len(waiting) >= self.max_batch
+                or now - quiet_since >= self.debounce
+                or now - first_seen >= self.max_wait
+            )
+            if not due:
+                self.wait(min(quiet_since + self.debounce, first_seen + self.max_wait) - now)
+                continue
+
+            with transaction.atomic():
+                hotel_ids = self.claim()
+                if hotel_ids:
+                    handle(hotel_ids)
+            if not hotel_ids:
+                # Another feed has locked these changes
+                self.wait(self.poll_interval)
+            elif len(waiting) < self.max_batch:
+                # Everything seen was claimed; the next change starts a new batch
+                first_seen = newest = None
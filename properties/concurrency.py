@@ -0,0 +1,97 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Slot:
+    """Outcome of one request made under a ConcurrencyLimiter slot"""
+
+    def __init__(self):
+        self.ok = True
+
+    def failed(self):
+        self.ok = False
+
+
+class ConcurrencyLimiter:
+    """Caps concurrent Ollama requests, optionally tuning the cap from observed latency.
+
+    With adaptive=True the limit follows AIMD: while every slot is in use, each successful
+    request raises it by 1/limit (about one per round of requests), and a failed request or
+    a recent latency above `tolerance` times the baseline cuts it by `backoff`. Latencies are
+    tracked per kind of prompt as a fast moving average (recent) and a slow one (baseline),
+    so single slow generations are not mistaken for queueing and the baseline follows
+    changes in model, hardware or prompt length.
+    """
+
+    def __init__(self, limit, adaptive=False, min_limit=1, max_limit=None,
+                 tolerance=1.5, backoff=0.75, baseline_smoothing=0.05, recent_smoothing=0.3):
+        self.max_limit = max(max_limit or limit, 1)
+        self.min_limit = min(max(min_limit, 1), self.max_limit)
+        self.limit = float(min(max(limit, self.min_limit), self.max_limit))
+        self.adaptive = adaptive
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.baseline_smoothing = baseline_smoothing
+        self.recent_smoothing = recent_smoothing
+        self.inflight = 0
+        self.peak = self.current
+        self.decreases = 0
+        self.baselines = {}
+        self.recent = {}
+        self._last_decrease = float("-inf")
+        self._condition = threading.Condition()
+
+    @property
+    def current(self):
+        return int(self.limit)
+
+    def acquire(self):
+        """Wait for a free slot and return the time the request started"""
+        with self._condition:
+            while self.inflight >= self.current:
+                self._condition.wait()
+            self.inflight += 1
+        return time.monotonic()
+
+    def release(self, started, key=None, ok=True):
+        latency = time.monotonic() - started
+        with self._condition:
+            saturated = self.inflight >= self.current
+            self.inflight -= 1
+            if self.adaptive:
+                self._adjust(started, latency, key, ok, saturated)
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, key=None):
+        """Hold a slot for one request; call failed() on the slot if the request did not succeed"""
+        slot = Slot()
+        started = self.acquire()
+        try:
+            yield slot
+        except Exception:
+            slot.failed()
+            raise
+        finally:
+            self.release(started, key, slot.ok)
+
+    def _adjust(self, started, latency, key, ok, saturated):
+        if ok:
+            baseline = self.baselines.get(key, latency)
+            recent = self.recent.get(key, latency)
+            self.baselines[key] = baseline = baseline + (latency - baseline) * self.baseline_smoothing
+            self.recent[key] = recent = recent + (latency - recent) * self.recent_smoothing
+            congested = recent > baseline * self.tolerance
+        else:
+            congested = True
+
+        if congested:
+            # Requests that started before the last cut ran under the old limit; one cut covers them
+            if started > self._last_decrease:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = time.monotonic()
+                self.decreases += 1
+        elif saturated and self.limit < self.max_limit:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.peak = max(self.peak, self.current)
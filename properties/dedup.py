@@ -0,0 +1,76 @@
+import re
+import threading
+from collections import OrderedDict
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def normalize(text):
+    """Lower-case text with punctuation and repeated whitespace removed"""
+    return " ".join(_PUNCTUATION.sub(" ", (text or "").lower()).split())
+
+
+def fingerprint(hotel, precision=4):
+    """Key shared by listings of the same property, whatever their price or room type.
+
+    Coordinates are rounded to `precision` decimals (about 11 m at the default).
+    """
+    coordinates = tuple(None if value is None else round(value, precision) for value in (hotel.lat, hotel.lng))
+    return (normalize(hotel.hotel_name), normalize(hotel.hotel_address)) + coordinates
+
+
+class DuplicateGroup:
+    """Hotels sharing a fingerprint; the first one generates and the rest reuse its result"""
+
+    def __init__(self):
+        self.result = None
+        self.calls = 0
+        self._done = threading.Event()
+
+    def publish(self, result, calls):
+        self.result = result
+        self.calls = calls
+        self._done.set()
+
+    def wait(self):
+        """Block until the leading hotel has been generated and return its result (None if it failed)"""
+        self._done.wait()
+        return self.result
+
+
+class DuplicateGroups:
+    """Groups hotels by fingerprint during a run so each group is only sent to the LLM once.
+
+    Groups are formed as hotels come through, across chunks and worker threads. The most
+    recent max_groups fingerprints are remembered.
+    """
+
+    def __init__(self, enabled=True, max_groups=10000):
+        self.enabled = enabled
+        self.max_groups = max_groups
+        self.reused = 0
+        self.calls_saved = 0
+        self._groups = OrderedDict()
+        self._lock = threading.Lock()
+
+    def join(self, key):
+        """Return the group for a key and whether the caller is its leader"""
+        with self._lock:
+            group = self._groups.get(key)
+            if group is not None:
+                self._groups.move_to_end(key)
+                return group, False
+            group = self._groups[key] = DuplicateGroup()
+            if len(self._groups) > self.max_groups:
+                self._groups.popitem(last=False)
+            return group, True
+
+    def clear(self):
+        """Forget every group, keeping the reuse counts; a later hotel then generates its own content"""
+        with self._lock:
+            self._groups.clear()
+
+    def record_reuse(self, group):
+        with self._lock:
+            self.reused += 1
+            self.calls_saved += group.calls
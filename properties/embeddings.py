@@ -0,0 +1,229 @@
+"""Embeddings of generated hotel content and nearest-neighbour search over them.
+
+Vectors are normalized to unit length before they are stored, so cosine similarity is a dot
+product, computed with NumPy over the whole index at once.
+"""
+import hashlib
+import json
+
+import numpy
+from django.db.models import F, Q
+from django.utils import timezone
+
+from properties.models import Hotel, HotelEmbedding, HotelProcessingState, HotelReview, HotelSummary
+
+DEFAULT_MODEL = "nomic-embed-text"
+
+
+class EmbeddingError(Exception):
+    pass
+
+
+def normalize(vector):
+    vector = numpy.asarray(vector, dtype=numpy.float32)
+    norm = numpy.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def pack(vector):
+    return normalize(vector).tobytes()
+
+
+def unpack(data):
+    return numpy.frombuffer(bytes(data), dtype=numpy.float32)
+
+
+def content_hash(model, text):
+    return hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+
+def hotel_documents(hotels):
+    """Text embedded for each hotel, by hotel id; hotels without generated content are left out"""
+    ids = [hotel.id for hotel in hotels]
+    summaries = dict(HotelSummary.objects.filter(hotel_id__in=ids).values_list("hotel_id", "summary"))
+    reviews = dict(HotelReview.objects.filter(hotel_id__in=ids).values_list("hotel_id", "review"))
+    documents = {}
+    for hotel in hotels:
+        parts = [hotel.description, summaries.get(hotel.id), reviews.get(hotel.id)]
+        if any(parts):
+            documents[hotel.id] = "\n\n".join(part.strip() for part in [hotel.hotel_name] + parts if part)
+    return documents
+
+
+class Embedder:
+    """Embeds texts in batches with /api/embed, or one by one with /api/embeddings on older Ollama"""
+
+    def __init__(self, client, model=DEFAULT_MODEL):
+        self.client = client
+        self.model = model
+        self.batch_endpoint = True
+        self.requests = 0
+
+    def embed(self, texts):
+        texts = list(texts)
+        if self.batch_endpoint:
+            response = self.client.embed(self.model, texts)
+            self.requests += 1
+            if response.status_code == 200:
+                return self._check(response.json().get("embeddings"), len(texts))
+            if response.status_code != 404 or "model" in response.text.lower():
+                raise EmbeddingError(f"Embedding failed with status {response.status_code}: {response.text[:200]}")
+            self.batch_endpoint = False
+
+        vectors = []
+        for text in texts:
+            response = self.client.embeddings(self.model, text)
+            self.requests += 1
+            if response.status_code != 200:
+                raise EmbeddingError(f"Embedding failed with status {response.status_code}: {response.text[:200]}")
+            vectors.append(response.json().get("embedding"))
+        return self._check(vectors, len(texts))
+
+    @staticmethod
+    def _check(vectors, count):
+        if not isinstance(vectors, list) or len(vectors) != count or not all(vectors):
+            raise EmbeddingError(f"Expected {count} embeddings from Ollama")
+        return vectors
+
+
+def changed_hotels(model, force=False):
+    """Hotels whose processing finished after they were last embedded with model, or every hotel with force"""
+    hotels = Hotel.objects.only("id", "hotel_name", "description")
+    if force:
+        return hotels
+    return hotels.filter(processing_state__status=HotelProcessingState.DONE).filter(
+        Q(embedding__isnull=True)
+        | ~Q(embedding__model=model)
+        | Q(embedding__updated_at__lt=F("processing_state__finished_at"))
+    )
+
+
+def embed_changed(embedder, chunk_size=500, batch_size=32, limit=None, force=False, on_batch=None):
+    """Embed hotels whose generated content changed since they were last embedded.
+
+    Only hotels processed since their last embedding are read, in id order one chunk at a
+    time. Returns the number of hotels embedded. on_batch is called with the running total
+    after each batch is saved.
+    """
+    embedded = 0
+    last_id = None
+    while limit is None or embedded < limit:
+        page = changed_hotels(embedder.model, force).order_by("id")
+        if last_id is not None:
+            page = page.filter(id__gt=last_id)
+        chunk = list(page[:chunk_size])
+        if not chunk:
+            break
+        last_id = chunk[-1].id
+
+        documents = hotel_documents(chunk)
+        hashes = {hotel_id: content_hash(embedder.model, text) for hotel_id, text in documents.items()}
+        current = {} if force else dict(
+            HotelEmbedding.objects.filter(hotel_id__in=hashes).values_list("hotel_id", "content_hash")
+        )
+        pending = [hotel_id for hotel_id in documents if current.get(hotel_id) != hashes[hotel_id]]
+        unchanged = [hotel_id for hotel_id in documents if current.get(hotel_id) == hashes[hotel_id]]
+        if unchanged:
+            # Reprocessed with the same text; marks them as embedded so later runs skip them
+            HotelEmbedding.objects.filter(hotel_id__in=unchanged).update(updated_at=timezone.now())
+        if limit is not None:
+            pending = pending[:limit - embedded]
+
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            vectors = embedder.embed(documents[hotel_id] for hotel_id in batch)
+            HotelEmbedding.objects.bulk_create(
+                [
+                    HotelEmbedding(
+                        hotel_id=hotel_id, model=embedder.model, dimensions=len(vector),
+                        vector=pack(vector), content_hash=hashes[hotel_id],
+                    )
+                    for hotel_id, vector in zip(batch, vectors)
+                ],
+                update_conflicts=True,
+                unique_fields=["hotel"],
+                update_fields=["model", "dimensions", "vector", "content_hash", "updated_at"],
+            )
+            embedded += len(batch)
+            if on_batch is not None:
+                on_batch(embedded)
+    return embedded
+
+
+class EmbeddingIndex:
+    """In-memory nearest-neighbour index over the stored embeddings of one model.
+
+    save() writes the vectors to a flat float32 file that open() memory-maps, so a
+    search does not have to read every embedding from the database first.
+    """
+
+    def __init__(self, model, dimensions, hotel_ids, vectors):
+        self.model = model
+        self.dimensions = dimensions
+        self.hotel_ids = list(hotel_ids)
+        self.positions = {hotel_id: position for position, hotel_id in enumerate(self.hotel_ids)}
+        self.matrix = numpy.frombuffer(vectors, dtype=numpy.float32).reshape(len(self.hotel_ids), dimensions)
+
+    def __len__(self):
+        return len(self.hotel_ids)
+
+    @classmethod
+    def from_database(cls, model=DEFAULT_MODEL):
+        rows = (
+            HotelEmbedding.objects.filter(model=model).order_by("hotel_id")
+            .values_list("hotel_id", "dimensions", "vector").iterator(chunk_size=2000)
+        )
+        hotel_ids, blobs, dimensions = [], [], None
+        for hotel_id, size, vector in rows:
+            if dimensions is None:
+                dimensions = size
+            if size != dimensions:
+                raise EmbeddingError(f"Embeddings of {model} have both {dimensions} and {size} dimensions")
+            hotel_ids.append(hotel_id)
+            blobs.append(bytes(vector))
+        return cls(model, dimensions or 0, hotel_ids, b"".join(blobs))
+
+    def save(self, path):
+        """Write the vectors to path and the model and hotel ids to path.json"""
+        with open(path, "wb") as vectors:
+            vectors.write(self.matrix.tobytes())
+        with open(f"{path}.json", "w") as metadata:
+            json.dump({"model": self.model, "dimensions": self.dimensions, "hotel_ids": self.hotel_ids}, metadata)
+
+    @classmethod
+    def open(cls, path):
+        with open(f"{path}.json") as metadata:
+            meta = json.load(metadata)
+        count = len(meta["hotel_ids"])
+        vectors = numpy.memmap(path, dtype=numpy.float32, mode="r", shape=(count, meta["dimensions"]))
+        return cls(meta["model"], meta["dimensions"], meta["hotel_ids"], vectors)
+
+    def vector(self, hotel_id):
+        """The stored vector of a hotel, or None if it has not been embedded"""
+        position = self.positions.get(hotel_id)
+        if position is None:
+            return None
+        return self.matrix[position]
+
+    def search(self, vector, limit=10, exclude=()):
+        """Return up to limit (hotel_id, similarity) pairs closest to vector, most similar first"""
+        if len(vector) != self.dimensions:
+            raise EmbeddingError(f"Query has {len(vector)} dimensions but the index has {self.dimensions}")
+        exclude = {self.positions[hotel_id] for hotel_id in exclude if hotel_id in self.positions}
+        limit = min(limit, len(self) - len(exclude))
+        if limit <= 0:
+            return []
+
+        scores = self.matrix @ normalize(vector)
+        for position in exclude:
+            scores[position] = -numpy.inf
+        top = numpy.argpartition(-scores, limit - 1)[:limit]
+        top = top[numpy.argsort(-scores[top])]
+        return [(self.hotel_ids[position], float(scores[position])) for position in top]
+
+    def similar(self, hotel_id, limit=10):
+        """Hotels closest to an embedded hotel, excluding the hotel itself"""
+        vector = self.vector(hotel_id)
+        if vector is None:
+            raise EmbeddingError(f"Hotel {hotel_id} has no {self.model} embedding")
+        return self.search(vector, limit, exclude=(hotel_id,))
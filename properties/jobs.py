@@ -0,0 +1,98 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from properties.models import HotelJob
+
+ACTIVE_STATUSES = (HotelJob.QUEUED, HotelJob.RUNNING)
+
+
+def enqueue_hotels(hotels, chunk_size=500):
+    """Create queued jobs for hotels that don't already have an active job"""
+    queued = 0
+    chunk = []
+    for hotel in hotels:
+        chunk.append(hotel)
+        if len(chunk) >= chunk_size:
+            queued += _enqueue_chunk(chunk)
+            chunk = []
+    if chunk:
+        queued += _enqueue_chunk(chunk)
+    return queued
+
+
+def _enqueue_chunk(hotels):
+    active = set(
+        HotelJob.objects.filter(
+            hotel_id__in=[hotel.id for hotel in hotels], status__in=ACTIVE_STATUSES
+        ).values_list('hotel_id', flat=True)
+    )
+    now = timezone.now()
+    jobs = [HotelJob(hotel=hotel, visible_at=now) for hotel in hotels if hotel.id not in active]
+    HotelJob.objects.bulk_create(jobs)
+    return len(jobs)
+
+
+def claim_jobs(worker_id, batch_size, visibility_timeout):
+    """Claim up to batch_size claimable jobs, skipping rows other workers have locked"""
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            HotelJob.objects.select_for_update(skip_locked=True, of=('self',))
+            .select_related('hotel')
+            .filter(status__in=ACTIVE_STATUSES, visible_at__lte=now)
+            .order_by('visible_at', 'id')[:batch_size]
+        )
+        for job in jobs:
+            job.status = HotelJob.RUNNING
+            job.attempts += 1
+            job.claimed_by = worker_id
+            job.visible_at = now + timedelta(seconds=visibility_timeout)
+            job.updated_at = now
+        HotelJob.objects.bulk_update(jobs, ['status', 'attempts', 'claimed_by', 'visible_at', 'updated_at'])
+    return jobs
+
+
+def extend_jobs(jobs, visibility_timeout):
+    """Push back the visibility timeout of claimed jobs that are still running under their claim"""
+    if not jobs:
+        return 0
+    now = timezone.now()
+    return HotelJob.objects.filter(
+        id__in=[job.id for job in jobs], status=HotelJob.RUNNING, claimed_by=jobs[0].claimed_by,
+    ).update(visible_at=now + timedelta(seconds=visibility_timeout), updated_at=now)
+
+
+def complete_jobs(jobs, results, max_attempts=3, retry_delay=60):
+    """Mark claimed jobs done, or requeue or fail them based on their results.
+
+    Jobs whose claim ran out and that another worker claimed since are left to that worker.
+    """
+    if not jobs:
+        return
+    errors = {result.hotel.id: result.error for result in results}
+    with transaction.atomic():
+        # A claim is identified by its worker and attempt number
+        claims = {
+            job_id: (claimed_by, attempts)
+            for job_id, claimed_by, attempts in HotelJob.objects.select_for_update()
+            .filter(id__in=[job.id for job in jobs], status=HotelJob.RUNNING)
+            .values_list('id', 'claimed_by', 'attempts')
+        }
+        jobs = [job for job in jobs if claims.get(job.id) == (job.claimed_by, job.attempts)]
+        now = timezone.now()
+        for job in jobs:
+            job.updated_at = now
+            error = errors.get(job.hotel_id, 'No result was produced for this hotel')
+            if error is None:
+                job.status = HotelJob.DONE
+                job.last_error = ''
+            elif job.attempts >= max_attempts:
+                job.status = HotelJob.FAILED
+                job.last_error = error
+            else:
+                job.status = HotelJob.QUEUED
+                job.last_error = error
+                job.visible_at = now + timedelta(seconds=retry_delay)
+        HotelJob.objects.bulk_update(jobs, ['status', 'last_error', 'visible_at', 'updated_at'])
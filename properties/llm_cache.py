@@ -0,0 +1,84 @@
+import hashlib
+import json
+import threading
+from datetime import timedelta
+
+from django.utils import timezone
+
+from properties.models import LLMCacheEntry
+
+
+class ResponseCache:
+    """Database-backed cache of Ollama responses keyed by model, prompt and options"""
+
+    def __init__(self, enabled=True, refresh=False):
+        self.enabled = enabled
+        # In refresh mode cached responses are ignored but new ones are still stored
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model, prompt, options=None):
+        payload = json.dumps(
+            {"model": model, "prompt": prompt, "options": options or {}},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key, accept=None):
+        """Return the cached response for a key, or None on a miss.
+
+        A cached response that accept rejects is deleted and counted as a miss.
+        """
+        if not self.enabled:
+            return None
+
+        response = None
+        if not self.refresh:
+            response = LLMCacheEntry.objects.filter(key=key).values_list("response", flat=True).first()
+            if response is not None and accept is not None and not accept(response):
+                LLMCacheEntry.objects.filter(key=key).delete()
+                response = None
+        with self._lock:
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if response is not None:
+            LLMCacheEntry.objects.filter(key=key).update(last_used_at=timezone.now())
+        return response
+
+    def cached_keys(self, keys):
+        """Return which of the keys have a cached response, without counting hits or misses"""
+        if not self.enabled or self.refresh or not keys:
+            return set()
+        return set(LLMCacheEntry.objects.filter(key__in=keys).values_list("key", flat=True))
+
+    def set(self, key, model, response):
+        if not self.enabled:
+            return
+        now = timezone.now()
+        LLMCacheEntry.objects.update_or_create(
+            key=key,
+            defaults={"model": model, "response": response, "created_at": now, "last_used_at": now},
+        )
+
+    def evict(self, max_age_days=None, max_entries=None):
+        """Delete entries older than max_age_days, then the least recently used beyond max_entries"""
+        if not self.enabled:
+            return 0
+
+        deleted = 0
+        if max_age_days is not None:
+            cutoff = timezone.now() - timedelta(days=max_age_days)
+            deleted += LLMCacheEntry.objects.filter(created_at__lt=cutoff).delete()[0]
+        if max_entries is not None:
+            boundary = list(
+                LLMCacheEntry.objects.order_by("-last_used_at")
+                .values_list("last_used_at", flat=True)[max_entries:max_entries + 1]
+            )
+            if boundary:
+                deleted += LLMCacheEntry.objects.filter(last_used_at__lte=boundary[0]).delete()[0]
+        return deleted
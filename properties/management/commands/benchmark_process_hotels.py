@@ -0,0 +1,142 @@
+import os
+import shlex
+import time
+from contextlib import contextmanager
+from io import StringIO
+from unittest.mock import patch
+
+from django.apps import apps
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+from properties.benchmark import FakeOllamaServer, QueryCounter, percentile
+from properties.management.commands.process_hotels import Command as ProcessHotelsCommand
+from properties.models import Hotel
+
+DEFAULT_SCENARIOS = [
+    "",
+    "--workers 4",
+    "--workers 4 --structured",
+    "--workers 4 --stream",
+]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark process_hotels against a local fake Ollama server and a SQLite database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hotels', type=int, default=100,
+            help='Number of synthetic hotels to seed (default: 100)'
+        )
+        parser.add_argument(
+            '--latency', type=float, default=200,
+            help='Fake Ollama response latency in milliseconds (default: 200)'
+        )
+        parser.add_argument(
+            '--jitter', type=float, default=50,
+            help='Random +/- jitter added to the latency in milliseconds (default: 50)'
+        )
+        parser.add_argument(
+            '--scenario', action='append', dest='scenarios',
+            help='process_hotels arguments to benchmark, e.g. "--workers 8". Can be repeated.'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError(
+                "The benchmark seeds synthetic hotels and must run against SQLite: "
+                "use --settings=django_project.benchmark_settings"
+            )
+
+        scenarios = options['scenarios'] or DEFAULT_SCENARIOS
+        self.create_tables()
+
+        fake = FakeOllamaServer(latency=options['latency'] / 1000, jitter=options['jitter'] / 1000)
+        self.stdout.write(
+            f"Benchmarking {options['hotels']} hotels against fake Ollama at {fake.base_url} "
+            f"({options['latency']:.0f} ms +/- {options['jitter']:.0f} ms)"
+        )
+        self.stdout.write(f"{'scenario':<40} {'hotels/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'prompts':>8} {'queries':>8}")
+
+        with fake, patch.dict(os.environ, {"OLLAMA_BASE_URL": fake.base_url}):
+            for scenario in scenarios:
+                self.seed_hotels(options['hotels'])
+                requests_before = fake.requests
+                result = self.run_scenario(scenario)
+                self.stdout.write(
+                    f"{scenario or '(sequential)':<40} "
+                    f"{options['hotels'] / result['seconds']:>9.2f} "
+                    f"{percentile(result['latencies'], 0.5) * 1000:>8.0f} "
+                    f"{percentile(result['latencies'], 0.95) * 1000:>8.0f} "
+                    f"{fake.requests - requests_before:>8} "
+                    f"{result['queries']:>8}"
+                )
+
+    def create_tables(self):
+        """(Re)create the app's tables, including the normally unmanaged hotels table"""
+        models = list(apps.get_app_config('properties').get_models())
+        existing = set(connection.introspection.table_names())
+        with connection.schema_editor() as editor:
+            for model in reversed(models):
+                if model._meta.db_table in existing:
+                    editor.delete_model(model)
+            for model in models:
+                editor.create_model(model)
+
+    def seed_hotels(self, count):
+        for model in reversed(list(apps.get_app_config('properties').get_models())):
+            model.objects.all().delete()
+        Hotel.objects.bulk_create([
+            Hotel(
+                id=index,
+                hotel_id=100000 + index,
+                city_id=index % 10,
+                hotel_name=f"Benchmark Hotel {index}",
+                hotel_address=f"{index} Benchmark Street",
+                hotel_img=f"hotel_{index}.jpg",
+                price=50.0 + index % 200,
+                rating=3.0 + (index % 20) / 10,
+                room_type="Standard",
+                lat=23.8 + index / 10000,
+                lng=90.4 + index / 10000,
+            )
+            for index in range(1, count + 1)
+        ], batch_size=500)
+
+    def run_scenario(self, scenario):
+        latencies = []
+        original = ProcessHotelsCommand.generate_ollama_content
+
+        def timed(command, *args, **kwargs):
+            started = time.monotonic()
+            try:
+                return original(command, *args, **kwargs)
+            finally:
+                latencies.append(time.monotonic() - started)
+
+        with patch.object(ProcessHotelsCommand, 'generate_ollama_content', timed), self.count_queries() as counter:
+            started = time.monotonic()
+            call_command('process_hotels', *shlex.split(scenario), stdout=StringIO())
+            seconds = time.monotonic() - started
+        return {"seconds": seconds, "latencies": latencies, "queries": counter.count}
+
+    @contextmanager
+    def count_queries(self):
+        """Count queries on this thread's connection and on every worker connection opened meanwhile"""
+        counter = QueryCounter()
+
+        def install(sender, connection, **kwargs):
+            # Reconnecting reuses the same wrapper object, so only install once
+            if counter not in connection.execute_wrappers:
+                connection.execute_wrappers.append(counter)
+
+        connection.execute_wrappers.append(counter)
+        connection_created.connect(install)
+        try:
+            yield counter
+        finally:
+            connection_created.disconnect(install)
+            connection.execute_wrappers.remove(counter)
@@ -0,0 +1,67 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from properties.embeddings import DEFAULT_MODEL, Embedder, EmbeddingError, EmbeddingIndex, embed_changed
+from properties.ollama import OllamaClient
+
+
+class Command(BaseCommand):
+    help = 'Embed the generated content of hotels that changed since they were last embedded'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model', default=DEFAULT_MODEL,
+            help=f'Ollama embedding model (default: {DEFAULT_MODEL})'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=32,
+            help='Number of hotels embedded per Ollama request (default: 32)'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Number of hotels fetched from the database per query (default: 500)'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=None,
+            help='Maximum number of hotels to embed (default: all that changed)'
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Embed every hotel again even if its content is unchanged'
+        )
+        parser.add_argument(
+            '--index-file', default=None,
+            help='Also write every stored embedding to this file for similar_hotels to memory-map'
+        )
+        parser.add_argument(
+            '--ollama-urls', default=None,
+            help='Comma-separated Ollama base URLs (default: OLLAMA_BASE_URLS or OLLAMA_BASE_URL)'
+        )
+
+    def handle(self, *args, **options):
+        client = OllamaClient(base_url=options['ollama_urls'], model=options['model'])
+        embedder = Embedder(client, options['model'])
+        started = time.monotonic()
+        try:
+            embedded = embed_changed(
+                embedder,
+                chunk_size=options['chunk_size'],
+                batch_size=options['batch_size'],
+                limit=options['limit'],
+                force=options['force'],
+                on_batch=lambda total: self.stdout.write(f"Embedded {total} hotels..."),
+            )
+        except EmbeddingError as e:
+            raise CommandError(f"{e}. Is {options['model']} pulled on Ollama?")
+        finally:
+            client.close()
+        self.stdout.write(self.style.SUCCESS(
+            f"Embedded {embedded} hotels with {options['model']} in {time.monotonic() - started:.1f}s "
+            f"using {embedder.requests} requests"
+        ))
+
+        if options['index_file']:
+            index = EmbeddingIndex.from_database(options['model'])
+            index.save(options['index_file'])
+            self.stdout.write(f"Wrote {len(index)} embeddings to {options['index_file']}")
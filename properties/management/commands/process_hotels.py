@@ -1,152 +1,1058 @@
 # Updated properties/cli.py
-from django.core.management.base import BaseCommand
+from collections import deque
+from dataclasses import replace
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Max, Min
+from django.utils import timezone
+from datetime import timedelta
+import argparse
 import requests
 import json
 import time
-from properties.models import Hotel, HotelSummary, HotelReview
+from properties import prompts
+from properties.concurrency import ConcurrencyLimiter
+from properties.dedup import DuplicateGroups, fingerprint
+from properties.llm_cache import ResponseCache
+from properties.metrics import RunMetrics
+from properties.jobs import enqueue_hotels
+from properties.models import Hotel, HotelProcessingState, ProcessingRun
+from properties.ollama import OllamaClient
+from properties.transport import Cassette, RecordingAdapter, ReplayAdapter
+from properties.parsing import parse_rating, validate_rating
+from properties.planning import BatchPlan, Throughput
+from properties import postprocess
+from properties.writer import BulkWriter, HotelResult
+
+# JSON schema passed to Ollama's `format` option for single-call generation
+STRUCTURED_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "description": {"type": "string"},
+        "summary": {"type": "string"},
+        "review": {"type": "string"},
+        "rating": {"type": "number", "minimum": 0, "maximum": 5},
+    },
+    "required": ["title", "description", "summary", "review", "rating"],
+}
+
+# Constrains the retry for a review whose rating could not be parsed from its text
+RATING_SCHEMA = {
+    "type": "object",
+    "properties": {"rating": {"type": "number", "minimum": 0, "maximum": 5}},
+    "required": ["rating"],
+}
+
+
+def parse_fields(value):
+    """Parse a comma-separated --fields value into registry field names"""
+    fields = tuple(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+    unknown = [name for name in fields if name not in prompts.FIELDS]
+    if unknown or not fields:
+        raise argparse.ArgumentTypeError(
+            f"unknown fields {', '.join(unknown) or value!r}; choose from {', '.join(prompts.FIELDS)}"
+        )
+    return fields
+
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
 
 class Command(BaseCommand):
     help = 'Process hotel data using Ollama'
     
     MODEL_NAME = "llama3.2"  # Updated to use llama3.2
 
+    # Maximum tokens (num_predict) per field when streaming
+    FIELD_TOKEN_BUDGETS = {
+        "title": 32,
+        "summary": 256,
+        "review": 512,
+        "description": 384,
+    }
+    SINGLE_LINE_FIELDS = ("title",)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Per-thread output buffer so concurrent hotels don't interleave their progress lines
+        self._local = threading.local()
+        self.limiter = ConcurrencyLimiter(1)
+        self.structured = False
+        self.cache = ResponseCache(enabled=False)
+        self.track_state = False
+        self.skipped = 0
+        self.writer = BulkWriter(track_state=False)
+        self.client = OllamaClient()
+        self.workers = 1
+        self.max_inflight = 1
+        self.stream = False
+        self.metrics = RunMetrics()
+        self.keep_alive = None
+        self.duplicates = DuplicateGroups(enabled=False)
+        self.fields = prompts.FIELDS
+        # Hotels that only need some of self.fields regenerated, by hotel id
+        self.planned_fields = {}
+        self.pull_timeout = 3600
+        # Regenerations allowed per field that fails the quality gate, and per run (None for no limit)
+        self.field_retries = 1
+        self.retry_budget = None
+        self._budget_lock = threading.Lock()
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=None,
+            help='Maximum number of hotels to process (default: all)'
+        )
+        parser.add_argument(
+            '--start-id', type=int, default=None,
+            help='Only process hotels whose id is greater than or equal to this value'
+        )
+        parser.add_argument(
+            '--city-id', type=int, default=None,
+            help='Only process hotels in this city'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Number of hotels fetched from the database per query (default: 500)'
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Continue an interrupted run from the last committed hotel'
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Process hotels again even if they are already processed and unchanged'
+        )
+        parser.add_argument(
+            '--enqueue', action='store_true',
+            help='Add the selected hotels to the job queue for run_llm_worker instead of processing them'
+        )
+        parser.add_argument(
+            '--plan', action='store_true',
+            help='Render the prompts for the selected hotels without sending them and report the '
+                 'prompt counts, estimated tokens, cache hits and projected run time'
+        )
+        self.add_generation_arguments(parser)
+
+    @staticmethod
+    def add_generation_arguments(parser):
+        """Options shared with run_llm_worker that control how hotels are generated"""
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Number of hotels to process concurrently (default: 1)'
+        )
+        parser.add_argument(
+            '--max-inflight', type=int, default=None,
+            help='Maximum number of concurrent requests sent to Ollama (default: same as --workers)'
+        )
+        parser.add_argument(
+            '--fields', type=parse_fields, default=None,
+            help=f"Comma-separated fields to generate, from {', '.join(prompts.FIELDS)} (default: all). "
+                 "Only fields whose prompt template changed are regenerated unless --force is given"
+        )
+        parser.add_argument(
+            '--adaptive-concurrency', action='store_true',
+            help='Tune the number of concurrent Ollama requests between 1 and --max-inflight from observed latency and errors'
+        )
+        parser.add_argument(
+            '--structured', action='store_true',
+            help='Generate all fields in one JSON-format request, falling back to per-field prompts for invalid fields'
+        )
+        parser.add_argument(
+            '--record', metavar='CASSETTE', default=None,
+            help='Record every Ollama request and response, with timings, to this gzip cassette file'
+        )
+        parser.add_argument(
+            '--replay', metavar='CASSETTE', default=None,
+            help='Answer Ollama requests from a cassette written with --record instead of calling Ollama'
+        )
+        parser.add_argument(
+            '--replay-speed', type=float, default=0,
+            help='With --replay, 0 answers instantly (default), 1 at the recorded latency, 2 twice as fast'
+        )
+        parser.add_argument(
+            '--field-retries', type=int, default=1,
+            help='Times a field that fails validation after cleanup is generated again (default: 1)'
+        )
+        parser.add_argument(
+            '--retry-budget', type=int, default=None,
+            help='Maximum number of fields regenerated for failing validation in the whole run (default: no limit)'
+        )
+        parser.add_argument(
+            '--no-dedupe', action='store_true',
+            help='Generate every hotel separately instead of reusing content across duplicate listings'
+        )
+        parser.add_argument(
+            '--no-cache', action='store_true',
+            help='Do not read or write the LLM response cache'
+        )
+        parser.add_argument(
+            '--refresh', action='store_true',
+            help='Ignore cached responses and overwrite them with fresh generations'
+        )
+        parser.add_argument(
+            '--cache-max-age', type=int, default=30,
+            help='Evict cached responses older than this many days (default: 30)'
+        )
+        parser.add_argument(
+            '--cache-max-entries', type=int, default=100000,
+            help='Keep at most this many cached responses, evicting the least recently used (default: 100000)'
+        )
+        parser.add_argument(
+            '--flush-size', type=int, default=50,
+            help='Number of processed hotels written to the database per transaction (default: 50)'
+        )
+        parser.add_argument(
+            '--ollama-urls', default=None,
+            help='Comma-separated Ollama base URLs, each optionally followed by |weight '
+                 '(default: OLLAMA_BASE_URLS or OLLAMA_BASE_URL)'
+        )
+        parser.add_argument(
+            '--routing', choices=OllamaClient.ROUTING_STRATEGIES, default='least-outstanding',
+            help='How requests are spread over several Ollama hosts (default: least-outstanding)'
+        )
+        parser.add_argument(
+            '--pull-timeout', type=float, default=3600,
+            help='Give up pulling a missing model after this many seconds (default: 3600)'
+        )
+        parser.add_argument(
+            '--keep-alive', default='30m',
+            help="How long Ollama keeps the model loaded after each request, e.g. '30m' or '-1' for ever (default: 30m)"
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=300,
+            help='Seconds to wait for an Ollama response before retrying (default: 300)'
+        )
+        parser.add_argument(
+            '--retries', type=int, default=3,
+            help='Retries with exponential backoff for failed Ollama requests (default: 3)'
+        )
+        parser.add_argument(
+            '--stream', action='store_true',
+            help='Stream tokens from Ollama, stopping titles at the first line and capping tokens per field'
+        )
+        parser.add_argument(
+            '--report', default=None,
+            help='Write per-hotel and per-prompt metrics to this file (.json, or .csv for per-prompt rows)'
+        )
+        parser.add_argument(
+            '--prometheus-textfile', default=None,
+            help='Write run metrics to this file in the Prometheus textfile collector format'
+        )
+
+    def log(self, message, ending=None):
+        """Write a progress line, buffering it when running inside a worker thread"""
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is not None:
+            buffer.append((message, ending))
+        elif ending is None:
+            self.stdout.write(message)
+        else:
+            self.stdout.write(message, ending=ending)
+
     def pull_llama_model(self):
-        """Pull the Llama3.2 model if not already present"""
-        url = "http://ollama:11434/api/pull"
-        data = {
-            "name": self.MODEL_NAME
-        }
-        
+        """Pull the model, reporting Ollama's streamed progress, within pull_timeout seconds"""
         self.stdout.write(f"Pulling {self.MODEL_NAME} model... This might take several minutes...")
-        
+        deadline = time.monotonic() + self.pull_timeout
+        last_reported = None
+
         try:
-            response = requests.post(url, json=data)
-            while response.status_code == 200:
-                self.stdout.write(".", ending='')
-                time.sleep(2)
-                # Check if model is ready
-                check_url = "http://ollama:11434/api/show"
-                check_response = requests.post(check_url, json={"name": self.MODEL_NAME})
-                if check_response.status_code == 200:
-                    self.stdout.write(f"\n{self.MODEL_NAME} model successfully pulled!")
-                    return True
+            with self.client.pull_stream(self.MODEL_NAME) as response:
+                if response.status_code != 200:
+                    self.stdout.write(self.style.ERROR(f"Error pulling model. Status code: {response.status_code}"))
+                    return False
+                for event in self.client.iter_stream(response):
+                    if 'error' in event:
+                        self.stdout.write(self.style.ERROR(f"Error pulling model: {event['error']}"))
+                        return False
+                    status = event.get('status', '')
+                    if status == 'success':
+                        self.stdout.write(self.style.SUCCESS(f"{self.MODEL_NAME} model successfully pulled!"))
+                        return True
+                    total = event.get('total')
+                    completed = event.get('completed') or 0
+                    if total:
+                        percent = completed * 100 // total
+                        # Report each layer's download in steps of 10%
+                        if (status, percent // 10) != last_reported:
+                            last_reported = (status, percent // 10)
+                            self.stdout.write(
+                                f"{status}: {percent}% ({format_bytes(completed)} / {format_bytes(total)})"
+                            )
+                    elif status and (status, None) != last_reported:
+                        last_reported = (status, None)
+                        self.stdout.write(status)
+                    if time.monotonic() > deadline:
+                        self.stdout.write(self.style.ERROR(
+                            f"Pulling {self.MODEL_NAME} did not finish within {self.pull_timeout:.0f} seconds"
+                        ))
+                        return False
         except requests.exceptions.RequestException as e:
-            self.stdout.write(self.style.ERROR(f'\nError pulling model: {str(e)}'))
+            self.stdout.write(self.style.ERROR(f'Error pulling model: {str(e)}'))
             return False
+        self.stdout.write(self.style.ERROR("Model pull ended before it completed"))
+        return False
+
+    def warm_up(self):
+        """Load the model before the first hotel so its cold start is not counted against it"""
+        for url, seconds in self.client.warm_up(self.MODEL_NAME, self.keep_alive).items():
+            if seconds is None:
+                self.stdout.write(self.style.WARNING(f"Could not preload {self.MODEL_NAME} on {url}"))
+            else:
+                self.stdout.write(f"Loaded {self.MODEL_NAME} on {url} in {seconds:.1f}s (keep_alive {self.keep_alive})")
 
     def check_model_status(self):
         """Check if the Llama3.2 model is available"""
-        url = "http://ollama:11434/api/show"
-        data = {
-            "name": self.MODEL_NAME
-        }
-        
         try:
-            response = requests.post(url, json=data)
+            response = self.client.show(self.MODEL_NAME)
             return response.status_code == 200
         except requests.exceptions.RequestException:
             return False
 
+    def configure(self, **kwargs):
+        """Set up the Ollama client, cache, metrics and writer from the generation options"""
+        self.workers = max(kwargs.get('workers') or 1, 1)
+        self.max_inflight = max(kwargs.get('max_inflight') or self.workers, 1)
+        if kwargs.get('adaptive_concurrency'):
+            self.limiter = ConcurrencyLimiter(1, adaptive=True, max_limit=self.max_inflight)
+        else:
+            self.limiter = ConcurrencyLimiter(self.max_inflight)
+        self.client = OllamaClient(
+            base_url=kwargs.get('ollama_urls'),
+            read_timeout=kwargs.get('timeout') or 300,
+            retries=kwargs.get('retries', 3),
+            pool_size=max(self.workers, self.max_inflight),
+            routing=kwargs.get('routing') or 'least-outstanding',
+            model=self.MODEL_NAME,
+            transport=self.transport(kwargs.get('record'), kwargs.get('replay'), kwargs.get('replay_speed') or 0),
+        )
+        self.stdout.write(f"Using Ollama at {self.client.base_url}")
+        self.structured = kwargs.get('structured', False)
+        self.stream = kwargs.get('stream', False)
+        self.keep_alive = kwargs.get('keep_alive') or '30m'
+        self.duplicates = DuplicateGroups(enabled=not kwargs.get('no_dedupe', False))
+        self.fields = kwargs.get('fields') or prompts.FIELDS
+        self.field_retries = max(kwargs.get('field_retries', 1) or 0, 0)
+        self.retry_budget = kwargs.get('retry_budget')
+        self.pull_timeout = kwargs.get('pull_timeout') or 3600
+        self.metrics = RunMetrics(keep_records=bool(kwargs.get('report')))
+        self.cache = ResponseCache(
+            enabled=not kwargs.get('no_cache', False),
+            refresh=kwargs.get('refresh', False),
+        )
+        if not kwargs.get('plan'):
+            evicted = self.cache.evict(kwargs.get('cache_max_age', 30), kwargs.get('cache_max_entries', 100000))
+            if evicted:
+                self.stdout.write(f"Evicted {evicted} cached responses")
+        self.track_state = True
+        self.writer = BulkWriter(flush_size=kwargs.get('flush_size') or 50, metrics=self.metrics)
+
+    def transport(self, record=None, replay=None, replay_speed=0):
+        """Return the adapter factory for a recorded or replayed run, or None to call Ollama directly"""
+        if record and replay:
+            raise CommandError("--record and --replay cannot be used together")
+        if replay:
+            try:
+                cassette = Cassette.load(replay)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read cassette {replay}: {e}")
+            self.stdout.write(f"Replaying {len(cassette.entries)} recorded Ollama responses from {replay}")
+            return lambda **kwargs: ReplayAdapter(cassette, speed=replay_speed)
+        if record:
+            self.stdout.write(f"Recording Ollama traffic to {record}")
+            return lambda **kwargs: RecordingAdapter(Cassette(record), **kwargs)
+        return None
+
+    def ensure_model(self):
+        """Make sure the model is available, pulling it if needed"""
+        self.stdout.write(f"Checking {self.MODEL_NAME} model status...")
+
+        available = False
+        if len(self.client.endpoints) > 1:
+            healthy = self.client.check_health()
+            for endpoint in self.client.endpoints:
+                if endpoint not in healthy:
+                    self.stdout.write(self.style.WARNING(
+                        f"Ollama at {endpoint.url} is unavailable or missing {self.MODEL_NAME}; "
+                        f"routing around it until it recovers"
+                    ))
+            if healthy:
+                self.stdout.write(self.style.SUCCESS(f"{self.MODEL_NAME} model is available on {len(healthy)} hosts!"))
+                available = True
+
+        if not available:
+            if not self.check_model_status():
+                self.stdout.write(f"{self.MODEL_NAME} model not found. Pulling model...")
+                if not self.pull_llama_model():
+                    self.stdout.write(self.style.ERROR(f'Failed to pull {self.MODEL_NAME} model. Exiting...'))
+                    return False
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{self.MODEL_NAME} model is already available!"))
+        self.warm_up()
+        self.metrics.start_processing()
+        return True
+
     def handle(self, *args, **kwargs):
+        self.configure(**kwargs)
+
+        queryset = Hotel.objects.all()
+        if kwargs.get('start_id') is not None:
+            queryset = queryset.filter(id__gte=kwargs['start_id'])
+        if kwargs.get('city_id') is not None:
+            queryset = queryset.filter(city_id=kwargs['city_id'])
+        if kwargs.get('resume'):
+            resume_id = self.resume_start_id(queryset)
+            if resume_id is not None:
+                self.stdout.write(f"Resuming from hotel id {resume_id}")
+                queryset = queryset.filter(id__gte=max(kwargs.get('start_id') or resume_id, resume_id))
+
+        limit = kwargs.get('limit')
+        chunk_size = kwargs.get('chunk_size') or 500
+        skip_processed = not kwargs.get('force', False)
+
+        if kwargs.get('plan'):
+            self.track_state = False
+            total_hotels = queryset.count()
+            if limit is not None:
+                total_hotels = min(total_hotels, limit)
+            self.plan_batch(self.iter_hotels(queryset, chunk_size, limit, skip_processed=skip_processed), total_hotels)
+            return
+
+        if kwargs.get('enqueue'):
+            self.track_state = False
+            hotels = self.iter_hotels(queryset, chunk_size, limit, skip_processed=skip_processed)
+            queued = enqueue_hotels(hotels, chunk_size)
+            self.stdout.write(self.style.SUCCESS(f"Queued {queued} hotels for run_llm_worker"))
+            return
+
         # First, check if model is available
-        self.stdout.write(f"Checking {self.MODEL_NAME} model status...")
-        
-        if not self.check_model_status():
-            self.stdout.write(f"{self.MODEL_NAME} model not found. Pulling model...")
-            if not self.pull_llama_model():
-                self.stdout.write(self.style.ERROR(f'Failed to pull {self.MODEL_NAME} model. Exiting...'))
-                return
-        else:
-            self.stdout.write(self.style.SUCCESS(f"{self.MODEL_NAME} model is already available!"))
+        if not self.ensure_model():
+            return
+
+        total_hotels = queryset.count()
+        if limit is not None:
+            total_hotels = min(total_hotels, limit)
+        hotels = self.iter_hotels(queryset, chunk_size, limit, skip_processed=skip_processed)
 
-        # Get first 10 hotels
-        hotels = Hotel.objects.order_by('id')[:10] 
-        total_hotels = hotels.count()
-        
         self.stdout.write(f"Processing {total_hotels} hotels...")
-        
-        for index, hotel in enumerate(hotels, 1):
-            self.stdout.write(f"Processing hotel {index}/{total_hotels}: {hotel.hotel_name}")
-            self.process_hotel(hotel)
-
-    def generate_ollama_content(self, prompt):
-        """Generate content using Ollama API with Llama3.2"""
-        url = "http://ollama:11434/api/generate"
+
+        try:
+            self.process_all(hotels, total_hotels)
+        finally:
+            self.writer.flush()
+            self.client.close()
+
+        if self.skipped:
+            self.stdout.write(f"Skipped {self.skipped} hotels that were already processed")
+        self.report_metrics(kwargs.get('report'), kwargs.get('prometheus_textfile'))
+        self.save_run()
+
+    def save_run(self):
+        """Record the run's Ollama throughput for --plan to project future runs from"""
+        totals = self.metrics.ollama_totals
+        if not totals.get('eval_count'):
+            return
+        ProcessingRun.objects.create(
+            model=self.MODEL_NAME,
+            workers=self.workers,
+            max_inflight=self.max_inflight,
+            hotels=sum(self.metrics.hotel_count.values()),
+            # From after warm-up, so the model's load time does not count as slow generation
+            wall_seconds=self.metrics.processing_seconds,
+            prompt_eval_count=totals.get('prompt_eval_count', 0),
+            prompt_eval_seconds=totals.get('prompt_eval_seconds', 0),
+            eval_count=totals['eval_count'],
+            eval_seconds=totals.get('eval_seconds', 0),
+            field_eval_counts=dict(self.metrics.field_eval_counts),
+        )
+
+    def plan_batch(self, hotels, total_hotels):
+        """Render every prompt the selected hotels would send and report the expected cost"""
+        self.stdout.write(f"Planning {total_hotels} hotels without calling Ollama...")
+        plan = BatchPlan()
+        seen = set()
+        pending = []
+
+        def check_cache():
+            cached = self.cache.cached_keys([key for _, _, key in pending])
+            for field, prompt, key in pending:
+                plan.add_prompt(field, prompt, cached=key in cached)
+            pending.clear()
+
+        for hotel in hotels:
+            fields = self.planned_fields.pop(hotel.id, self.fields)
+            if self.duplicates.enabled:
+                key = (fingerprint(hotel), fields)
+                if key in seen:
+                    plan.duplicates += 1
+                    continue
+                seen.add(key)
+            plan.hotels += 1
+            context = prompts.hotel_context(hotel)
+            if self.structured and len(fields) > 1:
+                hotel_prompts = [("structured", prompts.render("structured", **context), STRUCTURED_SCHEMA)]
+            else:
+                hotel_prompts = [(field, prompts.render(field, **context), None) for field in fields]
+            for field, prompt, format in hotel_prompts:
+                _, options, _ = self.request_data(prompt, format, field)
+                pending.append((field, prompt, self.cache.make_key(self.MODEL_NAME, prompt, options)))
+            if len(pending) >= 500:
+                check_cache()
+        check_cache()
+        self.report_plan(plan)
+
+    def report_plan(self, plan):
+        throughput = Throughput.recent(self.MODEL_NAME)
+        budgets = dict(self.FIELD_TOKEN_BUDGETS, structured=sum(self.FIELD_TOKEN_BUDGETS.values()))
+        generated = plan.generated_tokens(throughput, budgets)
+        parallelism = throughput.parallelism_for(self.max_inflight, len(self.client.endpoints))
+        seconds = plan.projected_seconds(throughput, generated, parallelism)
+
+        self.stdout.write(f"Hotels to generate: {plan.hotels}")
+        self.stdout.write(
+            f"Skipped: {self.skipped} already processed, {plan.duplicates} duplicates of another listing"
+        )
+        by_field = ", ".join(f"{field} {count}" for field, count in plan.prompts.items())
+        self.stdout.write(
+            f"Prompts: {sum(plan.prompts.values())} ({by_field or 'none'}), "
+            f"{sum(plan.cached.values())} answered from the cache"
+        )
+        self.stdout.write(
+            f"Estimated tokens: {sum(plan.prompt_tokens.values())} prompt, {sum(generated.values()):.0f} generated"
+        )
+        if seconds is None:
+            self.stdout.write(self.style.WARNING(
+                f"No finished {self.MODEL_NAME} runs recorded yet, so the run time cannot be projected"
+            ))
+            return
+        self.stdout.write(
+            f"Projected time: {timedelta(seconds=round(seconds))} with {self.workers} workers and "
+            f"{self.max_inflight} concurrent requests ({throughput.prompt_tokens_per_second:.0f} prompt "
+            f"and {throughput.generated_tokens_per_second:.1f} generated tokens/s, about {parallelism:.1f} "
+            f"requests at once, from {throughput.runs} recent runs)"
+        )
+
+    def process_all(self, hotels, total_hotels):
+        """Process hotels sequentially or on the worker pool and queue their results for writing"""
+        if self.workers > 1:
+            if self.limiter.adaptive:
+                self.stdout.write(
+                    f"Using {self.workers} workers with an adaptive limit of 1-{self.max_inflight} concurrent Ollama requests"
+                )
+            else:
+                self.stdout.write(f"Using {self.workers} workers with at most {self.max_inflight} concurrent Ollama requests")
+            self.process_concurrently(hotels, total_hotels, self.workers)
+        else:
+            for index, hotel in enumerate(hotels, 1):
+                self.stdout.write(f"Processing hotel {index}/{total_hotels}: {hotel.hotel_name}")
+                self.record_result(self.process_hotel(hotel))
+
+    def report_metrics(self, report_path=None, prometheus_path=None):
+        if self.cache.enabled:
+            self.stdout.write(f"LLM cache: {self.cache.hits} hits, {self.cache.misses} misses")
+        summary = self.metrics.summary()
+        ollama = summary['ollama']
+        self.stdout.write(
+            f"Prompts: {sum(summary['prompts'].values())} ({summary['cached_prompts']} cached), "
+            f"{summary['average_prompt_seconds'] * 1000:.0f} ms average, {summary['retries']} retries"
+        )
+        if summary['unparsed_reviews']:
+            self.stdout.write(self.style.WARNING(
+                f"Ratings: {summary['unparsed_reviews']} reviews had no parsable rating, "
+                f"{summary['unrated_reviews']} were saved without one"
+            ))
+        self.stdout.write(
+            f"Ollama time: {ollama.get('prompt_eval_seconds', 0):.1f}s prompt eval, "
+            f"{ollama.get('eval_seconds', 0):.1f}s generation, {ollama.get('load_seconds', 0):.1f}s model load"
+        )
+        self.stdout.write(
+            f"Database time: {summary['db_read_seconds']:.1f}s reading, {summary['db_write_seconds']:.1f}s writing, "
+            f"{summary['db_cache_seconds']:.1f}s in the LLM cache"
+        )
+        if len(self.client.endpoints) > 1:
+            for endpoint in self.client.endpoints:
+                self.stdout.write(
+                    f"Ollama at {endpoint.url}: {endpoint.requests} requests, {endpoint.errors} errors, "
+                    f"ejected {endpoint.ejections} times"
+                )
+        if self.duplicates.reused:
+            self.stdout.write(
+                f"Duplicates: reused content for {self.duplicates.reused} hotels, "
+                f"saving {self.duplicates.calls_saved} LLM calls"
+            )
+        if summary['rejected_fields']:
+            rejected = ", ".join(f"{field} {count}" for field, count in summary['rejected_fields'].items())
+            self.stdout.write(self.style.WARNING(
+                f"Quality gate: rejected {sum(summary['rejected_fields'].values())} generated fields ({rejected})"
+            ))
+        if self.limiter.adaptive:
+            self.stdout.write(
+                f"Concurrency limit: {self.limiter.current} at the end, {self.limiter.peak} at peak, "
+                f"reduced {self.limiter.decreases} times"
+            )
+        first_token_times = self.metrics.first_token_times
+        if first_token_times:
+            average = sum(first_token_times) / len(first_token_times)
+            self.stdout.write(
+                f"Time to first token: {average * 1000:.0f} ms average, "
+                f"{max(first_token_times) * 1000:.0f} ms max"
+            )
+        if report_path:
+            self.metrics.write_report(report_path)
+            self.stdout.write(f"Wrote run report to {report_path}")
+        if prometheus_path:
+            self.metrics.write_prometheus(prometheus_path)
+            self.stdout.write(f"Wrote Prometheus metrics to {prometheus_path}")
+
+    def iter_hotels(self, queryset, chunk_size, limit=None, skip_processed=False):
+        """Stream hotels ordered by id using keyset pagination, one chunk at a time"""
+        last_id = None
+        remaining = limit
+        while remaining is None or remaining > 0:
+            started = time.monotonic()
+            page = queryset.order_by('id')
+            if last_id is not None:
+                page = page.filter(id__gt=last_id)
+            chunk = list(page[:chunk_size])
+            pending = self.exclude_processed(chunk) if skip_processed and chunk else chunk
+            if remaining is not None:
+                pending = pending[:remaining]
+                remaining -= len(pending)
+            if self.track_state and pending:
+                self.mark_running(pending)
+            self.metrics.record_db_read(time.monotonic() - started)
+            yield from pending
+            if len(chunk) < chunk_size:
+                return
+            last_id = chunk[-1].id
+
+    def exclude_processed(self, hotels):
+        """Drop hotels whose requested fields are all current for their model, prompts and source data.
+
+        Hotels that only need some fields regenerated are recorded in planned_fields. Only
+        finished hotels can be skipped: mark_running stores the new input hash before anything
+        is generated, so an interrupted hotel would otherwise look current.
+        """
+        states = {
+            hotel_id: (input_hash, field_versions)
+            for hotel_id, input_hash, field_versions in HotelProcessingState.objects.filter(
+                hotel_id__in=[hotel.id for hotel in hotels],
+                model=self.MODEL_NAME,
+                status=HotelProcessingState.DONE,
+            ).values_list('hotel_id', 'input_hash', 'field_versions')
+        }
+        pending = []
+        for hotel in hotels:
+            input_hash, field_versions = states.get(hotel.id, (None, {}))
+            if input_hash != hotel.source_hash():
+                pending.append(hotel)
+                continue
+            stale = tuple(field for field in self.fields if not prompts.is_current(field_versions.get(field)))
+            if stale:
+                pending.append(hotel)
+                if stale != self.fields:
+                    self.planned_fields[hotel.id] = stale
+        self.skipped += len(hotels) - len(pending)
+        return pending
+
+    def resume_start_id(self, queryset):
+        """Return the hotel id an interrupted run over queryset should continue from"""
+        # Only states of the selected hotels count, so resuming one city is not moved on by another
+        states = HotelProcessingState.objects.filter(hotel__in=queryset.values('id'))
+        # Hotels still marked as running were in flight when the last run stopped
+        interrupted = states.filter(
+            status=HotelProcessingState.RUNNING
+        ).aggregate(hotel_id=Min('hotel_id'))['hotel_id']
+        if interrupted is not None:
+            return interrupted
+        last_done = states.filter(
+            status=HotelProcessingState.DONE
+        ).aggregate(hotel_id=Max('hotel_id'))['hotel_id']
+        return last_done + 1 if last_done is not None else None
+
+    def mark_running(self, hotels):
+        """Record a chunk of hotels as in progress so --resume can find where a run stopped.
+
+        Hotels whose source data changed lose their stored field versions, so fields a partial
+        --fields run does not regenerate are not taken as current for the new data.
+        """
+        now = timezone.now()
+        hashes = {hotel.id: hotel.source_hash() for hotel in hotels}
+        changed = [
+            hotel_id for hotel_id, input_hash in HotelProcessingState.objects.filter(
+                hotel_id__in=list(hashes)
+            ).values_list('hotel_id', 'input_hash')
+            if input_hash != hashes[hotel_id]
+        ]
+        if changed:
+            HotelProcessingState.objects.filter(hotel_id__in=changed).update(field_versions={})
+        HotelProcessingState.objects.bulk_create(
+            [
+                HotelProcessingState(
+                    hotel=hotel,
+                    status=HotelProcessingState.RUNNING,
+                    model=self.MODEL_NAME,
+                    prompt_version=prompts.registry_version(),
+                    input_hash=hashes[hotel.id],
+                    started_at=now,
+                )
+                for hotel in hotels
+            ],
+            update_conflicts=True,
+            unique_fields=['hotel'],
+            update_fields=['status', 'model', 'prompt_version', 'input_hash', 'started_at', 'finished_at', 'error'],
+        )
+
+    def record_result(self, result):
+        """Queue a hotel's generated content for the next batched write"""
+        if result is not None:
+            self.writer.add(result)
+
+    def process_concurrently(self, hotels, total_hotels, workers):
+        """Process hotels on a bounded thread pool, printing each hotel's output in order"""
+        # Only keep a small window of hotels queued so memory stays bounded
+        window = deque()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hotel-worker') as executor:
+            try:
+                for index, hotel in enumerate(hotels, 1):
+                    window.append(executor.submit(self.process_in_worker, index, total_hotels, hotel))
+                    if len(window) >= workers * 2:
+                        self.finish_in_order(window.popleft())
+                while window:
+                    self.finish_in_order(window.popleft())
+            finally:
+                # After an error or an interrupt, hotels that have not started are dropped so the
+                # workers are free to close their connections
+                for future in window:
+                    future.cancel()
+                self.close_worker_connections(executor, workers)
+
+    def finish_in_order(self, future):
+        # Results are written in submission order so --resume never skips an unwritten hotel
+        output, result = future.result()
+        self.write_buffered(output)
+        self.record_result(result)
+
+    def process_in_worker(self, index, total_hotels, hotel):
+        """Process one hotel on a worker thread and return its buffered output and result"""
+        self._local.buffer = []
+        try:
+            if self.limiter.adaptive:
+                self.log(
+                    f"Processing hotel {index}/{total_hotels}: {hotel.hotel_name} "
+                    f"(concurrency limit {self.limiter.current})"
+                )
+            else:
+                self.log(f"Processing hotel {index}/{total_hotels}: {hotel.hotel_name}")
+            result = self.process_hotel(hotel)
+        finally:
+            output, self._local.buffer = self._local.buffer, None
+        return output, result
+
+    def write_buffered(self, output):
+        for message, ending in output:
+            self.log(message, ending=ending)
+
+    def close_worker_connections(self, executor, workers):
+        """Close the database connection held by each worker thread"""
+        # Django connections are per thread, so every worker has to close its own.
+        # The barrier makes sure each task lands on a different thread.
+        barrier = threading.Barrier(workers)
+
+        def close():
+            connections.close_all()
+            barrier.wait()
+
+        for future in [executor.submit(close) for _ in range(workers)]:
+            future.result()
+
+    def request_data(self, prompt, format=None, field=None, attempt=0):
+        """Build the Ollama request for a prompt.
+
+        Returns the request, the options its response is cached under and whether
+        streaming stops at the first line. Regenerations are cached under their attempt
+        number so they do not get the rejected response back from the cache.
+        """
         data = {
             "model": self.MODEL_NAME,
             "prompt": prompt,
             "stream": False
         }
-        
+        if self.keep_alive is not None:
+            data["keep_alive"] = self.keep_alive
+        if format is not None:
+            data["format"] = format
+
+        options = {"format": format}
+        stop_at_newline = False
+        if self.stream and field in self.FIELD_TOKEN_BUDGETS:
+            data["options"] = {"num_predict": self.FIELD_TOKEN_BUDGETS[field]}
+            stop_at_newline = field in self.SINGLE_LINE_FIELDS
+            options.update(data["options"], stop_at_newline=stop_at_newline)
+        if attempt:
+            options["attempt"] = attempt
+        return data, options, stop_at_newline
+
+    def generate_ollama_content(self, prompt, format=None, field=None, attempt=0, accept=None):
+        """Generate content using Ollama API with Llama3.2.
+
+        accept decides whether a response is good enough to cache; a rejected response is
+        returned but not cached, so the next run asks the model again.
+        """
+        data, options, stop_at_newline = self.request_data(prompt, format, field, attempt)
+        hotel_id = getattr(self._local, 'hotel_id', None)
+        cache_key = self.cache.make_key(self.MODEL_NAME, prompt, options)
+        lookup_started = time.monotonic()
+        cached = self.cache.get(cache_key, accept=accept)
+        self.metrics.record_db_cache(time.monotonic() - lookup_started)
+        if cached is not None:
+            self.metrics.record_prompt(hotel_id, field, 0.0, cached=True)
+            return cached
+        self._local.llm_calls = getattr(self._local, 'llm_calls', 0) + 1
+
+        started = time.monotonic()
+        stats = {}
+        retries = 0
         try:
-            response = requests.post(url, json=data)
-            if response.status_code == 200:
-                return response.json()['response']
-            self.stdout.write(self.style.WARNING(f"Failed to generate content. Status code: {response.status_code}"))
-            return None
+            with self.limiter.slot(field) as slot:
+                if self.stream:
+                    content, stats, retries = self.stream_content(data, stop_at_newline)
+                else:
+                    response = self.client.generate(data)
+                    retries = self.client.retries_used(response)
+                    if response.status_code == 200:
+                        stats = response.json()
+                        content = stats['response']
+                    else:
+                        self.log(self.style.WARNING(f"Failed to generate content. Status code: {response.status_code}"))
+                        content = None
+                if content is None:
+                    slot.failed()
+            if content is not None and (accept is None or accept(content)):
+                stored_started = time.monotonic()
+                self.cache.set(cache_key, self.MODEL_NAME, content)
+                self.metrics.record_db_cache(time.monotonic() - stored_started)
+            return content
         except requests.exceptions.RequestException as e:
-            self.stdout.write(self.style.ERROR(f"Error generating content: {str(e)}"))
+            self.log(self.style.ERROR(f"Error generating content: {str(e)}"))
             return None
+        finally:
+            self.metrics.record_prompt(hotel_id, field, time.monotonic() - started, stats, retries)
+
+    def stream_content(self, data, stop_at_newline=False):
+        """Read Ollama's token stream, stopping early once a single-line field has its line.
+
+        Returns the text, the stats from Ollama's final chunk and the number of retries.
+        """
+        started = time.monotonic()
+        first_token_seen = False
+        tokens = []
+        with self.client.generate_stream(data) as response:
+            retries = self.client.retries_used(response)
+            if response.status_code != 200:
+                self.log(self.style.WARNING(f"Failed to generate content. Status code: {response.status_code}"))
+                return None, {}, retries
+            for chunk in self.client.iter_stream(response):
+                token = chunk.get("response", "")
+                if token and not first_token_seen:
+                    first_token_seen = True
+                    self.metrics.record_first_token(time.monotonic() - started)
+                tokens.append(token)
+                if stop_at_newline:
+                    text = "".join(tokens).lstrip()
+                    if "\n" in text:
+                        # Leaving the with block closes the connection, which makes Ollama stop generating
+                        return text.split("\n", 1)[0], {}, retries
+                if chunk.get("done"):
+                    return "".join(tokens), chunk, retries
+        return "".join(tokens), {}, retries
+
+    def generate_structured(self, context):
+        """Generate every field in a single JSON-format request and return the valid ones"""
+        prompt = prompts.render("structured", **context)
+        response = self.generate_ollama_content(prompt, format=STRUCTURED_SCHEMA, field="structured")
+        if not response:
+            return {}
+        try:
+            payload = json.loads(response)
+        except ValueError:
+            self.log(self.style.WARNING("Structured response was not valid JSON"))
+            return {}
+        return self.validate_structured(payload)
+
+    def validate_structured(self, payload):
+        """Keep only the fields of a structured response that match the schema"""
+        if not isinstance(payload, dict):
+            return {}
+
+        valid = {}
+        for field in ("title", "description", "summary", "review"):
+            value = payload.get(field)
+            if isinstance(value, str):
+                value = postprocess.clean(field, value)
+                if postprocess.problem(field, value) is None:
+                    valid[field] = value
+
+        rating = validate_rating(payload.get("rating"))
+        if rating is not None:
+            valid["rating"] = rating
+        return valid
+
+    def extract_rating(self, review):
+        """Parse the rating out of a review, asking for it in JSON format if the text has none.
+
+        Returns None when neither gives a rating out of 5.
+        """
+        rating = parse_rating(review)
+        if rating is not None:
+            return rating
+        self.log(self.style.WARNING("Could not parse a rating from the review, asking for it as JSON"))
+        response = self.generate_ollama_content(
+            prompts.render("rating", review=review), format=RATING_SCHEMA, field="rating"
+        )
+        try:
+            payload = json.loads(response) if response else {}
+        except ValueError:
+            payload = {}
+        rating = validate_rating(payload.get("rating")) if isinstance(payload, dict) else None
+        self.metrics.record_unparsed_review(recovered=rating is not None)
+        if rating is None:
+            self.log(self.style.WARNING("No valid rating for the review; saving it without one"))
+        return rating
+
+    def generated_or_prompt(self, generated, field, context):
+        """Return a field from the structured response, or generate it with its own prompt.
+
+        The text is cleaned up and validated, and generated again while it fails validation
+        and the retry budgets allow. Also returns the key of the prompt template the text
+        came from; the text is None if no valid one was generated.
+        """
+        if field in generated:
+            return generated[field], prompts.PROMPTS["structured"].key
+        key = prompts.PROMPTS[field].key
+        prompt = prompts.render(field, **context)
+
+        def passes(response):
+            return postprocess.problem(field, postprocess.clean(field, response)) is None
+
+        self.log(f"Generating {field}...")
+        for attempt in range(self.field_retries + 1):
+            if attempt and not self.take_retry():
+                self.log(self.style.WARNING(f"Retry budget used up; leaving {field} for a later run"))
+                break
+            # Only responses that pass validation are cached, so a rejected field is asked for again next run
+            response = self.generate_ollama_content(prompt, field=field, attempt=attempt, accept=passes)
+            if response is None:
+                # The request itself failed and was already retried by the client
+                break
+            text = postprocess.clean(field, response)
+            reason = postprocess.problem(field, text)
+            if reason is None:
+                return text, key
+            self.metrics.record_rejected_field(field)
+            self.log(self.style.WARNING(f"Rejected {field}: {reason}"))
+        return None, key
+
+    def take_retry(self):
+        """Use one regeneration from the run's retry budget, if any is left"""
+        with self._budget_lock:
+            if self.retry_budget is None:
+                return True
+            if self.retry_budget <= 0:
+                return False
+            self.retry_budget -= 1
+            return True
 
     def process_hotel(self, hotel):
+        """Return an unsaved HotelResult for one hotel, reusing a duplicate listing's content when possible"""
+        fields = self.planned_fields.pop(hotel.id, self.fields)
+        if not self.duplicates.enabled:
+            return self.generate_hotel(hotel, fields)
+
+        group, leader = self.duplicates.join((fingerprint(hotel), fields))
+        if not leader:
+            shared = group.wait()
+            if shared is not None:
+                self.duplicates.record_reuse(group)
+                self.log(f"Reusing content generated for duplicate hotel {shared.hotel.id}")
+                self.metrics.record_hotel(hotel.id, 0.0, None)
+                return replace(shared, hotel=hotel)
+            return self.generate_hotel(hotel, fields)
+
+        self._local.llm_calls = 0
+        result = None
         try:
-            hotel_info = f"""
-            Hotel Name: {hotel.hotel_name}
-            Address: {hotel.hotel_address}
-            Price: ${hotel.price}
-            Rating: {hotel.rating}
-            Room Type: {hotel.room_type}
-            Location: Lat {hotel.lat}, Lng {hotel.lng}
-            """
-            self.stdout.write("Generating summary...")
-            summary_prompt = f"Generate a concise summary of this hotel's key features based on this hotel info and don't use any stars anywhere:\n{hotel_info}"
-            summary_response = self.generate_ollama_content(summary_prompt)
-            
-            if summary_response:
-                HotelSummary.objects.create(
-                    hotel=hotel,
-                    summary=summary_response,
-                    property_id=hotel.hotel_id
-                )
-                self.stdout.write(self.style.SUCCESS("Summary generated successfully"))
+            result = self.generate_hotel(hotel, fields)
+        finally:
+            # Followers fall back to generating on their own if the leader failed
+            group.publish(result if result is not None and result.error is None else None, self._local.llm_calls)
+        return result
+
+    def generate_hotel(self, hotel, fields=prompts.FIELDS):
+        """Generate the requested fields for one hotel and return them as an unsaved HotelResult"""
+        result = HotelResult(hotel, fields=tuple(fields))
+        started = time.monotonic()
+        self._local.hotel_id = hotel.id
+        try:
+            context = prompts.hotel_context(hotel)
+            generated = {}
+            if self.structured and len(fields) > 1:
+                self.log("Generating all fields in one request...")
+                generated = self.generate_structured(context)
+                # An invalid rating is recovered from the review rather than with its own prompt
+                missing = [field for field in STRUCTURED_SCHEMA["required"] if field not in generated and field != "rating"]
+                if missing:
+                    self.log(self.style.WARNING(f"Falling back to per-field prompts for: {', '.join(missing)}"))
+
+            if 'summary' in fields:
+                summary_response, key = self.generated_or_prompt(generated, "summary", context)
+                if summary_response:
+                    result.summary = summary_response
+                    result.prompt_versions['summary'] = key
+                    self.log(self.style.SUCCESS("Summary generated successfully"))
 
             # Generate review and rating
-            self.stdout.write("Generating review and rating...")
-            review_prompt = f"Based on this hotel information, generate a detailed review and suggest a rating out of 5 and don't use stars anywhere:\n{hotel_info}"
-            review_response = self.generate_ollama_content(review_prompt)
-            
-            if review_response:
-                try:
-                    rating = float(review_response.split('Rating:', 1)[1].split('/')[0].strip())
-                except:
-                    rating = 4.0  # Default rating if parsing fails
-                    
-                HotelReview.objects.create(
-                    hotel=hotel,
-                    rating=rating,
-                    review=review_response,
-                    property_id=hotel.hotel_id
-                )
+            if 'review' in fields:
+                if "review" in generated:
+                    review_response = generated["review"]
+                    key = prompts.PROMPTS["structured"].key
+                    # A valid review is kept when only its rating is invalid
+                    rating = generated["rating"] if "rating" in generated else self.extract_rating(review_response)
+                else:
+                    review_response, key = self.generated_or_prompt({}, "review", context)
+                    if review_response:
+                        rating = self.extract_rating(review_response)
+
+                if review_response:
+                    result.review = review_response
+                    result.rating = rating
+                    result.prompt_versions['review'] = key
+                    self.log(self.style.SUCCESS("Review and rating generated successfully"))
+
+            if 'title' in fields:
+                title, key = self.generated_or_prompt(generated, "title", context)
+                if title:
+                    result.title = title
+                    result.prompt_versions['title'] = key
+                    self.log(self.style.SUCCESS(f"Generated title for hotel {hotel.id}: {title}"))
 
-                self.stdout.write(self.style.SUCCESS("Review and rating generated successfully"))
-            
-            self.stdout.write("Generating title...")
-            title_prompt = f"Create a title using this hotel name and just give one line and don't use quotation mark, just a single line: {hotel.hotel_name}"
-            title = self.generate_ollama_content(title_prompt).strip()
-            
-            # Update the hotels table directly
-            if title:
-                hotel.hotel_name = title
-                hotel.save(update_fields=["hotel_name"])
-                self.stdout.write(self.style.SUCCESS(f"Updated hotel {hotel.id}: {title}"))
-
-            self.stdout.write("Generating hotel description...")
-            description_prompt = f"Generate a detailed hotel description at least two lines about these details in a paragraph and don't use any stars or quotation marks anywhere:\n{hotel_info}"
-            description_response = self.generate_ollama_content(description_prompt).strip()
-            
-            if description_response:
-                hotel.description = description_response
-                hotel.save(update_fields=["description"])
-                self.stdout.write(self.style.SUCCESS("Description generated and saved successfully"))
+            if 'description' in fields:
+                description_response, key = self.generated_or_prompt(generated, "description", context)
+                if description_response:
+                    result.description = description_response
+                    result.prompt_versions['description'] = key
+                    self.log(self.style.SUCCESS("Description generated successfully"))
         except Exception as e:
-            self.stdout.write(self.style.ERROR(f"Error processing hotel {hotel.hotel_name}: {str(e)}"))
\ No newline at end of file
+            self.log(self.style.ERROR(f"Error processing hotel {hotel.hotel_name}: {str(e)}"))
+            result.error = str(e)
+        finally:
+            self._local.hotel_id = None
+        self.metrics.record_hotel(hotel.id, time.monotonic() - started, result.error)
+        return result
@@ -0,0 +1,113 @@
+import os
+import socket
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+
+from properties.jobs import claim_jobs, complete_jobs, extend_jobs
+from properties.management.commands.process_hotels import Command as ProcessHotelsCommand
+
+
+class Command(BaseCommand):
+    help = 'Claim queued hotel jobs and process them with Ollama'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=20,
+            help='Number of jobs claimed per query (default: 20)'
+        )
+        parser.add_argument(
+            '--visibility-timeout', type=int, default=1800,
+            help='Seconds without a heartbeat before a claimed job is given to another worker (default: 1800)'
+        )
+        parser.add_argument(
+            '--max-attempts', type=int, default=3,
+            help='Attempts before a failing job is marked as failed (default: 3)'
+        )
+        parser.add_argument(
+            '--retry-delay', type=int, default=60,
+            help='Seconds before a failed job can be claimed again (default: 60)'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=5,
+            help='Seconds to wait before polling an empty queue again (default: 5)'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit when the queue is empty instead of waiting for new jobs'
+        )
+        ProcessHotelsCommand.add_generation_arguments(parser)
+
+    def handle(self, *args, **options):
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        processor = ProcessHotelsCommand(stdout=self.stdout._out, stderr=self.stderr._out)
+        processor.configure(**options)
+        if not processor.ensure_model():
+            raise CommandError(f"{processor.MODEL_NAME} model is not available")
+
+        # Jobs are completed in the same transaction that writes their hotel's content
+        claimed = {}
+
+        def complete(batch):
+            jobs = [claimed.pop(result.hotel.id) for result in batch if result.hotel.id in claimed]
+            complete_jobs(jobs, batch, options['max_attempts'], options['retry_delay'])
+        processor.writer.on_flush = complete
+
+        # Keeps the claim on unfinished jobs while a slow batch runs, so only jobs of a
+        # worker that died become claimable again
+        stopped = threading.Event()
+        heartbeat = threading.Thread(
+            target=self.heartbeat, args=(claimed, options['visibility_timeout'], stopped), daemon=True
+        )
+        heartbeat.start()
+
+        self.stdout.write(f"Worker {worker_id} waiting for jobs...")
+        processed = 0
+        try:
+            while True:
+                jobs = claim_jobs(worker_id, options['batch_size'], options['visibility_timeout'])
+                if not jobs:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                claimed.update((job.hotel_id, job) for job in jobs)
+                # Duplicates are only shared within a batch; a hotel processed in an earlier batch
+                # may have changed, or been generated with older prompts, since then
+                processor.duplicates.clear()
+                hotels = [job.hotel for job in jobs]
+                processor.mark_running(hotels)
+                processor.process_all(hotels, len(hotels))
+                processor.writer.flush()
+                if claimed:
+                    # Hotels that produced no result go back on the queue
+                    complete_jobs(list(claimed.values()), [], options['max_attempts'], options['retry_delay'])
+                    claimed.clear()
+                processed += len(jobs)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping worker...")
+        finally:
+            processor.writer.flush()
+            processor.client.close()
+            stopped.set()
+            heartbeat.join()
+
+        self.stdout.write(self.style.SUCCESS(f"Worker {worker_id} processed {processed} jobs"))
+        processor.report_metrics(options.get('report'), options.get('prometheus_textfile'))
+
+    def heartbeat(self, claimed, visibility_timeout, stopped):
+        """Extend the visibility timeout of the jobs still being processed a few times per timeout"""
+        try:
+            while not stopped.wait(visibility_timeout / 3):
+                jobs = list(claimed.values())
+                if jobs:
+                    try:
+                        extend_jobs(jobs, visibility_timeout)
+                    except DatabaseError as e:
+                        self.stderr.write(f"Could not extend the claim on {len(jobs)} jobs: {e}")
+                        connection.close()
+        finally:
+            connection.close()
@@ -0,0 +1,74 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from properties.embeddings import DEFAULT_MODEL, Embedder, EmbeddingError, EmbeddingIndex
+from properties.models import Hotel
+from properties.ollama import OllamaClient
+
+
+class Command(BaseCommand):
+    help = 'Find the hotels whose generated content is most similar to a hotel or a search text'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'hotel_id', type=int, nargs='?',
+            help='Id of the hotel to find similar hotels for'
+        )
+        parser.add_argument(
+            '--query', default=None,
+            help='Search text to embed and match instead of a hotel'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=10,
+            help='Number of hotels to show (default: 10)'
+        )
+        parser.add_argument(
+            '--model', default=DEFAULT_MODEL,
+            help=f'Embedding model the hotels were embedded with (default: {DEFAULT_MODEL})'
+        )
+        parser.add_argument(
+            '--index-file', default=None,
+            help='Memory-map embeddings written by embed_hotels --index-file instead of reading them from the database'
+        )
+        parser.add_argument(
+            '--ollama-urls', default=None,
+            help='Comma-separated Ollama base URLs, used to embed --query'
+        )
+
+    def handle(self, *args, **options):
+        if (options['hotel_id'] is None) == (options['query'] is None):
+            raise CommandError("Give either a hotel id or --query")
+
+        started = time.monotonic()
+        if options['index_file']:
+            index = EmbeddingIndex.open(options['index_file'])
+            if index.model != options['model']:
+                raise CommandError(f"{options['index_file']} holds {index.model} embeddings, not {options['model']}")
+        else:
+            index = EmbeddingIndex.from_database(options['model'])
+        loaded = time.monotonic()
+
+        try:
+            if options['query'] is not None:
+                client = OllamaClient(base_url=options['ollama_urls'], model=options['model'])
+                try:
+                    vector = Embedder(client, options['model']).embed([options['query']])[0]
+                finally:
+                    client.close()
+                embedded = time.monotonic()
+                matches = index.search(vector, options['limit'])
+            else:
+                embedded = loaded
+                matches = index.similar(options['hotel_id'], options['limit'])
+        except EmbeddingError as e:
+            raise CommandError(str(e))
+        searched = time.monotonic()
+
+        names = dict(Hotel.objects.filter(id__in=[hotel_id for hotel_id, _ in matches]).values_list('id', 'hotel_name'))
+        for hotel_id, score in matches:
+            self.stdout.write(f"{score:.3f}  {hotel_id}  {names.get(hotel_id, '')}")
+        self.stdout.write(
+            f"Searched {len(index)} hotels in {(searched - embedded) * 1000:.1f} ms "
+            f"(loaded the index in {(loaded - started) * 1000:.0f} ms)"
+        )
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand
+
+from properties.changes import ChangeFeed
+from properties.jobs import enqueue_hotels
+from properties.models import Hotel
+
+
+class Command(BaseCommand):
+    help = 'Queue hotels for run_llm_worker as soon as the scraper inserts or changes them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--debounce', type=float, default=2,
+            help='Seconds without a new change before the waiting changes are queued (default: 2)'
+        )
+        parser.add_argument(
+            '--max-batch', type=int, default=500,
+            help='Changes queued at once; a full batch is queued without waiting (default: 500)'
+        )
+        parser.add_argument(
+            '--max-wait', type=float, default=30,
+            help='Seconds a change can wait for the scraper to pause before it is queued anyway (default: 30)'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=5,
+            help='Seconds between checks of the change log when no notification arrives (default: 5)'
+        )
+        parser.add_argument(
+            '--no-listen', action='store_true',
+            help='Poll the change log instead of waiting for NOTIFY'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Queue the changes already logged and exit'
+        )
+
+    def handle(self, *args, **options):
+        feed = ChangeFeed(
+            debounce=options['debounce'],
+            max_batch=options['max_batch'],
+            max_wait=options['max_wait'],
+            poll_interval=options['poll_interval'],
+            listen=not options['no_listen'],
+        )
+        totals = {'changed': 0, 'queued': 0}
+
+        def enqueue(hotel_ids):
+            # Hotels deleted since they changed are left out
+            hotels = list(Hotel.objects.filter(id__in=hotel_ids).only('id'))
+            queued = enqueue_hotels(hotels)
+            totals['changed'] += len(hotel_ids)
+            totals['queued'] += queued
+            self.stdout.write(f"Queued {queued} of {len(hotel_ids)} changed hotels")
+
+        try:
+            if not options['once']:
+                self.stdout.write("Watching for hotel changes...")
+            feed.run(enqueue, once=options['once'])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping watcher...")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Queued {totals['queued']} of {totals['changed']} changed hotels; "
+            "the rest were already queued or deleted"
+        ))
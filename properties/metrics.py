@@ -0,0 +1,210 @@
+import csv
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+# Ollama reports durations in nanoseconds
+OLLAMA_DURATIONS = ("prompt_eval_duration", "eval_duration", "load_duration")
+OLLAMA_COUNTS = ("prompt_eval_count", "eval_count")
+
+PROMPT_COLUMNS = (
+    "hotel_id", "field", "seconds", "cached", "retries",
+    "prompt_eval_count", "eval_count", "prompt_eval_seconds", "eval_seconds", "load_seconds",
+)
+
+
+class RunMetrics:
+    """Per-prompt and per-hotel timings for a process_hotels run"""
+
+    def __init__(self, keep_records=False):
+        # Individual records are only kept when a report is written, so long runs stay small in memory
+        self.keep_records = keep_records
+        self.prompts = []
+        self.hotels = []
+        self.first_token_times = []
+        self.started = time.time()
+        # Set once the model is loaded, so warm-up is not counted as processing time
+        self.processing_started = None
+        self.prompt_count = defaultdict(int)
+        self.prompt_seconds = defaultdict(float)
+        self.cached_prompts = 0
+        self.retries = 0
+        self.ollama_totals = defaultdict(int)
+        # Prompts answered by Ollama and tokens it generated for them, by field
+        self.field_eval_counts = defaultdict(lambda: [0, 0])
+        self.hotel_count = defaultdict(int)
+        self.hotel_seconds = 0.0
+        self.db_write_seconds = 0.0
+        self.db_read_seconds = 0.0
+        # LLM response cache lookups and writes, which are database queries too
+        self.db_cache_seconds = 0.0
+        # Reviews whose text had no usable rating, and those still without one after the JSON retry
+        self.unparsed_reviews = 0
+        self.unrated_reviews = 0
+        # Generated fields that failed validation after cleanup, by field
+        self.rejected_fields = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record_prompt(self, hotel_id, field, seconds, stats=None, retries=0, cached=False):
+        stats = stats or {}
+        record = {
+            "hotel_id": hotel_id,
+            "field": field,
+            "seconds": round(seconds, 6),
+            "cached": cached,
+            "retries": retries,
+        }
+        for key in OLLAMA_COUNTS:
+            record[key] = stats.get(key, 0)
+        for key in OLLAMA_DURATIONS:
+            record[key.replace("_duration", "_seconds")] = stats.get(key, 0) / 1e9
+
+        with self._lock:
+            self.prompt_count[field] += 1
+            self.prompt_seconds[field] += seconds
+            self.cached_prompts += cached
+            self.retries += retries
+            for key in OLLAMA_COUNTS:
+                self.ollama_totals[key] += record[key]
+            if not cached and record["eval_count"]:
+                self.field_eval_counts[field][0] += 1
+                self.field_eval_counts[field][1] += record["eval_count"]
+            for key in OLLAMA_DURATIONS:
+                name = key.replace("_duration", "_seconds")
+                self.ollama_totals[name] += record[name]
+            if self.keep_records:
+                self.prompts.append(record)
+
+    def record_first_token(self, seconds):
+        with self._lock:
+            self.first_token_times.append(seconds)
+
+    def record_hotel(self, hotel_id, seconds, error=None):
+        with self._lock:
+            self.hotel_count["failed" if error else "done"] += 1
+            self.hotel_seconds += seconds
+            if self.keep_records:
+                self.hotels.append({
+                    "hotel_id": hotel_id,
+                    "seconds": round(seconds, 6),
+                    "error": error,
+                })
+
+    def record_unparsed_review(self, recovered):
+        with self._lock:
+            self.unparsed_reviews += 1
+            self.unrated_reviews += not recovered
+
+    def record_rejected_field(self, field):
+        with self._lock:
+            self.rejected_fields[field] += 1
+
+    def record_db_write(self, seconds):
+        with self._lock:
+            self.db_write_seconds += seconds
+
+    def record_db_read(self, seconds):
+        with self._lock:
+            self.db_read_seconds += seconds
+
+    def record_db_cache(self, seconds):
+        with self._lock:
+            self.db_cache_seconds += seconds
+
+    def start_processing(self):
+        self.processing_started = time.time()
+
+    @property
+    def processing_seconds(self):
+        """Time since the model was loaded, or since the run started if it never was"""
+        return time.time() - (self.processing_started or self.started)
+
+    def summary(self):
+        total_prompts = sum(self.prompt_count.values())
+        return {
+            "run_seconds": round(time.time() - self.started, 3),
+            "processing_seconds": round(self.processing_seconds, 3),
+            "hotels": dict(self.hotel_count),
+            "hotel_seconds": round(self.hotel_seconds, 3),
+            "prompts": dict(self.prompt_count),
+            "prompt_seconds": {field: round(value, 3) for field, value in self.prompt_seconds.items()},
+            "average_prompt_seconds": round(sum(self.prompt_seconds.values()) / total_prompts, 3) if total_prompts else 0,
+            "cached_prompts": self.cached_prompts,
+            "retries": self.retries,
+            "unparsed_reviews": self.unparsed_reviews,
+            "unrated_reviews": self.unrated_reviews,
+            "rejected_fields": dict(self.rejected_fields),
+            "ollama": {key: round(value, 3) for key, value in self.ollama_totals.items()},
+            "db_read_seconds": round(self.db_read_seconds, 3),
+            "db_write_seconds": round(self.db_write_seconds, 3),
+            "db_cache_seconds": round(self.db_cache_seconds, 3),
+            "first_token_seconds": (
+                round(sum(self.first_token_times) / len(self.first_token_times), 3)
+                if self.first_token_times else None
+            ),
+        }
+
+    def write_report(self, path):
+        """Write a JSON report, or a CSV of per-prompt records when the path ends in .csv"""
+        if path.endswith(".csv"):
+            with open(path, "w", newline="") as report:
+                writer = csv.DictWriter(report, fieldnames=PROMPT_COLUMNS)
+                writer.writeheader()
+                writer.writerows(self.prompts)
+            return
+        with open(path, "w") as report:
+            json.dump({"summary": self.summary(), "hotels": self.hotels, "prompts": self.prompts}, report, indent=2)
+
+    def write_prometheus(self, path):
+        """Write metrics in the Prometheus textfile collector format"""
+        lines = [
+            "# HELP process_hotels_hotels_total Hotels processed in the last run.",
+            "# TYPE process_hotels_hotels_total gauge",
+        ]
+        for status, count in sorted(self.hotel_count.items()):
+            lines.append(f'process_hotels_hotels_total{{status="{status}"}} {count}')
+        lines += [
+            "# HELP process_hotels_prompts_total Prompts sent or served from cache in the last run.",
+            "# TYPE process_hotels_prompts_total gauge",
+        ]
+        for field, count in sorted(self.prompt_count.items()):
+            lines.append(f'process_hotels_prompts_total{{field="{field}"}} {count}')
+        lines += [
+            "# HELP process_hotels_prompt_seconds_total Wall time spent on prompts in the last run.",
+            "# TYPE process_hotels_prompt_seconds_total gauge",
+        ]
+        for field, seconds in sorted(self.prompt_seconds.items()):
+            lines.append(f'process_hotels_prompt_seconds_total{{field="{field}"}} {seconds:.6f}')
+        lines += [
+            "# HELP process_hotels_rejected_fields_total Generated fields that failed validation in the last run.",
+            "# TYPE process_hotels_rejected_fields_total gauge",
+        ]
+        for field, count in sorted(self.rejected_fields.items()):
+            lines.append(f'process_hotels_rejected_fields_total{{field="{field}"}} {count}')
+        lines += [
+            "# HELP process_hotels_ollama_total Token counts and durations reported by Ollama in the last run.",
+            "# TYPE process_hotels_ollama_total gauge",
+        ]
+        for key, value in sorted(self.ollama_totals.items()):
+            lines.append(f'process_hotels_ollama_total{{stat="{key}"}} {value:.6f}')
+        gauges = {
+            "process_hotels_cached_prompts": (self.cached_prompts, "Prompts served from the response cache."),
+            "process_hotels_retries": (self.retries, "Ollama request retries."),
+            "process_hotels_unparsed_reviews": (self.unparsed_reviews, "Reviews without a rating in their text."),
+            "process_hotels_unrated_reviews": (self.unrated_reviews, "Reviews saved without a rating."),
+            "process_hotels_db_read_seconds": (self.db_read_seconds, "Time spent reading hotels."),
+            "process_hotels_db_write_seconds": (self.db_write_seconds, "Time spent writing generated content."),
+            "process_hotels_db_cache_seconds": (self.db_cache_seconds, "Time spent reading and writing the LLM cache."),
+            "process_hotels_run_seconds": (time.time() - self.started, "Duration of the last run."),
+            "process_hotels_last_run_timestamp_seconds": (time.time(), "When the last run finished."),
+        }
+        for name, (value, help_text) in gauges.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value:.6f}"]
+
+        # Write then rename so the collector never reads a half-written file
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as textfile:
+            textfile.write("\n".join(lines) + "\n")
+        os.replace(temp_path, path)
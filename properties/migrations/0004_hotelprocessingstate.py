@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0003_llmcacheentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HotelProcessingState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='running', max_length=20)),
+                ('model', models.CharField(max_length=100)),
+                ('prompt_version', models.CharField(max_length=50)),
+                ('input_hash', models.CharField(max_length=64)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('hotel', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='processing_state', to='properties.hotel')),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0005_hoteljob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hotelprocessingstate',
+            name='field_versions',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='hotelreview',
+            name='prompt_version',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='hotelsummary',
+            name='prompt_version',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+    ]
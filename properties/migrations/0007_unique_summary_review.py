@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:45
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def remove_duplicate_outputs(apps, schema_editor):
+    """Keep only the newest summary and review of each hotel before making them unique"""
+    for model_name in ('HotelSummary', 'HotelReview'):
+        model = apps.get_model('properties', model_name)
+        latest = model.objects.values('hotel_id').annotate(latest_id=Max('id')).values('latest_id')
+        model.objects.exclude(id__in=latest).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0006_prompt_versions'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_outputs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='hotelreview',
+            name='property_id',
+            field=models.IntegerField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='hotelsummary',
+            name='property_id',
+            field=models.IntegerField(db_index=True),
+        ),
+        migrations.AddConstraint(
+            model_name='hotelreview',
+            constraint=models.UniqueConstraint(fields=('hotel',), name='unique_review_per_hotel'),
+        ),
+        migrations.AddConstraint(
+            model_name='hotelsummary',
+            constraint=models.UniqueConstraint(fields=('hotel',), name='unique_summary_per_hotel'),
+        ),
+    ]
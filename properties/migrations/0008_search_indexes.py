@@ -0,0 +1,37 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# The admin's search runs `UPPER(column::text) LIKE UPPER('%term%')`, so the trigram
+# indexes are built on the same UPPER() expressions for Postgres to use them.
+# CONCURRENTLY keeps the tables writable while the indexes build, which needs a
+# migration that is not wrapped in a transaction.
+SEARCH_INDEXES = [
+    ('properties_hotelsummary_summary_trgm', 'properties_hotelsummary', 'UPPER(summary)'),
+    ('properties_hotelreview_review_trgm', 'properties_hotelreview', 'UPPER(review)'),
+    ('hotels_hotel_name_trgm', 'hotels', 'UPPER(hotel_name)'),
+    ('hotels_hotel_address_trgm', 'hotels', 'UPPER(hotel_address)'),
+]
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('properties', '0007_unique_summary_review'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        *[
+            migrations.RunSQL(
+                sql=f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} USING gin (({expression}) gin_trgm_ops);',
+                reverse_sql=f'DROP INDEX CONCURRENTLY IF EXISTS {name};',
+            )
+            for name, table, expression in SEARCH_INDEXES
+        ],
+        # Matches Hotel.Meta.indexes; the hotels table is not managed by Django
+        migrations.RunSQL(
+            sql='CREATE INDEX CONCURRENTLY IF NOT EXISTS hotels_city_id_idx ON hotels (city_id, id);',
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS hotels_city_id_idx;',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0008_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='hotelreview',
+            name='rating',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
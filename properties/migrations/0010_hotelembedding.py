@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0009_review_rating_nullable'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HotelEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100)),
+                ('dimensions', models.IntegerField()),
+                ('vector', models.BinaryField()),
+                ('content_hash', models.CharField(max_length=64)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('hotel', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='embedding', to='properties.hotel')),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0010_hotelembedding'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessingRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100)),
+                ('finished_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('workers', models.IntegerField()),
+                ('max_inflight', models.IntegerField()),
+                ('hotels', models.IntegerField()),
+                ('wall_seconds', models.FloatField()),
+                ('prompt_eval_count', models.BigIntegerField()),
+                ('prompt_eval_seconds', models.FloatField()),
+                ('eval_count', models.BigIntegerField()),
+                ('eval_seconds', models.FloatField()),
+                ('field_eval_counts', models.JSONField(blank=True, default=dict)),
+            ],
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:00
+
+from django.db import migrations, models
+
+# Hotel.SOURCE_FIELDS: hotel_name and description are rewritten by process_hotels, so
+# changes to them must not put the hotel back on the queue
+SOURCE_FIELDS = ('hotel_id', 'city_id', 'hotel_address', 'hotel_img', 'price', 'rating', 'room_type', 'lat', 'lng')
+COLUMNS = ', '.join(SOURCE_FIELDS)
+OLD_ROW = ', '.join(f'OLD.{field}' for field in SOURCE_FIELDS)
+NEW_ROW = ', '.join(f'NEW.{field}' for field in SOURCE_FIELDS)
+
+# Postgres delivers identical notifications sent in one transaction only once, so a
+# scraper batch of any size wakes watch_hotels once; the hotel ids are read from the log.
+LOG_CHANGE_FUNCTION = '''
+CREATE OR REPLACE FUNCTION properties_log_hotel_change() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO properties_hotelchange (hotel_id, changed_at) VALUES (NEW.id, now());
+    PERFORM pg_notify('hotel_changes', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0011_processingrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HotelChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hotel_id', models.IntegerField(db_index=True)),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RunSQL(
+            sql=LOG_CHANGE_FUNCTION,
+            reverse_sql='DROP FUNCTION IF EXISTS properties_log_hotel_change();',
+        ),
+        migrations.RunSQL(
+            sql='''
+                CREATE TRIGGER hotels_log_insert AFTER INSERT ON hotels
+                FOR EACH ROW EXECUTE PROCEDURE properties_log_hotel_change();
+            ''',
+            reverse_sql='DROP TRIGGER IF EXISTS hotels_log_insert ON hotels;',
+        ),
+        # The WHEN clause skips updates that rewrite a source column with the value it already had
+        migrations.RunSQL(
+            sql=f'''
+                CREATE TRIGGER hotels_log_update AFTER UPDATE OF {COLUMNS} ON hotels
+                FOR EACH ROW WHEN (({OLD_ROW}) IS DISTINCT FROM ({NEW_ROW}))
+                EXECUTE PROCEDURE properties_log_hotel_change();
+            ''',
+            reverse_sql='DROP TRIGGER IF EXISTS hotels_log_update ON hotels;',
+        ),
+    ]
@@ -1,22 +1,142 @@
+import hashlib
+import json
+
 from django.db import models
 
 class HotelSummary(models.Model):
     hotel = models.ForeignKey('Hotel', on_delete=models.CASCADE)
-    property_id = models.IntegerField()
+    property_id = models.IntegerField(db_index=True)
     summary = models.TextField()
+    # Key of the prompt template the summary was generated with, e.g. "summary:2"
+    prompt_version = models.CharField(max_length=50, blank=True, default='')
+
+    class Meta:
+        # One current summary per hotel; process_hotels upserts it
+        constraints = [models.UniqueConstraint(fields=['hotel'], name='unique_summary_per_hotel')]
 
     def __str__(self):
         return f"Summary for {self.hotel.hotel_name}"
 
 class HotelReview(models.Model):
     hotel = models.ForeignKey('Hotel', on_delete=models.CASCADE)
-    property_id = models.IntegerField()
-    rating = models.FloatField()
+    property_id = models.IntegerField(db_index=True)
+    # Empty when no rating out of 5 could be read from the generated review
+    rating = models.FloatField(null=True, blank=True)
     review = models.TextField()
+    prompt_version = models.CharField(max_length=50, blank=True, default='')
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['hotel'], name='unique_review_per_hotel')]
 
     def __str__(self):
         return f"Review for {self.hotel.hotel_name}"
 
+class LLMCacheEntry(models.Model):
+    # Key is a sha256 of the model name, prompt and generation options
+    key = models.CharField(max_length=64, primary_key=True)
+    model = models.CharField(max_length=100)
+    response = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Cached {self.model} response {self.key[:12]}"
+
+class HotelProcessingState(models.Model):
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    hotel = models.OneToOneField('Hotel', on_delete=models.CASCADE, related_name='processing_state')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=RUNNING, db_index=True)
+    model = models.CharField(max_length=100)
+    prompt_version = models.CharField(max_length=50)
+    input_hash = models.CharField(max_length=64)
+    # Prompt template key each output field was last generated with, e.g. {"title": "title:1"}
+    field_versions = models.JSONField(default=dict, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"{self.get_status_display()} state for hotel {self.hotel_id}"
+
+class HotelEmbedding(models.Model):
+    """Embedding of a hotel's generated title, description, summary and review"""
+    hotel = models.OneToOneField('Hotel', on_delete=models.CASCADE, related_name='embedding')
+    model = models.CharField(max_length=100)
+    dimensions = models.IntegerField()
+    # Unit-length float32 vector packed in native byte order, 4 bytes per dimension
+    vector = models.BinaryField()
+    # sha256 of the model and embedded text, so unchanged hotels are not embedded again
+    content_hash = models.CharField(max_length=64)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.model} embedding for hotel {self.hotel_id}"
+
+class ProcessingRun(models.Model):
+    """Totals of a finished process_hotels run, used by --plan to project how long a batch takes"""
+    model = models.CharField(max_length=100)
+    finished_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    workers = models.IntegerField()
+    max_inflight = models.IntegerField()
+    hotels = models.IntegerField()
+    wall_seconds = models.FloatField()
+    # Token counts and durations reported by Ollama for the prompts it answered
+    prompt_eval_count = models.BigIntegerField()
+    prompt_eval_seconds = models.FloatField()
+    eval_count = models.BigIntegerField()
+    eval_seconds = models.FloatField()
+    # [prompts answered, tokens generated] per field, e.g. {"title": [120, 1800]}
+    field_eval_counts = models.JSONField(default=dict, blank=True)
+
+    def __str__(self):
+        return f"{self.model} run of {self.hotels} hotels at {self.finished_at}"
+
+class HotelJob(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    hotel = models.ForeignKey('Hotel', on_delete=models.CASCADE)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.IntegerField(default=0)
+    # Queued jobs become claimable at visible_at; running jobs whose visible_at has
+    # passed belong to a worker that died and are claimed again
+    visible_at = models.DateTimeField()
+    claimed_by = models.CharField(max_length=255, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'visible_at'])]
+
+    def __str__(self):
+        return f"{self.get_status_display()} job for hotel {self.hotel_id}"
+
+class HotelChange(models.Model):
+    """A scraped hotel that was inserted, or had a source field updated, logged by a trigger on hotels"""
+    # Not a foreign key, so the scraper can still delete a hotel with unread changes
+    hotel_id = models.IntegerField(db_index=True)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Change to hotel {self.hotel_id} at {self.changed_at}"
+
 class Hotel(models.Model):
     # This represents your existing hotels table
     id = models.IntegerField(primary_key=True)
@@ -34,4 +154,15 @@ class Hotel(models.Model):
 
     class Meta:
         managed = False  # Since this table already exists
-        db_table = 'hotels'  # Specify the exact table name
\ No newline at end of file
+        db_table = 'hotels'  # Specify the exact table name
+        # Created with RunSQL in migration 0008, since Django does not manage this table
+        indexes = [models.Index(fields=['city_id', 'id'], name='hotels_city_id_idx')]
+
+    # hotel_name and description are rewritten by process_hotels, so they are
+    # left out of the hash to avoid treating our own output as a source change
+    SOURCE_FIELDS = ('hotel_id', 'city_id', 'hotel_address', 'hotel_img', 'price', 'rating', 'room_type', 'lat', 'lng')
+
+    def source_hash(self):
+        """Hash of the scraped fields that the generated content is based on"""
+        values = [getattr(self, field) for field in self.SOURCE_FIELDS]
+        return hashlib.sha256(json.dumps(values, default=str).encode('utf-8')).hexdigest()
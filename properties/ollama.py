@@ -0,0 +1,281 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_BASE_URL = "http://ollama:11434"
+
+
+class OllamaEndpoint:
+    """One Ollama host in the client's pool, with its routing and health state"""
+
+    def __init__(self, url, weight=1):
+        self.url = url.rstrip("/")
+        self.weight = max(weight, 1)
+        self.outstanding = 0
+        self.current_weight = 0
+        self.failures = 0
+        self.ejected_until = None
+        self.requests = 0
+        self.errors = 0
+        self.ejections = 0
+
+    @property
+    def healthy(self):
+        return self.ejected_until is None
+
+
+def parse_endpoints(value):
+    """Parse a comma-separated list of base URLs, each optionally followed by |weight"""
+    endpoints = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        url, _, weight = item.partition("|")
+        endpoints.append(OllamaEndpoint(url.strip(), int(weight) if weight.strip() else 1))
+    if not endpoints:
+        raise ValueError(f"No Ollama base URLs in {value!r}")
+    return endpoints
+
+
+class OllamaClient:
+    """Pooled HTTP client for one or more Ollama hosts with timeouts, retries and failover.
+
+    Each request goes to the healthy host with the fewest outstanding requests relative to
+    its weight, or to the next host in weighted round-robin order. A host that fails
+    failure_threshold requests in a row is ejected for eject_seconds and only re-admitted
+    once a health check against /api/show succeeds.
+    """
+
+    RETRY_STATUSES = (500, 502, 503, 504)
+    ROUTING_STRATEGIES = ("least-outstanding", "round-robin")
+    HEALTH_TIMEOUT = 10
+
+    def __init__(self, base_url=None, connect_timeout=5, read_timeout=300,
+                 retries=3, backoff_factor=0.5, pool_size=10, routing="least-outstanding",
+                 model=None, failure_threshold=3, eject_seconds=30, transport=None):
+        if routing not in self.ROUTING_STRATEGIES:
+            raise ValueError(f"Unknown routing strategy {routing!r}")
+        self.endpoints = parse_endpoints(
+            base_url or os.getenv("OLLAMA_BASE_URLS") or os.getenv("OLLAMA_BASE_URL") or DEFAULT_BASE_URL
+        )
+        self.routing = routing
+        self.model = model
+        self.failure_threshold = failure_threshold
+        self.eject_seconds = eject_seconds
+        self.timeout = (connect_timeout, read_timeout)
+        self._lock = threading.Lock()
+        retry = Retry(
+            total=retries,
+            status_forcelist=self.RETRY_STATUSES,
+            # Ollama's API is all POST, which urllib3 does not retry by default
+            allowed_methods=frozenset(["GET", "POST"]),
+            backoff_factor=backoff_factor,
+            raise_on_status=False,
+        )
+        # transport builds the requests adapter, e.g. one that records or replays traffic
+        adapter = (transport or HTTPAdapter)(
+            pool_connections=len(self.endpoints), pool_maxsize=pool_size, max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @property
+    def base_url(self):
+        return ", ".join(endpoint.url for endpoint in self.endpoints)
+
+    def acquire(self, exclude=()):
+        """Pick the endpoint for the next request and count it as outstanding"""
+        self.readmit_recovered()
+        with self._lock:
+            candidates = [e for e in self.endpoints if e not in exclude]
+            healthy = [e for e in candidates if e.healthy]
+            if healthy:
+                candidates = healthy
+            else:
+                # Every host is ejected; trying the one that comes back soonest beats failing outright
+                candidates = [min(candidates, key=lambda e: e.ejected_until)]
+            if self.routing == "round-robin":
+                endpoint = self._next_weighted(candidates)
+            else:
+                endpoint = min(candidates, key=lambda e: (e.outstanding / e.weight, e.requests / e.weight))
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    @staticmethod
+    def _next_weighted(candidates):
+        """Smooth weighted round-robin, which interleaves hosts instead of sending bursts"""
+        total = sum(e.weight for e in candidates)
+        for e in candidates:
+            e.current_weight += e.weight
+        endpoint = max(candidates, key=lambda e: e.current_weight)
+        endpoint.current_weight -= total
+        return endpoint
+
+    def release(self, endpoint, ok):
+        """Finish a request on an endpoint, ejecting the host after too many failures in a row"""
+        with self._lock:
+            endpoint.outstanding -= 1
+            if ok:
+                endpoint.failures = 0
+                return
+            endpoint.errors += 1
+            endpoint.failures += 1
+            if endpoint.healthy and endpoint.failures >= self.failure_threshold:
+                endpoint.ejected_until = time.monotonic() + self.eject_seconds
+                endpoint.ejections += 1
+
+    def readmit_recovered(self):
+        """Health-check ejected hosts whose cool-down has passed and re-admit those that pass"""
+        now = time.monotonic()
+        with self._lock:
+            due = [e for e in self.endpoints if not e.healthy and e.ejected_until <= now]
+            for endpoint in due:
+                # Claim the probe so other threads keep routing around this host meanwhile
+                endpoint.ejected_until = now + self.eject_seconds
+        for endpoint in due:
+            if self.probe(endpoint):
+                with self._lock:
+                    endpoint.ejected_until = None
+                    endpoint.failures = 0
+
+    def probe(self, endpoint):
+        """Health check: the host answers /api/show for the model (or /api/version without one)"""
+        timeout = (self.timeout[0], self.HEALTH_TIMEOUT)
+        try:
+            if self.model is None:
+                response = self.session.get(f"{endpoint.url}/api/version", timeout=timeout)
+            else:
+                response = self.session.post(f"{endpoint.url}/api/show", json={"name": self.model}, timeout=timeout)
+            return response.status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+
+    def check_health(self):
+        """Probe every host now, ejecting the ones that fail, and return the healthy endpoints"""
+        for endpoint in self.endpoints:
+            ok = self.probe(endpoint)
+            with self._lock:
+                if ok:
+                    endpoint.ejected_until = None
+                    endpoint.failures = 0
+                elif endpoint.healthy:
+                    endpoint.ejected_until = time.monotonic() + self.eject_seconds
+                    endpoint.ejections += 1
+        return [endpoint for endpoint in self.endpoints if endpoint.healthy]
+
+    def send(self, path, payload, timeout=None, stream=False):
+        """POST to the chosen endpoint, failing over to other hosts on connection errors and 5xx.
+
+        Returns the endpoint and response; the caller must release the endpoint.
+        """
+        kwargs = {"json": payload, "timeout": timeout or self.timeout}
+        if stream:
+            kwargs["stream"] = True
+        tried = []
+        while True:
+            endpoint = self.acquire(exclude=tried)
+            tried.append(endpoint)
+            last_chance = len(tried) >= len(self.endpoints)
+            try:
+                response = self.session.post(f"{endpoint.url}{path}", **kwargs)
+            except requests.exceptions.RequestException:
+                self.release(endpoint, ok=False)
+                if last_chance:
+                    raise
+                continue
+            if response.status_code in self.RETRY_STATUSES and not last_chance:
+                response.close()
+                self.release(endpoint, ok=False)
+                continue
+            return endpoint, response
+
+    def post(self, path, payload, timeout=None):
+        endpoint, response = self.send(path, payload, timeout)
+        self.release(endpoint, ok=response.status_code not in self.RETRY_STATUSES)
+        return response
+
+    def show(self, model):
+        return self.post("/api/show", {"name": model})
+
+    def pull_stream(self, model):
+        """Stream a model pull; read Ollama's progress events with iter_stream.
+
+        The read timeout applies between events, so a stalled download fails without
+        bounding how long the whole pull may take.
+        """
+        return self.stream("/api/pull", {"name": model, "stream": True})
+
+    def generate(self, payload):
+        return self.post("/api/generate", payload)
+
+    def generate_stream(self, payload):
+        """Stream a generation; use it as a context manager and read the response with iter_stream"""
+        return self.stream("/api/generate", {**payload, "stream": True})
+
+    def embed(self, model, texts):
+        """Embed a batch of texts with /api/embed; the response holds one vector per text"""
+        return self.post("/api/embed", {"model": model, "input": list(texts)})
+
+    def embeddings(self, model, prompt):
+        """Embed one text with /api/embeddings, which Ollama versions before /api/embed provide"""
+        return self.post("/api/embeddings", {"model": model, "prompt": prompt})
+
+    def warm_up(self, model, keep_alive):
+        """Load the model on every healthy host and keep it resident for keep_alive.
+
+        Returns the seconds each host took, or None for hosts that failed.
+        """
+        loaded = {}
+        for endpoint in [e for e in self.endpoints if e.healthy] or self.endpoints:
+            started = time.monotonic()
+            try:
+                # A generate request without a prompt only loads the model
+                response = self.session.post(
+                    f"{endpoint.url}/api/generate",
+                    json={"model": model, "keep_alive": keep_alive, "stream": False},
+                    timeout=self.timeout,
+                )
+                ok = response.status_code == 200
+            except requests.exceptions.RequestException:
+                ok = False
+            loaded[endpoint.url] = time.monotonic() - started if ok else None
+        return loaded
+
+    @contextmanager
+    def stream(self, path, payload):
+        """POST a streaming request; the host counts it as outstanding until the block exits"""
+        endpoint, response = self.send(path, payload, stream=True)
+        ok = response.status_code not in self.RETRY_STATUSES
+        try:
+            with response:
+                yield response
+        except requests.exceptions.RequestException:
+            ok = False
+            raise
+        finally:
+            self.release(endpoint, ok)
+
+    @staticmethod
+    def retries_used(response):
+        """Number of retries urllib3 needed before this response came back"""
+        retries = getattr(response.raw, "retries", None)
+        return len(getattr(retries, "history", None) or ())
+
+    @staticmethod
+    def iter_stream(response):
+        """Yield the JSON objects of an NDJSON streaming response as they arrive"""
+        for line in response.iter_lines():
+            if line:
+                yield json.loads(line)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,50 @@
+"""Extract the rating out of 5 that the model writes into a generated review"""
+import re
+
+MIN_RATING = 0.0
+MAX_RATING = 5.0
+
+_NUMBER = r"(\d+(?:[.,]\d+)?)"
+# Some reviews answer out of 10 despite the prompt
+_OUT_OF = r"\s*(?:/|out\s+of|of)\s*(5|10)(?:\.0+)?\b"
+# Without a rating label a bare "of" is too loose: "it ranks 2 of 5 hotels nearby"
+_STRICT_OUT_OF = r"\s*(?:/|out\s+of)\s*(5|10)(?:\.0+)?\b"
+
+# Tried in order; within a pattern the last match wins, since reviews end with their verdict
+_RATING_PATTERNS = (
+    # "Rating: 4.5/5", "**Rating** - 4 out of 5", "Overall rating of 4/5"
+    re.compile(r"\brat(?:ing|ed)\b[^\d\n]{0,20}?" + _NUMBER + _OUT_OF, re.IGNORECASE),
+    # "Rated 5 stars", "Rating: 4.5 stars", ahead of any fraction elsewhere in the text
+    re.compile(r"\brat(?:ing|ed)\b[^\d\n]{0,20}?" + _NUMBER + r"\s*stars?\b", re.IGNORECASE),
+    # "I'd give it 4.5/5", "4 out of 5 stars", but not "loved by 9/10 guests"
+    re.compile(r"(?<![\d.,])(?<!\bby )" + _NUMBER + _STRICT_OUT_OF, re.IGNORECASE),
+    # "Rating: 4.5", "Rated 4 stars", "a rating of 4.5." but not "Rating: 95%"
+    re.compile(r"\brat(?:ing|ed)\b[^\d\n]{0,20}?" + _NUMBER + r"(?!\.?\d|,\d|\s*%)", re.IGNORECASE),
+)
+
+
+def _to_rating(value, scale=None):
+    rating = float(value.replace(",", "."))
+    if scale is not None:
+        rating = rating * MAX_RATING / float(scale)
+    return round(rating, 2) if MIN_RATING <= rating <= MAX_RATING else None
+
+
+def parse_rating(text):
+    """Return the rating out of 5 found in a review, or None if there is no valid one"""
+    if not text:
+        return None
+    for pattern in _RATING_PATTERNS:
+        for match in reversed(list(pattern.finditer(text))):
+            groups = match.groups()
+            rating = _to_rating(groups[0], groups[1] if len(groups) > 1 else None)
+            if rating is not None:
+                return rating
+    return None
+
+
+def validate_rating(value):
+    """Return a rating from a JSON response if it is a number within range, otherwise None"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value) if MIN_RATING <= value <= MAX_RATING else None
@@ -0,0 +1,97 @@
+"""Estimates for process_hotels --plan, which renders a batch's prompts without sending them"""
+from collections import defaultdict
+
+from properties.models import ProcessingRun
+
+# Llama tokenizers average roughly four characters of English text per token
+CHARS_PER_TOKEN = 4
+# Finished runs whose throughput is averaged for a projection
+HISTORY_RUNS = 10
+
+
+def estimate_tokens(text):
+    return max(1, round(len(text) / CHARS_PER_TOKEN))
+
+
+class Throughput:
+    """Per-token speeds and output lengths observed in recent finished runs of a model"""
+
+    def __init__(self, runs):
+        self.runs = len(runs)
+        prompt_eval_seconds = sum(run.prompt_eval_seconds for run in runs)
+        eval_seconds = sum(run.eval_seconds for run in runs)
+        self.prompt_tokens_per_second = (
+            sum(run.prompt_eval_count for run in runs) / prompt_eval_seconds if prompt_eval_seconds else None
+        )
+        self.generated_tokens_per_second = sum(run.eval_count for run in runs) / eval_seconds if eval_seconds else None
+
+        counts = defaultdict(int)
+        tokens = defaultdict(int)
+        for run in runs:
+            for field, (prompts, generated) in run.field_eval_counts.items():
+                counts[field] += prompts
+                tokens[field] += generated
+        self.generated_tokens = {field: tokens[field] / counts[field] for field in counts if counts[field]}
+
+        # Ollama's own durations add up to more than the wall time when requests overlap
+        self.parallelism = {}
+        for run in runs:
+            if run.wall_seconds > 0:
+                self.parallelism.setdefault(run.max_inflight, []).append(
+                    (run.prompt_eval_seconds + run.eval_seconds) / run.wall_seconds
+                )
+
+    @classmethod
+    def recent(cls, model):
+        return cls(list(ProcessingRun.objects.filter(model=model).order_by('-finished_at')[:HISTORY_RUNS]))
+
+    @property
+    def known(self):
+        return self.prompt_tokens_per_second is not None and self.generated_tokens_per_second is not None
+
+    def parallelism_for(self, max_inflight, hosts=1):
+        """Requests served at once with max_inflight, as observed; one per host if never run that way"""
+        observed = self.parallelism.get(max_inflight)
+        if observed:
+            return max(1.0, sum(observed) / len(observed))
+        return float(min(max_inflight, hosts))
+
+
+class BatchPlan:
+    """Prompts a batch would send, tallied by field"""
+
+    def __init__(self):
+        self.hotels = 0
+        self.duplicates = 0
+        self.prompts = defaultdict(int)
+        self.cached = defaultdict(int)
+        self.prompt_tokens = defaultdict(int)
+
+    def add_prompt(self, field, prompt, cached=False):
+        self.prompts[field] += 1
+        if cached:
+            self.cached[field] += 1
+        else:
+            self.prompt_tokens[field] += estimate_tokens(prompt)
+
+    @property
+    def sent(self):
+        """Prompts per field that would actually reach Ollama"""
+        return {field: count - self.cached[field] for field, count in self.prompts.items()}
+
+    def generated_tokens(self, throughput, budgets):
+        """Expected output tokens per field, from history or else the field's token budget"""
+        return {
+            field: count * throughput.generated_tokens.get(field, budgets.get(field, 0))
+            for field, count in self.sent.items()
+        }
+
+    def projected_seconds(self, throughput, generated_tokens, parallelism):
+        """Wall time for the prompts sent, or None without a throughput history"""
+        if not throughput.known:
+            return None
+        serial = (
+            sum(self.prompt_tokens.values()) / throughput.prompt_tokens_per_second
+            + sum(generated_tokens.values()) / throughput.generated_tokens_per_second
+        )
+        return serial / parallelism
@@ -0,0 +1,69 @@
+"""Deterministic cleanup and validation of each generated field.
+
+Formatting slips such as markdown, wrapping quotes or a title that runs onto a second
+line are fixed here, without another request. A field is only regenerated when the cleaned
+text still fails validation.
+"""
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+from django.utils.text import Truncator
+
+
+@dataclass(frozen=True)
+class FieldRule:
+    min_length: int
+    max_length: Optional[int] = None
+    single_line: bool = False
+
+
+RULES = {
+    # Titles replace Hotel.hotel_name, a 255-character column
+    "title": FieldRule(min_length=3, max_length=255, single_line=True),
+    "summary": FieldRule(min_length=10),
+    "review": FieldRule(min_length=10),
+    "description": FieldRule(min_length=10),
+}
+
+_EMPHASIS = re.compile(r"\*+|__+|`+")
+_HEADING = re.compile(r"^\s{0,3}#{1,6}\s*", re.MULTILINE)
+_BULLET = re.compile(r"^\s*(?:[-•]|\d+[.)])\s+", re.MULTILINE)
+_DOUBLE_QUOTES = re.compile(r"[\"“”„«»]")
+_WRAPPING_QUOTES = "'‘’"
+# "Title:" or a line holding just the field's name before the text
+_LABEL = re.compile(r"^\s*(?:(?:new|hotel)\s+)?(?:title|summary|review|description)(?:\s*:\s*|[ \t]*\n\s*)", re.IGNORECASE)
+_SPACES = re.compile(r"[ \t]+")
+_BLANK_LINES = re.compile(r"\n\s*\n+")
+_REFUSAL = re.compile(r"^(?:i'?m sorry|i am sorry|i can(?:'|no)t|as an ai)\b", re.IGNORECASE)
+
+
+def clean(field, text):
+    """Strip markdown, quotes and labels from a generated field; titles keep their first line only"""
+    if text is None:
+        return None
+    rule = RULES.get(field)
+    text = _EMPHASIS.sub("", text)
+    text = _HEADING.sub("", text)
+    text = _DOUBLE_QUOTES.sub("", text)
+    text = _LABEL.sub("", text.strip())
+    if rule is not None and rule.single_line:
+        text = next((line for line in text.splitlines() if line.strip()), "")
+        text = _BULLET.sub("", text)
+    lines = [_SPACES.sub(" ", line).strip() for line in text.splitlines()]
+    text = _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip().strip(_WRAPPING_QUOTES).strip()
+    if rule is not None and rule.max_length is not None:
+        text = Truncator(text).chars(rule.max_length, truncate="").strip()
+    return text
+
+
+def problem(field, text):
+    """Return why a cleaned field is unusable, or None if it passes"""
+    if not text:
+        return "empty response"
+    rule = RULES.get(field)
+    if rule is not None and len(text) < rule.min_length:
+        return f"shorter than {rule.min_length} characters"
+    if _REFUSAL.match(text):
+        return "the model declined to answer"
+    return None
@@ -0,0 +1,101 @@
+"""Named, versioned prompt templates for each generated field.
+
+Bump a template's version whenever its wording changes. Each generated output stores the
+key of the template it came from, so a run only regenerates the fields whose template
+changed.
+"""
+import hashlib
+from dataclasses import dataclass
+
+# Fields in the order they are generated; review also produces the rating
+FIELDS = ("summary", "review", "title", "description")
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    name: str
+    version: str
+    template: str
+
+    @property
+    def key(self):
+        return f"{self.name}:{self.version}"
+
+    def render(self, **context):
+        return self.template.format(**context)
+
+
+PROMPTS = {}
+
+
+def register(name, version, template):
+    PROMPTS[name] = PromptTemplate(name, version, template)
+    return PROMPTS[name]
+
+
+register(
+    "summary", "1",
+    "Generate a concise summary of this hotel's key features based on this hotel info "
+    "and don't use any stars anywhere:\n{hotel_info}",
+)
+register(
+    "review", "1",
+    "Based on this hotel information, generate a detailed review and suggest a rating out of 5 "
+    "and don't use stars anywhere:\n{hotel_info}",
+)
+register(
+    "title", "1",
+    "Create a title using this hotel name and just give one line and don't use quotation mark, "
+    "just a single line: {hotel_name}",
+)
+register(
+    "description", "1",
+    "Generate a detailed hotel description at least two lines about these details in a paragraph "
+    "and don't use any stars or quotation marks anywhere:\n{hotel_info}",
+)
+# Produces every field in one JSON-format request
+register(
+    "structured", "1",
+    "Based on this hotel information, respond with a JSON object containing: "
+    "title (a new single-line title for the hotel without quotation marks), "
+    "description (a detailed hotel description of at least two lines in one paragraph), "
+    "summary (a concise summary of the hotel's key features), "
+    "review (a detailed review of the hotel) and "
+    "rating (a number out of 5). Don't use any stars anywhere:\n{hotel_info}",
+)
+# Asks for the rating of a review whose text had none that could be parsed
+register(
+    "rating", "1",
+    "Read this hotel review and respond with a JSON object containing rating, "
+    "the reviewer's rating of the hotel as a number out of 5:\n{review}",
+)
+
+
+def render(name, **context):
+    return PROMPTS[name].render(**context)
+
+
+def is_current(key):
+    """Whether a stored template key matches the registered version of its template"""
+    name, _, version = (key or "").partition(":")
+    template = PROMPTS.get(name)
+    return template is not None and template.version == version
+
+
+def registry_version():
+    """Short hash of every template's key, recorded with each hotel's processing state"""
+    keys = ",".join(sorted(template.key for template in PROMPTS.values()))
+    return hashlib.sha256(keys.encode("utf-8")).hexdigest()[:12]
+
+
+def hotel_context(hotel):
+    """Values available to the templates for one hotel"""
+    hotel_info = f"""
+            Hotel Name: {hotel.hotel_name}
+            Address: {hotel.hotel_address}
+            Price: ${hotel.price}
+            Rating: {hotel.rating}
+            Room Type: {hotel.room_type}
+            Location: Lat {hotel.lat}, Lng {hotel.lng}
+            """
+    return {"hotel_info": hotel_info, "hotel_name": hotel.hotel_name}
@@ -1,7 +1,11 @@
 from unittest.mock import MagicMock, patch
 from django.contrib.admin.sites import AdminSite
 from django.test import TestCase
-from properties.admin import HotelAdmin, HotelSummaryAdmin, HotelReviewAdmin
+from django.core.cache import cache
+from django.test import override_settings
+from properties.admin import (
+    CityFilter, EstimatedCountPaginator, HotelAdmin, HotelSummaryAdmin, HotelReviewAdmin, RoomTypeFilter, preview,
+)
 from properties.models import Hotel, HotelSummary, HotelReview
 
 class AdminTests(TestCase):
@@ -21,23 +25,66 @@ class AdminTests(TestCase):
         MockHotel.objects = MagicMock()
         hotel_admin = HotelAdmin(MockHotel, self.site)
         self.assertIn('hotel_name', hotel_admin.list_display)
-        self.assertIn('description', hotel_admin.list_display)
+        self.assertIn('description_preview', hotel_admin.list_display)
 
     @patch('properties.admin.Hotel')
     def test_hotel_admin_filters(self, MockHotel):
         MockHotel.objects = MagicMock()
         hotel_admin = HotelAdmin(MockHotel, self.site)
-        self.assertIn('city_id', hotel_admin.list_filter)
-        self.assertIn('room_type', hotel_admin.list_filter)
+        self.assertIn(CityFilter, hotel_admin.list_filter)
+        self.assertIn(RoomTypeFilter, hotel_admin.list_filter)
 
     @patch('properties.admin.HotelSummary')
     def test_summary_admin_display(self, MockHotelSummary):
         MockHotelSummary.objects = MagicMock()
         summary_admin = HotelSummaryAdmin(MockHotelSummary, self.site)
-        self.assertIn('summary', summary_admin.list_display)
+        self.assertIn('summary_preview', summary_admin.list_display)
+        self.assertEqual(summary_admin.list_select_related, ('hotel',))
 
     @patch('properties.admin.HotelReview')
     def test_review_admin_display(self, MockHotelReview):
         MockHotelReview.objects = MagicMock()
         review_admin = HotelReviewAdmin(MockHotelReview, self.site)
-        self.assertIn('rating', review_admin.list_display)
\ No newline at end of file
+        self.assertIn('rating', review_admin.list_display)
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class AdminChangelistTests(TestCase):
+    databases = []
+
+    def setUp(self):
+        cache.clear()
+
+    def queryset(self, filtered=False, exact=42):
+        queryset = MagicMock()
+        queryset.query.where = ['city_id = 3'] if filtered else []
+        queryset.__len__.return_value = exact
+        return queryset
+
+    @patch.object(EstimatedCountPaginator, 'estimated_count', return_value=2500000)
+    def test_whole_table_uses_estimated_count(self, mock_estimate):
+        self.assertEqual(EstimatedCountPaginator(self.queryset(), 25).count, 2500000)
+        self.assertEqual(EstimatedCountPaginator(self.queryset(filtered=True), 25).count, 42)
+
+    @patch.object(EstimatedCountPaginator, 'estimated_count')
+    def test_small_or_unknown_tables_use_exact_count(self, mock_estimate):
+        mock_estimate.return_value = 500
+        self.assertEqual(EstimatedCountPaginator(self.queryset(), 25).count, 42)
+        mock_estimate.return_value = None
+        self.assertEqual(EstimatedCountPaginator(self.queryset(), 25).count, 42)
+
+    @patch('properties.admin.Hotel')
+    def test_filter_choices_are_cached(self, MockHotel):
+        CityFilter.model = MockHotel
+        self.addCleanup(setattr, CityFilter, 'model', Hotel)
+        MockHotel._meta.db_table = 'hotels'
+        distinct = MockHotel.objects.exclude.return_value.order_by.return_value.values_list.return_value.distinct
+        distinct.return_value = [1, 3]
+
+        for _ in range(2):
+            city_filter = CityFilter(None, {}, MockHotel, None)
+            self.assertEqual(city_filter.lookup_choices, [(1, 1), (3, 3)])
+        distinct.assert_called_once()
+
+    def test_preview_truncates_long_text(self):
+        self.assertEqual(len(preview("x" * 500)), 100)
+        self.assertEqual(preview(None), "")
@@ -0,0 +1,51 @@
+import json
+from unittest.mock import patch
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+import requests
+from properties.benchmark import FakeOllamaServer, percentile
+from properties.ollama import OllamaClient
+
+
+class BenchmarkTests(TestCase):
+    databases = []
+
+    def test_percentile(self):
+        values = [0.4, 0.1, 0.3, 0.2]
+        self.assertEqual(percentile(values, 0.5), 0.2)
+        self.assertEqual(percentile(values, 0.95), 0.4)
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+    def test_fake_server_answers_like_ollama(self):
+        with FakeOllamaServer(latency=0, jitter=0) as fake:
+            client = OllamaClient(base_url=fake.base_url)
+            self.assertEqual(client.show("llama3.2").status_code, 200)
+
+            response = client.generate({"model": "llama3.2", "prompt": "Write a review", "stream": False})
+            body = response.json()
+            self.assertIn("Rating:", body["response"])
+            self.assertIn("eval_count", body)
+
+            response = client.generate({"prompt": "All fields", "format": {"type": "object"}, "stream": False})
+            self.assertEqual(json.loads(response.json()["response"])["rating"], 4.5)
+
+            with client.generate_stream({"prompt": "Write a title"}) as response:
+                chunks = list(client.iter_stream(response))
+            self.assertTrue(chunks[-1]["done"])
+            self.assertTrue("".join(chunk["response"] for chunk in chunks).startswith("Charming Stay"))
+            self.assertEqual(fake.requests, 4)
+            client.close()
+
+    def test_fake_server_adds_latency(self):
+        with FakeOllamaServer(latency=0.05, jitter=0) as fake:
+            response = requests.post(f"{fake.base_url}/api/generate", json={"prompt": "x", "stream": False})
+            self.assertGreaterEqual(response.elapsed.total_seconds(), 0.05)
+
+    @patch('properties.management.commands.benchmark_process_hotels.connection')
+    def test_benchmark_refuses_to_run_outside_sqlite(self, mock_connection):
+        # Patched so the test behaves the same under benchmark_settings, which uses SQLite
+        mock_connection.vendor = 'postgresql'
+        with self.assertRaises(CommandError):
+            call_command('benchmark_process_hotels')
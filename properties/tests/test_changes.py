@@ -0,0 +1,121 @@
+from io import StringIO
+from unittest.mock import MagicMock, patch
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from properties.changes import ChangeFeed
+from properties.models import Hotel
+
+
+class Stop(Exception):
+    pass
+
+
+@patch('properties.changes.transaction.atomic', MagicMock())
+class ChangeFeedTests(TestCase):
+    databases = []
+
+    def make_feed(self, peeks, claims, **kwargs):
+        kwargs.setdefault('listen', False)
+        feed = ChangeFeed(**kwargs)
+        feed.peek = MagicMock(side_effect=peeks)
+        feed.claim = MagicMock(side_effect=claims)
+        feed.wait = MagicMock()
+        return feed
+
+    def run_until_stopped(self, feed, handle, clock):
+        with patch('properties.changes.time.monotonic', side_effect=clock):
+            with self.assertRaises(Stop):
+                feed.run(handle)
+
+    def test_once_hands_over_everything_waiting_without_waiting(self):
+        feed = self.make_feed(peeks=[[3, 2, 1], []], claims=[[7, 8]])
+        handle = MagicMock()
+
+        feed.run(handle, once=True)
+
+        handle.assert_called_once_with([7, 8])
+        feed.wait.assert_not_called()
+
+    def test_waits_for_the_debounce_interval_after_the_last_change(self):
+        feed = self.make_feed(peeks=[[1], [2, 1], [2, 1], Stop()], claims=[[7, 8]], debounce=2, max_wait=30)
+        handle = MagicMock()
+
+        self.run_until_stopped(feed, handle, clock=[0, 1.5, 3.5])
+
+        # The second change restarts the debounce interval
+        self.assertEqual([call.args[0] for call in feed.wait.call_args_list], [2, 2])
+        handle.assert_called_once_with([7, 8])
+
+    def test_full_batch_is_handed_over_straight_away(self):
+        feed = self.make_feed(peeks=[[3, 2], [3], Stop()], claims=[[7, 8], [9]], max_batch=2, debounce=2)
+        handle = MagicMock()
+
+        self.run_until_stopped(feed, handle, clock=[0, 0.1])
+
+        handle.assert_called_once_with([7, 8])
+        feed.wait.assert_called_once()
+
+    def test_max_wait_hands_over_changes_that_never_go_quiet(self):
+        peeks = [[1], [2, 1], [3, 2, 1], Stop()]
+        feed = self.make_feed(peeks=peeks, claims=[[7, 8, 9]], debounce=2, max_wait=3)
+        handle = MagicMock()
+
+        self.run_until_stopped(feed, handle, clock=[0, 1.5, 3])
+
+        handle.assert_called_once_with([7, 8, 9])
+
+    def test_changes_locked_by_another_feed_are_not_handed_over(self):
+        feed = self.make_feed(peeks=[[1], Stop()], claims=[[]], max_batch=1, poll_interval=5)
+        handle = MagicMock()
+
+        self.run_until_stopped(feed, handle, clock=[0])
+
+        handle.assert_not_called()
+        feed.wait.assert_called_once_with(5)
+
+    @patch('properties.changes.connection')
+    def test_polls_when_the_database_cannot_listen(self, mock_connection):
+        mock_connection.vendor = 'sqlite'
+        feed = ChangeFeed()
+
+        self.assertFalse(feed.start())
+        self.assertFalse(feed.listening)
+
+    @patch('properties.changes.select.select')
+    @patch('properties.changes.connection')
+    def test_wait_listens_again_after_a_reconnect(self, mock_connection, mock_select):
+        mock_connection.vendor = 'postgresql'
+        mock_connection.connection = MagicMock(notifies=[])
+        mock_select.return_value = ([], [], [])
+        feed = ChangeFeed(poll_interval=5)
+        feed.start()
+        mock_connection.connection = MagicMock(notifies=[])
+
+        feed.wait(10)
+
+        self.assertIs(feed._listening_on, mock_connection.connection)
+        self.assertEqual(mock_connection.cursor.return_value.__enter__.return_value.execute.call_count, 2)
+        mock_select.assert_called_once_with([mock_connection.connection], [], [], 5)
+
+
+class WatchHotelsCommandTests(TestCase):
+    databases = []
+
+    @patch('properties.management.commands.watch_hotels.enqueue_hotels')
+    @patch('properties.management.commands.watch_hotels.Hotel.objects')
+    @patch('properties.management.commands.watch_hotels.ChangeFeed')
+    def test_once_queues_changed_hotels(self, mock_feed, mock_hotels, mock_enqueue):
+        hotels = [Hotel(id=1), Hotel(id=2)]
+        mock_hotels.filter.return_value.only.return_value = hotels
+        mock_enqueue.return_value = 1
+        mock_feed.return_value.run.side_effect = lambda handle, once: handle([1, 2, 3])
+        out = StringIO()
+
+        call_command('watch_hotels', '--once', '--no-listen', stdout=out)
+
+        self.assertFalse(mock_feed.call_args.kwargs['listen'])
+        mock_hotels.filter.assert_called_once_with(id__in=[1, 2, 3])
+        mock_enqueue.assert_called_once_with(hotels)
+        self.assertIn("Queued 1 of 3 changed hotels", out.getvalue())
@@ -0,0 +1,76 @@
+import threading
+import time
+from unittest.mock import patch
+from django.test import TestCase
+from properties.concurrency import ConcurrencyLimiter
+
+
+class ConcurrencyLimiterTests(TestCase):
+    databases = []
+
+    def run_requests(self, limiter, count, duration, key="title", ok=True):
+        def request():
+            with limiter.slot(key) as slot:
+                time.sleep(duration)
+                if not ok:
+                    slot.failed()
+
+        threads = [threading.Thread(target=request) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_fixed_limit_caps_concurrency(self):
+        limiter = ConcurrencyLimiter(2)
+        peak = []
+        original_acquire = limiter.acquire
+
+        def acquire():
+            started = original_acquire()
+            peak.append(limiter.inflight)
+            return started
+
+        with patch.object(limiter, 'acquire', acquire):
+            self.run_requests(limiter, 6, 0.01)
+
+        self.assertLessEqual(max(peak), 2)
+        self.assertEqual(limiter.current, 2)
+        self.assertEqual(limiter.inflight, 0)
+
+    def test_adaptive_limit_grows_while_saturated(self):
+        limiter = ConcurrencyLimiter(1, adaptive=True, max_limit=4, tolerance=100)
+        self.run_requests(limiter, 20, 0.005)
+        self.assertEqual(limiter.current, 4)
+        self.assertEqual(limiter.peak, 4)
+
+    def test_errors_cut_the_limit_once_per_round(self):
+        limiter = ConcurrencyLimiter(8, adaptive=True)
+        self.run_requests(limiter, 8, 0.01, ok=False)
+        # All eight requests started before the first cut, so only one cut applies
+        self.assertEqual(limiter.decreases, 1)
+        self.assertEqual(limiter.current, 6)
+
+    def test_slow_requests_cut_the_limit(self):
+        limiter = ConcurrencyLimiter(4, adaptive=True)
+        limiter.baselines["review"] = limiter.recent["review"] = 0.001
+        with limiter.slot("review"):
+            time.sleep(0.05)
+        self.assertEqual(limiter.decreases, 1)
+        self.assertEqual(limiter.current, 3)
+
+    def test_exceptions_count_as_failures(self):
+        limiter = ConcurrencyLimiter(4, adaptive=True)
+        with self.assertRaises(RuntimeError):
+            with limiter.slot():
+                raise RuntimeError("timeout")
+        self.assertEqual(limiter.current, 3)
+        self.assertEqual(limiter.inflight, 0)
+
+    def test_baselines_are_kept_per_prompt_kind(self):
+        limiter = ConcurrencyLimiter(2, adaptive=True)
+        limiter.release(limiter.acquire() - 0.1, key="title")
+        limiter.release(limiter.acquire() - 2.0, key="review")
+        self.assertAlmostEqual(limiter.baselines["title"], 0.1, places=2)
+        self.assertAlmostEqual(limiter.baselines["review"], 2.0, places=2)
+        self.assertEqual(limiter.decreases, 0)
@@ -0,0 +1,61 @@
+from unittest.mock import MagicMock
+from django.test import TestCase
+from properties.dedup import DuplicateGroups, fingerprint, normalize
+
+
+def make_hotel(name="Grand Hotel", address="1 Main St.", lat=23.81012, lng=90.41252, price=100.0, room_type="Double"):
+    hotel = MagicMock()
+    hotel.hotel_name, hotel.hotel_address = name, address
+    hotel.lat, hotel.lng = lat, lng
+    hotel.price, hotel.room_type = price, room_type
+    return hotel
+
+
+class FingerprintTests(TestCase):
+    databases = []
+
+    def test_normalize(self):
+        self.assertEqual(normalize("  The GRAND-Hotel,  Dhaka "), "the grand hotel dhaka")
+        self.assertEqual(normalize(None), "")
+
+    def test_listings_differing_in_price_or_room_type_match(self):
+        self.assertEqual(
+            fingerprint(make_hotel()),
+            fingerprint(make_hotel(name="grand hotel", address="1 main st", lat=23.810121, price=80.0, room_type="Suite")),
+        )
+
+    def test_different_locations_do_not_match(self):
+        self.assertNotEqual(fingerprint(make_hotel()), fingerprint(make_hotel(lat=23.8200)))
+        self.assertNotEqual(fingerprint(make_hotel()), fingerprint(make_hotel(address="2 Main St")))
+
+
+class DuplicateGroupsTests(TestCase):
+    databases = []
+
+    def test_first_hotel_leads_and_others_follow(self):
+        groups = DuplicateGroups()
+        group, leader = groups.join("a")
+        self.assertTrue(leader)
+        same, leader = groups.join("a")
+        self.assertIs(same, group)
+        self.assertFalse(leader)
+
+        group.publish("result", calls=4)
+        self.assertEqual(same.wait(), "result")
+        groups.record_reuse(same)
+        self.assertEqual((groups.reused, groups.calls_saved), (1, 4))
+
+    def test_oldest_groups_are_forgotten(self):
+        groups = DuplicateGroups(max_groups=2)
+        for key in ("a", "b", "c"):
+            groups.join(key)
+        self.assertTrue(groups.join("a")[1])
+        self.assertFalse(groups.join("c")[1])
+
+    def test_clear_forgets_groups_but_keeps_counts(self):
+        groups = DuplicateGroups()
+        group, _ = groups.join("a")
+        groups.record_reuse(group)
+        groups.clear()
+        self.assertTrue(groups.join("a")[1])
+        self.assertEqual(groups.reused, 1)
@@ -0,0 +1,110 @@
+import os
+import tempfile
+from unittest.mock import MagicMock, patch
+
+from django.test import TestCase
+
+from properties import embeddings
+from properties.embeddings import Embedder, EmbeddingError, EmbeddingIndex, embed_changed, pack, unpack
+
+
+def response(status_code, body=None, text=""):
+    mock = MagicMock(status_code=status_code, text=text)
+    mock.json.return_value = body or {}
+    return mock
+
+
+class EmbeddingIndexTests(TestCase):
+    databases = []
+
+    def setUp(self):
+        vectors = [[1, 0, 0], [0.9, 0.1, 0], [0, 1, 0], [0, 0, 1]]
+        self.index = EmbeddingIndex("test", 3, [10, 11, 12, 13], b"".join(pack(vector) for vector in vectors))
+
+    def test_pack_normalizes_to_float32(self):
+        vector = unpack(pack([3, 4]))
+        self.assertEqual(len(pack([3, 4])), 8)
+        self.assertAlmostEqual(vector[0], 0.6, places=6)
+        self.assertAlmostEqual(vector[1], 0.8, places=6)
+
+    def test_search_returns_closest_first(self):
+        matches = self.index.search([1, 0.05, 0], limit=2)
+        self.assertEqual([hotel_id for hotel_id, _ in matches], [10, 11])
+        self.assertGreater(matches[0][1], matches[1][1])
+
+    def test_similar_excludes_the_hotel_itself(self):
+        self.assertEqual(self.index.similar(10, limit=1)[0][0], 11)
+        with self.assertRaises(EmbeddingError):
+            self.index.similar(99)
+
+    def test_save_and_open(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "hotels.f32")
+            self.index.save(path)
+            opened = EmbeddingIndex.open(path)
+            self.assertEqual((opened.model, len(opened)), ("test", 4))
+            self.assertEqual(opened.similar(12, limit=1), self.index.similar(12, limit=1))
+
+
+class EmbedderTests(TestCase):
+    databases = []
+
+    def test_batches_texts_in_one_request(self):
+        client = MagicMock()
+        client.embed.return_value = response(200, {"embeddings": [[1, 0], [0, 1]]})
+        embedder = Embedder(client, "test")
+        self.assertEqual(embedder.embed(["a", "b"]), [[1, 0], [0, 1]])
+        client.embed.assert_called_once_with("test", ["a", "b"])
+
+    def test_falls_back_to_single_text_endpoint(self):
+        client = MagicMock()
+        client.embed.return_value = response(404, text="404 page not found")
+        client.embeddings.side_effect = [response(200, {"embedding": [1, 0]}), response(200, {"embedding": [0, 1]})]
+        embedder = Embedder(client, "test")
+        self.assertEqual(embedder.embed(["a", "b"]), [[1, 0], [0, 1]])
+        self.assertFalse(embedder.batch_endpoint)
+
+    def test_missing_model_is_an_error(self):
+        client = MagicMock()
+        client.embed.return_value = response(404, text='{"error":"model \\"test\\" not found"}')
+        with self.assertRaises(EmbeddingError):
+            Embedder(client, "test").embed(["a"])
+        client.embeddings.assert_not_called()
+
+    @patch("properties.embeddings.HotelEmbedding")
+    @patch("properties.embeddings.hotel_documents")
+    @patch("properties.embeddings.changed_hotels")
+    def test_embed_changed_skips_unchanged_hotels(self, mock_changed, mock_documents, MockEmbedding):
+        hotels = [MagicMock(id=1), MagicMock(id=2)]
+        page = mock_changed.return_value.order_by.return_value
+        page.__getitem__.return_value = hotels
+        page.filter.return_value.__getitem__.return_value = []
+        mock_documents.return_value = {1: "unchanged", 2: "changed"}
+        MockEmbedding.objects.filter.return_value.values_list.return_value = [
+            (1, embeddings.content_hash("test", "unchanged")),
+            (2, embeddings.content_hash("test", "before")),
+        ]
+        embedder = MagicMock(model="test")
+        embedder.embed.return_value = [[1, 0]]
+
+        self.assertEqual(embed_changed(embedder), 1)
+        self.assertEqual(list(embedder.embed.call_args.args[0]), ["changed"])
+        saved = MockEmbedding.objects.bulk_create.call_args.args[0]
+        self.assertEqual(len(saved), 1)
+        self.assertTrue(MockEmbedding.objects.bulk_create.call_args.kwargs["update_conflicts"])
+        mock_changed.assert_called_with("test", False)
+        # The hotel reprocessed with the same text is marked as embedded
+        MockEmbedding.objects.filter.assert_any_call(hotel_id__in=[1])
+        MockEmbedding.objects.filter.return_value.update.assert_called_once()
+
+    @patch("properties.embeddings.Hotel")
+    def test_changed_hotels_only_selects_hotels_processed_since_embedding(self, MockHotel):
+        hotels = MockHotel.objects.only.return_value
+        self.assertIs(embeddings.changed_hotels("test", force=True), hotels)
+        hotels.filter.assert_not_called()
+
+        embeddings.changed_hotels("test")
+        self.assertEqual(hotels.filter.call_args.kwargs, {"processing_state__status": "done"})
+        condition = str(hotels.filter.return_value.filter.call_args.args[0])
+        self.assertIn("embedding__updated_at__lt", condition)
+        self.assertIn("processing_state__finished_at", condition)
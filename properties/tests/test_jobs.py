@@ -0,0 +1,108 @@
+import threading
+from io import StringIO
+from unittest.mock import MagicMock, patch
+from django.core.management import call_command
+from django.test import TestCase
+from properties.jobs import complete_jobs, enqueue_hotels, extend_jobs
+from properties.management.commands.run_llm_worker import Command as WorkerCommand
+from properties.models import Hotel, HotelJob
+from properties.writer import HotelResult
+
+
+@patch('properties.jobs.transaction.atomic', MagicMock())
+class JobQueueTests(TestCase):
+    databases = []
+
+    def make_job(self, hotel_id, attempts=1, claimed_by='worker-1'):
+        return MagicMock(id=hotel_id + 100, hotel_id=hotel_id, attempts=attempts, claimed_by=claimed_by)
+
+    def hold(self, mock_objects, jobs):
+        mock_objects.select_for_update.return_value.filter.return_value.values_list.return_value = [
+            (job.id, job.claimed_by, job.attempts) for job in jobs
+        ]
+
+    @patch('properties.jobs.HotelJob.objects')
+    def test_complete_jobs_sets_status_from_results(self, mock_objects):
+        done = self.make_job(1)
+        retry = self.make_job(2, attempts=1)
+        failed = self.make_job(3, attempts=3)
+        missing = self.make_job(4, attempts=1)
+        self.hold(mock_objects, [done, retry, failed, missing])
+        results = [
+            HotelResult(MagicMock(id=1)),
+            HotelResult(MagicMock(id=2), error="Timeout"),
+            HotelResult(MagicMock(id=3), error="Timeout"),
+        ]
+
+        complete_jobs([done, retry, failed, missing], results, max_attempts=3)
+
+        self.assertEqual(done.status, HotelJob.DONE)
+        self.assertEqual(retry.status, HotelJob.QUEUED)
+        self.assertEqual(retry.last_error, "Timeout")
+        self.assertEqual(failed.status, HotelJob.FAILED)
+        self.assertEqual(missing.status, HotelJob.QUEUED)
+        mock_objects.bulk_update.assert_called_once()
+
+    @patch('properties.jobs.HotelJob.objects')
+    def test_complete_jobs_leaves_jobs_claimed_by_another_worker(self, mock_objects):
+        ours = self.make_job(1)
+        expired = self.make_job(2)
+        # The claim on the second job ran out and another worker claimed it
+        self.hold(mock_objects, [ours, self.make_job(2, attempts=2, claimed_by='worker-2')])
+
+        complete_jobs([ours, expired], [HotelResult(MagicMock(id=1)), HotelResult(MagicMock(id=2))])
+
+        self.assertEqual(mock_objects.bulk_update.call_args.args[0], [ours])
+        self.assertEqual(ours.status, HotelJob.DONE)
+        self.assertNotEqual(expired.status, HotelJob.DONE)
+
+    @patch('properties.jobs.HotelJob.objects')
+    def test_extend_jobs_only_touches_running_jobs_of_this_claim(self, mock_objects):
+        jobs = [self.make_job(1), self.make_job(2)]
+
+        extend_jobs(jobs, visibility_timeout=600)
+
+        filters = mock_objects.filter.call_args.kwargs
+        self.assertEqual(filters, {'id__in': [101, 102], 'status': HotelJob.RUNNING, 'claimed_by': 'worker-1'})
+        self.assertIn('visible_at', mock_objects.filter.return_value.update.call_args.kwargs)
+
+    @patch('properties.management.commands.run_llm_worker.complete_jobs')
+    @patch('properties.management.commands.run_llm_worker.claim_jobs')
+    @patch('properties.management.commands.run_llm_worker.ProcessHotelsCommand')
+    def test_worker_shares_duplicates_only_within_a_batch(self, MockProcessor, mock_claim, mock_complete):
+        processor = MockProcessor.return_value
+        order = []
+        processor.duplicates.clear.side_effect = lambda: order.append('clear')
+        processor.process_all.side_effect = lambda hotels, total: order.append('process')
+        mock_claim.side_effect = [[self.make_job(1)], [self.make_job(2)], []]
+
+        call_command('run_llm_worker', '--once', stdout=StringIO())
+
+        self.assertEqual(order, ['clear', 'process', 'clear', 'process'])
+
+    @patch('properties.management.commands.run_llm_worker.connection')
+    @patch('properties.management.commands.run_llm_worker.extend_jobs')
+    def test_worker_heartbeat_extends_jobs_in_progress(self, mock_extend, mock_connection):
+        stopped = MagicMock(spec=threading.Event)
+        stopped.wait.side_effect = [False, False, True]
+        job = self.make_job(1)
+        claimed = {1: job}
+        mock_extend.side_effect = lambda jobs, timeout: claimed.clear()
+
+        WorkerCommand().heartbeat(claimed, 900, stopped)
+
+        stopped.wait.assert_called_with(300)
+        mock_extend.assert_called_once_with([job], 900)
+        mock_connection.close.assert_called_once()
+
+    @patch('properties.jobs.HotelJob.objects')
+    def test_enqueue_skips_hotels_with_active_jobs(self, mock_objects):
+        mock_objects.filter.return_value.values_list.return_value = [2]
+        hotels = [Hotel(id=1), Hotel(id=2), Hotel(id=3)]
+
+        queued = enqueue_hotels(hotels, chunk_size=2)
+
+        self.assertEqual(queued, 2)
+        self.assertEqual(mock_objects.bulk_create.call_count, 2)
+        created = [job.hotel_id for call in mock_objects.bulk_create.call_args_list for job in call.args[0]]
+        self.assertEqual(created, [1, 3])
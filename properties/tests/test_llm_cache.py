@@ -0,0 +1,53 @@
+from unittest.mock import patch
+from django.test import TestCase
+from properties.llm_cache import ResponseCache
+
+
+class ResponseCacheTests(TestCase):
+    databases = []
+
+    def test_make_key_depends_on_model_prompt_and_options(self):
+        key = ResponseCache.make_key("llama3.2", "prompt", {"format": None})
+        self.assertEqual(key, ResponseCache.make_key("llama3.2", "prompt", {"format": None}))
+        self.assertNotEqual(key, ResponseCache.make_key("llama3.1", "prompt", {"format": None}))
+        self.assertNotEqual(key, ResponseCache.make_key("llama3.2", "other prompt", {"format": None}))
+        self.assertNotEqual(key, ResponseCache.make_key("llama3.2", "prompt", {"format": "json"}))
+        self.assertEqual(len(key), 64)
+
+    @patch('properties.llm_cache.LLMCacheEntry')
+    def test_disabled_cache_never_touches_database(self, MockEntry):
+        cache = ResponseCache(enabled=False)
+        self.assertIsNone(cache.get("key"))
+        cache.set("key", "llama3.2", "response")
+        self.assertEqual(cache.evict(30, 10), 0)
+        self.assertFalse(MockEntry.objects.method_calls)
+        self.assertEqual((cache.hits, cache.misses), (0, 0))
+
+    @patch('properties.llm_cache.LLMCacheEntry')
+    def test_get_counts_hits_and_misses(self, MockEntry):
+        lookup = MockEntry.objects.filter.return_value.values_list.return_value
+        cache = ResponseCache()
+
+        lookup.first.return_value = "cached"
+        self.assertEqual(cache.get("key"), "cached")
+        lookup.first.return_value = None
+        self.assertIsNone(cache.get("key"))
+
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    @patch('properties.llm_cache.LLMCacheEntry')
+    def test_refresh_ignores_cached_responses(self, MockEntry):
+        lookup = MockEntry.objects.filter.return_value.values_list.return_value
+        lookup.first.return_value = "cached"
+        cache = ResponseCache(refresh=True)
+
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual(cache.misses, 1)
+
+    @patch('properties.llm_cache.LLMCacheEntry')
+    def test_cached_keys_does_not_count_hits(self, MockEntry):
+        MockEntry.objects.filter.return_value.values_list.return_value = ["a"]
+        cache = ResponseCache()
+        self.assertEqual(cache.cached_keys(["a", "b"]), {"a"})
+        self.assertEqual((cache.hits, cache.misses), (0, 0))
+        self.assertEqual(ResponseCache(refresh=True).cached_keys(["a"]), set())
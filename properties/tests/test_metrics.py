@@ -0,0 +1,89 @@
+import csv
+import json
+import os
+import tempfile
+from django.test import TestCase
+from properties.metrics import RunMetrics
+
+
+class RunMetricsTests(TestCase):
+    databases = []
+
+    def setUp(self):
+        self.metrics = RunMetrics(keep_records=True)
+        self.metrics.record_prompt(1, "summary", 2.0, {
+            "prompt_eval_count": 40,
+            "eval_count": 100,
+            "prompt_eval_duration": 500_000_000,
+            "eval_duration": 1_500_000_000,
+            "load_duration": 0,
+        }, retries=1)
+        self.metrics.record_prompt(1, "title", 0.0, cached=True)
+        self.metrics.record_hotel(1, 2.5)
+        self.metrics.record_hotel(2, 0.5, error="Test error")
+        self.metrics.record_db_write(0.25)
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_summary_aggregates_prompts_and_hotels(self):
+        summary = self.metrics.summary()
+        self.assertEqual(summary["prompts"], {"summary": 1, "title": 1})
+        self.assertEqual(summary["cached_prompts"], 1)
+        self.assertEqual(summary["retries"], 1)
+        self.assertEqual(summary["hotels"], {"done": 1, "failed": 1})
+        self.assertEqual(summary["ollama"]["eval_count"], 100)
+        self.assertEqual(summary["ollama"]["eval_seconds"], 1.5)
+        self.assertEqual(summary["db_write_seconds"], 0.25)
+        self.assertEqual((summary["unparsed_reviews"], summary["unrated_reviews"]), (0, 0))
+        self.assertEqual(dict(self.metrics.field_eval_counts), {"summary": [1, 100]})
+
+    def test_cache_queries_and_processing_time_are_tracked(self):
+        self.metrics.record_db_cache(0.5)
+        self.metrics.started -= 30
+        self.assertGreaterEqual(self.metrics.processing_seconds, 30)
+        # Warm-up before processing started is left out
+        self.metrics.start_processing()
+        summary = self.metrics.summary()
+        self.assertEqual(summary["db_cache_seconds"], 0.5)
+        self.assertLess(summary["processing_seconds"], 1)
+        self.assertGreaterEqual(summary["run_seconds"], 30)
+
+    def test_unparsed_reviews(self):
+        self.metrics.record_unparsed_review(recovered=True)
+        self.metrics.record_unparsed_review(recovered=False)
+        summary = self.metrics.summary()
+        self.assertEqual((summary["unparsed_reviews"], summary["unrated_reviews"]), (2, 1))
+
+    def test_records_are_dropped_unless_requested(self):
+        metrics = RunMetrics()
+        metrics.record_prompt(1, "summary", 1.0)
+        metrics.record_hotel(1, 1.0)
+        self.assertEqual((metrics.prompts, metrics.hotels), ([], []))
+        self.assertEqual(metrics.summary()["prompts"], {"summary": 1})
+
+    def test_write_json_and_csv_reports(self):
+        json_path = os.path.join(self.directory.name, "report.json")
+        self.metrics.write_report(json_path)
+        with open(json_path) as report:
+            data = json.load(report)
+        self.assertEqual(len(data["prompts"]), 2)
+        self.assertEqual(data["hotels"][1]["error"], "Test error")
+
+        csv_path = os.path.join(self.directory.name, "report.csv")
+        self.metrics.write_report(csv_path)
+        with open(csv_path) as report:
+            rows = list(csv.DictReader(report))
+        self.assertEqual(rows[0]["field"], "summary")
+        self.assertEqual(rows[0]["prompt_eval_seconds"], "0.5")
+
+    def test_write_prometheus_textfile(self):
+        path = os.path.join(self.directory.name, "process_hotels.prom")
+        self.metrics.write_prometheus(path)
+        with open(path) as textfile:
+            content = textfile.read()
+        self.assertIn('process_hotels_hotels_total{status="failed"} 1', content)
+        self.assertIn('process_hotels_prompts_total{field="summary"} 1', content)
+        self.assertIn("process_hotels_retries 1.000000", content)
+        self.assertEqual(os.listdir(self.directory.name), ["process_hotels.prom"])
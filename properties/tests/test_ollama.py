@@ -0,0 +1,152 @@
+import os
+import requests
+from unittest.mock import MagicMock, patch
+from django.test import TestCase
+from properties.ollama import DEFAULT_BASE_URL, OllamaClient, parse_endpoints
+
+
+class OllamaClientTests(TestCase):
+    databases = []
+
+    @patch.dict(os.environ, {"OLLAMA_BASE_URL": "http://gpu-box:11434/"})
+    def test_base_url_from_environment(self):
+        self.assertEqual(OllamaClient().base_url, "http://gpu-box:11434")
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_default_base_url(self):
+        self.assertEqual(OllamaClient().base_url, DEFAULT_BASE_URL)
+
+    def test_adapter_retries_server_errors_with_backoff(self):
+        client = OllamaClient(retries=4, backoff_factor=1, pool_size=8)
+        adapter = client.session.get_adapter("http://ollama:11434")
+        self.assertEqual(adapter.max_retries.total, 4)
+        self.assertEqual(adapter.max_retries.backoff_factor, 1)
+        self.assertIn(503, adapter.max_retries.status_forcelist)
+        self.assertIn("POST", adapter.max_retries.allowed_methods)
+        self.assertEqual(adapter._pool_maxsize, 8)
+
+    @patch('properties.ollama.requests.Session.post')
+    def test_requests_use_timeouts(self, mock_post):
+        client = OllamaClient(base_url="http://ollama:11434", connect_timeout=2, read_timeout=30)
+        client.generate({"model": "llama3.2", "prompt": "Hi"})
+        mock_post.assert_called_once_with(
+            "http://ollama:11434/api/generate",
+            json={"model": "llama3.2", "prompt": "Hi"},
+            timeout=(2, 30),
+        )
+
+        with client.pull_stream("llama3.2"):
+            pass
+        mock_post.assert_called_with(
+            "http://ollama:11434/api/pull",
+            json={"name": "llama3.2", "stream": True},
+            timeout=(2, 30),
+            stream=True,
+        )
+
+    @patch('properties.ollama.requests.Session.post')
+    def test_embedding_requests(self, mock_post):
+        mock_post.return_value = MagicMock(status_code=200)
+        client = OllamaClient(base_url="http://ollama:11434")
+        client.embed("nomic-embed-text", iter(["a", "b"]))
+        self.assertEqual(mock_post.call_args.args[0], "http://ollama:11434/api/embed")
+        self.assertEqual(mock_post.call_args.kwargs["json"], {"model": "nomic-embed-text", "input": ["a", "b"]})
+        client.embeddings("nomic-embed-text", "a")
+        self.assertEqual(mock_post.call_args.args[0], "http://ollama:11434/api/embeddings")
+        self.assertEqual(mock_post.call_args.kwargs["json"], {"model": "nomic-embed-text", "prompt": "a"})
+
+    @patch('properties.ollama.requests.Session.post')
+    def test_warm_up_reports_failed_hosts(self, mock_post):
+        mock_post.side_effect = [MagicMock(status_code=200), requests.exceptions.ConnectionError("down")]
+        client = OllamaClient(base_url="http://a:11434,http://b:11434")
+        loaded = client.warm_up("llama3.2", "30m")
+        self.assertIsNotNone(loaded["http://a:11434"])
+        self.assertIsNone(loaded["http://b:11434"])
+        self.assertEqual(mock_post.call_args_list[0].kwargs["json"], {"model": "llama3.2", "keep_alive": "30m", "stream": False})
+
+    def test_iter_stream_skips_keep_alive_lines(self):
+        response = MagicMock()
+        response.iter_lines.return_value = [b'{"response": "Hi"}', b'', b'{"response": "", "done": true}']
+        self.assertEqual(
+            list(OllamaClient.iter_stream(response)),
+            [{"response": "Hi"}, {"response": "", "done": True}],
+        )
+
+    @patch('properties.ollama.requests.Session.post')
+    def test_generate_stream_requests_streaming(self, mock_post):
+        client = OllamaClient(base_url="http://ollama:11434")
+        with client.generate_stream({"model": "llama3.2", "prompt": "Hi", "stream": False}):
+            self.assertEqual(client.endpoints[0].outstanding, 1)
+        self.assertEqual(client.endpoints[0].outstanding, 0)
+        self.assertTrue(mock_post.call_args.kwargs["stream"])
+        self.assertTrue(mock_post.call_args.kwargs["json"]["stream"])
+
+
+
+class OllamaPoolTests(TestCase):
+    databases = []
+
+    def test_parse_endpoints_with_weights(self):
+        endpoints = parse_endpoints("http://gpu1:11434|3, http://gpu2:11434/")
+        self.assertEqual([(e.url, e.weight) for e in endpoints], [("http://gpu1:11434", 3), ("http://gpu2:11434", 1)])
+
+    @patch.dict(os.environ, {"OLLAMA_BASE_URLS": "http://a:11434,http://b:11434", "OLLAMA_BASE_URL": "http://c:11434"})
+    def test_base_urls_from_environment(self):
+        self.assertEqual(OllamaClient().base_url, "http://a:11434, http://b:11434")
+
+    def test_least_outstanding_routing(self):
+        client = OllamaClient(base_url="http://a:11434,http://b:11434|2")
+        picks = [client.acquire().url for _ in range(3)]
+        # b has twice the capacity, so it takes two of the three concurrent requests
+        self.assertEqual(sorted(picks), ["http://a:11434", "http://b:11434", "http://b:11434"])
+
+    def test_weighted_round_robin_routing(self):
+        client = OllamaClient(base_url="http://a:11434|2,http://b:11434", routing="round-robin")
+        picks = []
+        for _ in range(6):
+            endpoint = client.acquire()
+            client.release(endpoint, ok=True)
+            picks.append(endpoint.url[7])
+        self.assertEqual("".join(picks), "abaaba")
+
+    @patch('properties.ollama.requests.Session.post')
+    def test_fails_over_and_ejects_unhealthy_host(self, mock_post):
+        ok = MagicMock(status_code=200)
+
+        def post(url, **kwargs):
+            if url.startswith("http://a:11434"):
+                raise requests.exceptions.ConnectionError("down")
+            return ok
+
+        mock_post.side_effect = post
+        client = OllamaClient(base_url="http://a:11434,http://b:11434", failure_threshold=2, eject_seconds=60)
+        for _ in range(4):
+            self.assertIs(client.generate({"prompt": "Hi"}), ok)
+
+        a, b = client.endpoints
+        self.assertFalse(a.healthy)
+        self.assertEqual((a.errors, a.ejections), (2, 1))
+        self.assertEqual(b.requests, 4)
+        self.assertEqual(a.outstanding + b.outstanding, 0)
+
+    @patch('properties.ollama.requests.Session.post')
+    def test_readmits_host_after_health_check(self, mock_post):
+        mock_post.return_value = MagicMock(status_code=200)
+        client = OllamaClient(base_url="http://a:11434,http://b:11434", model="llama3.2", eject_seconds=0)
+        a = client.endpoints[0]
+        a.ejected_until = 0
+
+        client.acquire()
+
+        self.assertTrue(a.healthy)
+        mock_post.assert_any_call(
+            "http://a:11434/api/show", json={"name": "llama3.2"}, timeout=(5, OllamaClient.HEALTH_TIMEOUT)
+        )
+
+    @patch('properties.ollama.requests.Session.post')
+    def test_single_host_raises_connection_errors(self, mock_post):
+        mock_post.side_effect = requests.exceptions.ConnectionError("down")
+        client = OllamaClient(base_url="http://a:11434")
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            client.generate({"prompt": "Hi"})
+        self.assertEqual(client.endpoints[0].outstanding, 0)
@@ -0,0 +1,42 @@
+from django.test import TestCase
+from properties.parsing import parse_rating, validate_rating
+
+
+class ParseRatingTests(TestCase):
+    databases = []
+
+    def test_common_formats(self):
+        cases = {
+            "Great stay.\nRating: 4.5/5": 4.5,
+            "Rating - 4/5": 4.0,
+            "**Rating:** 3 out of 5": 3.0,
+            "Overall rating of 3.5": 3.5,
+            "I'd give it 4.5 out of 5 stars.": 4.5,
+            "Rating: 4,5/5": 4.5,
+            "Rated 8/10 overall": 4.0,
+            "Overall rating: 4.5.": 4.5,
+            "All in all, a rating of 4.5.": 4.5,
+            "Rating: 4.": 4.0,
+            "Rating: 4 of 5": 4.0,
+            "Rated 5 stars by 1/10 guests": 5.0,
+            "Rating: 4.5 stars. Loved by 9/10 guests.": 4.5,
+        }
+        for text, rating in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(parse_rating(text), rating)
+
+    def test_prefers_the_final_labelled_rating(self):
+        self.assertEqual(parse_rating("Location 5/5, rooms 3/5.\nOverall Rating: 3.5/5"), 3.5)
+
+    def test_missing_or_out_of_range_ratings(self):
+        for text in (None, "", "No rating here", "Rating: 7/5", "Rating: 95%", "Price: $120/night",
+                     "It ranks 2 of 5 hotels nearby.", "Rating: 45.5",
+                     "Recommended by 9/10 guests", "Loved by 10/10 guests"):
+            with self.subTest(text=text):
+                self.assertIsNone(parse_rating(text))
+
+    def test_validate_rating(self):
+        self.assertEqual(validate_rating(4), 4.0)
+        self.assertIsNone(validate_rating(12))
+        self.assertIsNone(validate_rating("4"))
+        self.assertIsNone(validate_rating(True))
@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+
+from django.test import TestCase
+
+from properties.planning import BatchPlan, Throughput, estimate_tokens
+
+
+def run(**values):
+    defaults = dict(
+        max_inflight=1, wall_seconds=100.0, prompt_eval_count=10000, prompt_eval_seconds=10.0,
+        eval_count=9000, eval_seconds=90.0, field_eval_counts={"title": [10, 200]},
+    )
+    return SimpleNamespace(**{**defaults, **values})
+
+
+class PlanningTests(TestCase):
+    databases = []
+
+    def test_throughput_from_history(self):
+        throughput = Throughput([run(), run(max_inflight=4, wall_seconds=25.0, field_eval_counts={"title": [30, 300]})])
+        self.assertEqual(throughput.prompt_tokens_per_second, 1000)
+        self.assertEqual(throughput.generated_tokens_per_second, 100)
+        self.assertEqual(throughput.generated_tokens, {"title": 12.5})
+        self.assertEqual(throughput.parallelism_for(4), 4.0)
+        # Never run with 8 concurrent requests: assume one request at a time per host
+        self.assertEqual(throughput.parallelism_for(8, hosts=2), 2.0)
+
+    def test_projection_excludes_cached_prompts(self):
+        plan = BatchPlan()
+        plan.add_prompt("title", "x" * 400)
+        plan.add_prompt("title", "x" * 400, cached=True)
+        plan.add_prompt("summary", "x" * 800)
+        throughput = Throughput([run()])
+
+        generated = plan.generated_tokens(throughput, {"summary": 100})
+        self.assertEqual(generated, {"title": 20, "summary": 100})
+        self.assertEqual(sum(plan.prompt_tokens.values()), 300)
+        self.assertAlmostEqual(plan.projected_seconds(throughput, generated, 2.0), (0.3 + 1.2) / 2)
+
+    def test_no_projection_without_history(self):
+        plan = BatchPlan()
+        plan.add_prompt("title", "prompt")
+        self.assertIsNone(plan.projected_seconds(Throughput([]), {"title": 32}, 1.0))
+        self.assertEqual(estimate_tokens(""), 1)
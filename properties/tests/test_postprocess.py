@@ -0,0 +1,25 @@
+from django.test import TestCase
+from properties.postprocess import clean, problem
+
+
+class PostprocessTests(TestCase):
+    databases = []
+
+    def test_title_is_one_clean_line(self):
+        self.assertEqual(clean("title", '**Title:** "Seaside Escape in Cox\'s Bazar"\nThis title highlights...'),
+                         "Seaside Escape in Cox's Bazar")
+        self.assertEqual(clean("title", "\n\n- “Harbour View Retreat”"), "Harbour View Retreat")
+
+    def test_title_fits_hotel_name_column(self):
+        self.assertLessEqual(len(clean("title", "word " * 100)), 255)
+
+    def test_body_keeps_paragraphs_without_markdown(self):
+        text = '## Summary\n\n"A **bright** hotel   near the beach."\n\n\n\nRating: *4.5/5*'
+        self.assertEqual(clean("summary", text), "A bright hotel near the beach.\n\nRating: 4.5/5")
+        self.assertIsNone(clean("summary", None))
+
+    def test_problem(self):
+        self.assertIsNone(problem("description", "A comfortable hotel close to the sights."))
+        self.assertEqual(problem("title", ""), "empty response")
+        self.assertEqual(problem("summary", "Nice."), "shorter than 10 characters")
+        self.assertEqual(problem("review", "I'm sorry, I can't write that review."), "the model declined to answer")
@@ -1,12 +1,22 @@
 from django.test import TestCase
 from django.core.management import call_command
-from django.core.management.base import CommandError
+from django.core.management.base import CommandError, OutputWrapper
 from unittest.mock import patch, MagicMock
 from io import StringIO
+import argparse
+import json
+import threading
+import time
 
 import requests
+from properties.concurrency import ConcurrencyLimiter
+from properties.dedup import DuplicateGroups
+from properties.llm_cache import ResponseCache
 from properties.models import Hotel, HotelSummary, HotelReview
-from properties.management.commands.process_hotels import Command
+from properties.planning import Throughput
+from properties.writer import BulkWriter, HotelResult
+from properties import prompts
+from properties.management.commands.process_hotels import Command, parse_fields
 
 class CommandTestCase(TestCase):
     databases = []  # Tell Django not to use any databases for these tests
@@ -26,7 +36,7 @@ class CommandTestCase(TestCase):
         self.mock_hotel.lat = 1.0
         self.mock_hotel.lng = 1.0
 
-    @patch('properties.management.commands.process_hotels.requests.post')
+    @patch('properties.ollama.requests.Session.post')
     def test_check_model_status(self, mock_post):
         """Test check_model_status method."""
         # Test successful response
@@ -42,27 +52,64 @@ class CommandTestCase(TestCase):
         self.assertFalse(self.command.check_model_status())  # Expect False since exception is caught
 
 
-    @patch('properties.management.commands.process_hotels.requests.post')
-    @patch('properties.management.commands.process_hotels.time.sleep')
-    def test_pull_llama_model(self, mock_sleep, mock_post):
-        """Test pull_llama_model method."""
-        # Mock stdout.write directly without recursion
-        self.command.stdout.write = MagicMock()
+    def _pull_response(self, events):
+        response = MagicMock(status_code=200)
+        response.__enter__.return_value = response
+        response.iter_lines.return_value = iter([json.dumps(event).encode() for event in events])
+        return response
 
-        # Test successful pulls
-        mock_post.side_effect = [
-            MagicMock(status_code=200),
-            MagicMock(status_code=200)
-        ]
+    @patch('properties.ollama.requests.Session.post')
+    def test_pull_llama_model(self, mock_post):
+        """Test pull_llama_model method."""
+        mock_post.return_value = self._pull_response([
+            {"status": "pulling manifest"},
+            {"status": "pulling abc", "digest": "abc", "total": 2048, "completed": 512},
+            {"status": "pulling abc", "digest": "abc", "total": 2048, "completed": 600},
+            {"status": "pulling abc", "digest": "abc", "total": 2048, "completed": 2048},
+            {"status": "success"},
+        ])
         self.assertTrue(self.command.pull_llama_model())
+        self.assertTrue(mock_post.call_args.kwargs['stream'])
+        output = self.command.stdout.getvalue()
+        self.assertIn("pulling abc: 25% (512 B / 2.0 KB)", output)
+        self.assertIn("pulling abc: 100%", output)
+        self.assertNotIn("29%", output)  # progress is reported in steps of 10%
+
+        # Test an error event from Ollama
+        mock_post.return_value = self._pull_response([{"error": "pull model manifest: file does not exist"}])
+        self.assertFalse(self.command.pull_llama_model())
 
         # Test failed pull (properly simulate failure with an exception)
         mock_post.side_effect = requests.exceptions.RequestException("Pull failed")
         self.assertFalse(self.command.pull_llama_model())  # Ensure the method returns False on failure
 
+    @patch('properties.ollama.requests.Session.post')
+    def test_pull_llama_model_times_out(self, mock_post):
+        """Test that a pull that runs past --pull-timeout is abandoned."""
+        self.command.pull_timeout = 0
+        mock_post.return_value = self._pull_response([
+            {"status": "pulling abc", "total": 100, "completed": 1},
+            {"status": "success"},
+        ])
+        self.assertFalse(self.command.pull_llama_model())
+        self.assertIn("did not finish within", self.command.stdout.getvalue())
 
+    @patch('properties.ollama.requests.Session.post')
+    def test_ensure_model_warms_up_with_keep_alive(self, mock_post):
+        """Test that the model is preloaded with keep_alive before processing starts."""
+        mock_post.return_value = MagicMock(status_code=200)
+        self.command.keep_alive = "1h"
+
+        self.assertTrue(self.command.ensure_model())
+
+        mock_post.assert_called_with(
+            "http://ollama:11434/api/generate",
+            json={"model": Command.MODEL_NAME, "keep_alive": "1h", "stream": False},
+            timeout=self.command.client.timeout,
+        )
+        self.assertIn("Loaded llama3.2", self.command.stdout.getvalue())
 
-    @patch('properties.management.commands.process_hotels.requests.post')
+    @patch('properties.ollama.requests.Session.post')
     def test_generate_ollama_content(self, mock_post):
         """Test generate_ollama_content method."""
         mock_response = MagicMock(
@@ -73,30 +120,34 @@ class CommandTestCase(TestCase):
         result = self.command.generate_ollama_content("Test prompt")
         self.assertEqual(result, 'Generated content')
 
-    @patch('properties.models.HotelSummary.objects.create')
-    @patch('properties.models.HotelReview.objects.create')
     @patch.object(Command, 'generate_ollama_content')
-    def test_process_hotel(self, mock_generate, mock_review_create, mock_summary_create):
+    def test_process_hotel(self, mock_generate):
         """Test process_hotel method."""
         mock_generate.side_effect = [
+            "Test Summary",
+            "Test Review\nRating: 4.5/5",
             "Test Title",
             "Test Description",
-            "Test Summary",
-            "Test Review\nRating: 4.5/5"
         ]
         
         # Test processing the mock hotel
-        self.command.process_hotel(self.mock_hotel)
+        result = self.command.process_hotel(self.mock_hotel)
         
-        # Ensure the create methods were called
-        mock_summary_create.assert_called_once()
-        mock_review_create.assert_called_once()
+        # Ensure every field was generated
+        self.assertEqual(result.summary, "Test Summary")
+        self.assertEqual(result.review, "Test Review\nRating: 4.5/5")
+        self.assertEqual(result.rating, 4.5)
+        self.assertEqual(result.title, "Test Title")
+        self.assertEqual(result.description, "Test Description")
+        self.assertIsNone(result.error)
 
+    @patch.object(Command, 'warm_up')
+    @patch('properties.management.commands.process_hotels.ResponseCache')
     @patch('properties.models.Hotel.objects')
     @patch.object(Command, 'check_model_status')
     @patch.object(Command, 'pull_llama_model')
     @patch.object(Command, 'process_hotel')
-    def test_handle(self, mock_process_hotel, mock_pull_model, mock_check_status, mock_hotel_objects):
+    def test_handle(self, mock_process_hotel, mock_pull_model, mock_check_status, mock_hotel_objects, mock_cache, mock_warm_up):
         """Test handle method."""
         # Set up mocks
         mock_queryset = MagicMock()
@@ -110,9 +161,517 @@ class CommandTestCase(TestCase):
         # Test command execution
         self.command.handle()
         
+    @patch.object(Command, 'generate_ollama_content')
+    def test_duplicate_hotels_are_generated_once(self, mock_generate):
+        """Test that listings with the same fingerprint reuse the first one's content."""
+        mock_generate.side_effect = ["Test Summary", "Review\nRating: 4.5/5", "Title", "Description"]
+        self.command.duplicates = DuplicateGroups()
+        duplicate = MagicMock(
+            id=2, hotel_name="test hotel", hotel_address="123 Test St.", lat=1.0, lng=1.0, price=80.0
+        )
+        self.mock_hotel.id = 1
+
+        first = self.command.process_hotel(self.mock_hotel)
+        second = self.command.process_hotel(duplicate)
+
+        self.assertEqual(mock_generate.call_count, 4)
+        self.assertIs(second.hotel, duplicate)
+        self.assertEqual((second.title, second.summary, second.rating), (first.title, first.summary, first.rating))
+        self.assertEqual(self.command.duplicates.reused, 1)
+
     def test_error_handling(self):
         """Test error handling in process_hotel."""
         with patch.object(Command, 'generate_ollama_content') as mock_generate:
             mock_generate.side_effect = Exception("Test error")
             self.command.process_hotel(self.mock_hotel)
-            self.assertIn("Error processing hotel", self.command.stdout.getvalue())
\ No newline at end of file
+            self.assertIn("Error processing hotel", self.command.stdout.getvalue())
+
+    @patch.object(Command, 'process_hotel')
+    def test_process_concurrently_keeps_output_order(self, mock_process_hotel):
+        """Test that concurrent processing prints each hotel's output in order."""
+        hotels = []
+        for index in range(6):
+            hotel = MagicMock()
+            hotel.hotel_name = f"Hotel {index}"
+            hotel.delay = (6 - index) * 0.01  # later hotels finish first
+            hotels.append(hotel)
+
+        def process(hotel):
+            time.sleep(hotel.delay)
+            self.command.log(f"Done {hotel.hotel_name}")
+        mock_process_hotel.side_effect = process
+
+        output = StringIO()
+        self.command.stdout = OutputWrapper(output)
+        self.command.process_concurrently(hotels, len(hotels), workers=3)
+
+        lines = [line for line in output.getvalue().splitlines() if line.startswith("Done")]
+        self.assertEqual(lines, [f"Done Hotel {index}" for index in range(6)])
+        self.assertEqual(mock_process_hotel.call_count, 6)
+
+    @patch('properties.ollama.requests.Session.post')
+    def test_generate_ollama_content_respects_inflight_cap(self, mock_post):
+        """Test that generate_ollama_content never exceeds the in-flight cap."""
+        self.command.limiter = ConcurrencyLimiter(2)
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def post(*args, **kwargs):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.pop()
+            return MagicMock(status_code=200, json=lambda: {'response': 'ok'})
+        mock_post.side_effect = post
+
+        threads = [threading.Thread(target=self.command.generate_ollama_content, args=("prompt",)) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertLessEqual(max(peak), 2)
+
+    def test_iter_hotels_uses_keyset_pagination(self):
+        """Test that iter_hotels pages through hotels by id without offsets."""
+        rows = [MagicMock(id=hotel_id) for hotel_id in range(1, 8)]
+        queryset = MagicMock()
+        filters = []
+
+        def filter_after(id__gt):
+            filters.append(id__gt)
+            return self._page([row for row in rows if row.id > id__gt])
+
+        def order_by(*fields):
+            page = self._page(rows)
+            page.filter.side_effect = filter_after
+            return page
+        queryset.order_by.side_effect = order_by
+
+        hotels = list(self.command.iter_hotels(queryset, chunk_size=3))
+        self.assertEqual([hotel.id for hotel in hotels], list(range(1, 8)))
+        self.assertEqual(filters, [3, 6])
+
+        hotels = list(self.command.iter_hotels(queryset, chunk_size=3, limit=4))
+        self.assertEqual([hotel.id for hotel in hotels], [1, 2, 3, 4])
+
+    def _page(self, rows):
+        page = MagicMock()
+        page.__getitem__.side_effect = lambda key: rows[key]
+        return page
+
+    @patch.object(Command, 'generate_ollama_content')
+    def test_process_hotel_structured(self, mock_generate):
+        """Test that structured mode generates every field with one request."""
+        self.command.structured = True
+        mock_generate.return_value = json.dumps({
+            "title": "Test Title",
+            "description": "Test Description",
+            "summary": "Test Summary",
+            "review": "Test Review",
+            "rating": 4.5,
+        })
+
+        result = self.command.process_hotel(self.mock_hotel)
+
+        mock_generate.assert_called_once()
+        self.assertIn('format', mock_generate.call_args.kwargs)
+        self.assertEqual(result.summary, "Test Summary")
+        self.assertEqual(result.rating, 4.5)
+        self.assertEqual(result.title, "Test Title")
+        self.assertEqual(result.description, "Test Description")
+
+    @patch.object(Command, 'generate_ollama_content')
+    def test_process_hotel_structured_fallback(self, mock_generate):
+        """Test that only invalid structured fields fall back to their own prompts."""
+        self.command.structured = True
+        mock_generate.side_effect = [
+            json.dumps({
+                "title": "Test Title",
+                "description": "",
+                "summary": "Test Summary",
+                "review": "Test Review\nRating: 3.5/5",
+                "rating": 12,
+            }),
+            "Fallback Description",
+        ]
+
+        result = self.command.process_hotel(self.mock_hotel)
+
+        # The valid review is kept and its rating parsed from the text instead of regenerating it
+        self.assertEqual(mock_generate.call_count, 2)
+        self.assertEqual(result.review, "Test Review\nRating: 3.5/5")
+        self.assertEqual(result.rating, 3.5)
+        self.assertEqual(result.prompt_versions["review"], prompts.PROMPTS["structured"].key)
+        self.assertEqual(result.description, "Fallback Description")
+
+    @patch('properties.management.commands.process_hotels.Throughput.recent')
+    @patch.object(Command, 'generate_ollama_content')
+    def test_plan_batch_renders_prompts_without_sending(self, mock_generate, mock_recent):
+        """Test that --plan counts prompts, cache hits and duplicates without calling Ollama."""
+        mock_recent.return_value = Throughput([])
+        self.command.duplicates = DuplicateGroups()
+        self.command.cache = MagicMock()
+        self.command.cache.make_key.side_effect = lambda model, prompt, options: prompt
+        title_prompt = prompts.render("title", **prompts.hotel_context(self.mock_hotel))
+        self.command.cache.cached_keys.side_effect = lambda keys: {title_prompt} & set(keys)
+        duplicate = MagicMock(**{attr: getattr(self.mock_hotel, attr) for attr in (
+            'hotel_name', 'hotel_address', 'price', 'rating', 'room_type', 'lat', 'lng')})
+        duplicate.id = 2
+        self.mock_hotel.id = 1
+
+        self.command.plan_batch(iter([self.mock_hotel, duplicate]), 2)
+
+        mock_generate.assert_not_called()
+        output = self.command.stdout.getvalue()
+        self.assertIn("Hotels to generate: 1", output)
+        self.assertIn("1 duplicates of another listing", output)
+        self.assertIn("Prompts: 4 (summary 1, review 1, title 1, description 1), 1 answered from the cache", output)
+        self.assertIn("run time cannot be projected", output)
+
+    @patch.object(Command, 'generate_ollama_content')
+    def test_failed_field_does_not_lose_the_hotel(self, mock_generate):
+        """Test that a field Ollama fails to generate is left out without failing the other fields."""
+        mock_generate.side_effect = ["Test Summary", "Test Review\nRating: 4/5", None, "Test Description"]
+
+        result = self.command.generate_hotel(self.mock_hotel)
+
+        self.assertIsNone(result.error)
+        self.assertIsNone(result.title)
+        self.assertNotIn("title", result.prompt_versions)
+        self.assertEqual(result.description, "Test Description")
+
+    @patch.object(Command, 'generate_ollama_content')
+    def test_invalid_field_is_cleaned_or_regenerated(self, mock_generate):
+        """Test that formatting is fixed in place and only invalid text is generated again."""
+        mock_generate.side_effect = ["Sure!", "A calm hotel near the park.", '**"Grand Test Hotel"**\nA title for you']
+
+        result = self.command.generate_hotel(self.mock_hotel, ("title", "summary"))
+
+        self.assertEqual(result.title, "Grand Test Hotel")
+        self.assertEqual(result.summary, "A calm hotel near the park.")
+        self.assertEqual([call.kwargs['attempt'] for call in mock_generate.call_args_list], [0, 1, 0])
+        self.assertEqual(self.command.metrics.rejected_fields, {"summary": 1})
+
+    @patch.object(Command, 'generate_ollama_content')
+    def test_retry_budget_limits_regeneration(self, mock_generate):
+        """Test that fields are not regenerated once the run's retry budget is used up."""
+        mock_generate.return_value = "Sure!"
+        self.command.field_retries = 3
+        self.command.retry_budget = 1
+
+        result = self.command.generate_hotel(self.mock_hotel, ("summary",))
+
+        self.assertIsNone(result.summary)
+        self.assertEqual(mock_generate.call_count, 2)
+        self.assertEqual(self.command.retry_budget, 0)
+
+    @patch('properties.ollama.requests.Session.post')
+    def test_regenerations_are_cached_separately(self, mock_post):
+        """Test that a regeneration is not answered with the rejected response from the cache."""
+        _, first, _ = self.command.request_data("prompt", field="summary")
+        _, retry, _ = self.command.request_data("prompt", field="summary", attempt=1)
+        self.assertNotEqual(self.command.cache.make_key("m", "prompt", first), self.command.cache.make_key("m", "prompt", retry))
+
+    @patch.object(Command, 'generate_ollama_content')
+    def test_unparsable_rating_is_requested_as_json(self, mock_generate):
+        """Test that a review without a rating in its text gets one from a JSON-format request."""
+        mock_generate.side_effect = ["A lovely stay overall.", json.dumps({"rating": 4.0})]
+
+        result = self.command.generate_hotel(self.mock_hotel, ("review",))
+
+        self.assertEqual(result.rating, 4.0)
+        self.assertEqual(result.review, "A lovely stay overall.")
+        self.assertEqual(mock_generate.call_args.kwargs['field'], "rating")
+        self.assertIn('format', mock_generate.call_args.kwargs)
+        self.assertEqual(self.command.metrics.unparsed_reviews, 1)
+        self.assertEqual(self.command.metrics.unrated_reviews, 0)
+
+    @patch.object(Command, 'generate_ollama_content')
+    def test_review_without_valid_rating_is_saved_unrated(self, mock_generate):
+        """Test that a review whose rating cannot be recovered is kept without inventing one."""
+        mock_generate.side_effect = ["A lovely stay overall.", json.dumps({"rating": 9})]
+
+        result = self.command.generate_hotel(self.mock_hotel, ("review",))
+
+        self.assertIsNone(result.rating)
+        self.assertEqual(result.review, "A lovely stay overall.")
+        self.assertEqual(self.command.metrics.unrated_reviews, 1)
+
+    @patch('properties.ollama.requests.Session.post')
+    def test_generate_ollama_content_uses_cache(self, mock_post):
+        """Test that cached responses are returned without calling Ollama."""
+        self.command.cache = MagicMock()
+        self.command.cache.get.return_value = 'Cached content'
+
+        self.assertEqual(self.command.generate_ollama_content("Test prompt"), 'Cached content')
+        mock_post.assert_not_called()
+
+        self.command.cache.get.return_value = None
+        mock_post.return_value = MagicMock(status_code=200, json=lambda: {'response': 'Generated content'})
+        self.assertEqual(self.command.generate_ollama_content("Test prompt"), 'Generated content')
+        self.command.cache.set.assert_called_once_with(
+            self.command.cache.make_key.return_value, Command.MODEL_NAME, 'Generated content'
+        )
+
+    @patch('properties.management.commands.process_hotels.ProcessingRun')
+    def test_save_run_records_time_after_warm_up(self, MockRun):
+        """Test that the throughput history --plan uses leaves out model warm-up."""
+        self.command.workers = self.command.max_inflight = 1
+        self.command.metrics.started -= 60
+        self.command.metrics.start_processing()
+        self.command.metrics.record_prompt(1, "title", 1.0, {"eval_count": 10, "eval_duration": 1_000_000_000})
+
+        self.command.save_run()
+
+        self.assertLess(MockRun.objects.create.call_args.kwargs['wall_seconds'], 1)
+
+    @patch('properties.llm_cache.LLMCacheEntry')
+    @patch('properties.ollama.requests.Session.post')
+    def test_rejected_field_is_not_cached_for_the_next_run(self, mock_post, MockEntry):
+        """Test that a field rejected in one run is asked for again in the next, not read back from the cache."""
+        stored = {}
+
+        def entries(key):
+            rows = MagicMock()
+            rows.values_list.return_value.first.return_value = stored.get(key)
+            rows.delete.side_effect = lambda: stored.pop(key, None)
+            return rows
+        MockEntry.objects.filter.side_effect = entries
+        MockEntry.objects.update_or_create.side_effect = lambda key, defaults: stored.update({key: defaults['response']})
+        mock_post.return_value = MagicMock(status_code=200, json=lambda: {'response': 'I am sorry, I cannot help.'})
+        context = prompts.hotel_context(self.mock_hotel)
+
+        for run in (1, 2):
+            command = Command()
+            command.stdout = StringIO()
+            command.cache = ResponseCache()
+            self.assertEqual(command.generated_or_prompt({}, "title", context)[0], None)
+            self.assertEqual((command.cache.hits, command.cache.misses), (0, 2))
+        # Both attempts of both runs reached the model
+        self.assertEqual(mock_post.call_count, 4)
+        self.assertEqual(stored, {})
+
+        # A response cached before validation gated the cache is dropped instead of served
+        stored[command.cache.make_key(Command.MODEL_NAME, prompts.render("title", **context), {"format": None})] = "No"
+        mock_post.return_value = MagicMock(status_code=200, json=lambda: {'response': 'Seaside Retreat'})
+        command.cache = ResponseCache()
+        self.assertEqual(command.generated_or_prompt({}, "title", context)[0], "Seaside Retreat")
+        self.assertEqual(command.cache.misses, 1)
+        self.assertEqual(list(stored.values()), ["Seaside Retreat"])
+
+    @patch('properties.management.commands.process_hotels.HotelProcessingState')
+    def test_exclude_processed_skips_unchanged_hotels(self, MockState):
+        """Test that hotels processed with the same inputs and prompts are skipped."""
+        unchanged = MagicMock(id=1)
+        unchanged.source_hash.return_value = "same"
+        changed = MagicMock(id=2)
+        changed.source_hash.return_value = "new"
+        new = MagicMock(id=3)
+        new.source_hash.return_value = "hash"
+        current = {field: prompts.PROMPTS[field].key for field in prompts.FIELDS}
+        MockState.objects.filter.return_value.values_list.return_value = [(1, "same", current), (2, "old", current)]
+
+        pending = self.command.exclude_processed([unchanged, changed, new])
+
+        self.assertEqual(pending, [changed, new])
+        self.assertEqual(self.command.skipped, 1)
+        self.assertEqual(self.command.planned_fields, {})
+
+    @patch('properties.management.commands.process_hotels.HotelProcessingState')
+    def test_exclude_processed_only_skips_finished_hotels(self, MockState):
+        """Test that a hotel whose run was interrupted is processed again even though its hash matches."""
+        hotel = MagicMock(id=1)
+        hotel.source_hash.return_value = "same"
+        # mark_running stored the hash, but the state is not done so the query leaves it out
+        MockState.objects.filter.return_value.values_list.return_value = []
+
+        self.assertEqual(self.command.exclude_processed([hotel]), [hotel])
+        self.assertEqual(MockState.objects.filter.call_args.kwargs['status'], MockState.DONE)
+        self.assertEqual(self.command.skipped, 0)
+
+    @patch('properties.writer.HotelProcessingState')
+    @patch('properties.management.commands.process_hotels.HotelProcessingState')
+    def test_partial_run_on_changed_hotel_leaves_other_fields_stale(self, MockState, MockWriterState):
+        """Test that --fields on a hotel whose source changed does not mark its other fields as current."""
+        hotel = MagicMock(id=1)
+        hotel.source_hash.return_value = "new"
+        current = {field: prompts.PROMPTS[field].key for field in prompts.FIELDS}
+        state = MagicMock(hotel_id=1, input_hash="old", field_versions=dict(current))
+        # The price changed after a full run, then a run with --fields description
+        MockState.objects.filter.return_value.values_list.return_value = [(1, "old")]
+        MockState.objects.filter.return_value.update.side_effect = lambda **values: setattr(
+            state, 'field_versions', values['field_versions']
+        )
+        self.command.mark_running([hotel])
+        self.assertEqual(MockState.call_args.kwargs['input_hash'], "new")
+
+        MockWriterState.objects.filter.return_value.only.return_value = [state]
+        BulkWriter().record_prompt_versions([HotelResult(
+            hotel, description="New", fields=("description",), prompt_versions={"description": current["description"]},
+        )])
+
+        # A plain run regenerates every field the partial run left out
+        MockState.objects.filter.return_value.values_list.return_value = [(1, "new", state.field_versions)]
+        self.assertEqual(self.command.exclude_processed([hotel]), [hotel])
+        self.assertEqual(self.command.planned_fields, {1: ("summary", "review", "title")})
+        self.assertEqual(self.command.skipped, 0)
+
+    @patch('properties.management.commands.process_hotels.HotelProcessingState')
+    def test_exclude_processed_plans_fields_with_changed_prompts(self, MockState):
+        """Test that only fields whose prompt template changed are regenerated."""
+        hotel = MagicMock(id=1)
+        hotel.source_hash.return_value = "same"
+        versions = {field: prompts.PROMPTS[field].key for field in prompts.FIELDS}
+        versions["description"] = "description:0"
+        versions["title"] = prompts.PROMPTS["structured"].key
+        MockState.objects.filter.return_value.values_list.return_value = [(1, "same", versions)]
+
+        self.assertEqual(self.command.exclude_processed([hotel]), [hotel])
+        self.assertEqual(self.command.planned_fields, {1: ("description",)})
+
+        self.command.planned_fields = {}
+        self.command.fields = ("title", "summary")
+        self.assertEqual(self.command.exclude_processed([hotel]), [])
+
+    @patch.object(Command, 'generate_ollama_content')
+    def test_process_hotel_generates_only_planned_fields(self, mock_generate):
+        """Test that a hotel planned for some fields only generates and records those."""
+        mock_generate.return_value = "New Description"
+        self.mock_hotel.id = 1
+        self.command.planned_fields = {1: ("description",)}
+
+        result = self.command.process_hotel(self.mock_hotel)
+
+        mock_generate.assert_called_once()
+        self.assertIn("hotel description", mock_generate.call_args.args[0])
+        self.assertEqual(result.fields, ("description",))
+        self.assertEqual(result.description, "New Description")
+        self.assertIsNone(result.summary)
+        self.assertEqual(result.prompt_versions, {"description": prompts.PROMPTS["description"].key})
+        self.assertEqual(self.command.planned_fields, {})
+
+    def test_record_and_replay_transports(self):
+        """Test that --record and --replay pick a transport and cannot be combined."""
+        self.assertIsNone(self.command.transport())
+        with self.assertRaises(CommandError):
+            self.command.transport(record="a.cassette", replay="b.cassette")
+        with self.assertRaises(CommandError):
+            self.command.transport(replay="/nonexistent/run.cassette")
+
+    def test_parse_fields(self):
+        """Test that --fields accepts known fields only."""
+        self.assertEqual(parse_fields("description, title,description"), ("description", "title"))
+        with self.assertRaises(argparse.ArgumentTypeError):
+            parse_fields("rating")
+
+    @patch('properties.management.commands.process_hotels.HotelProcessingState')
+    def test_resume_start_id(self, MockState):
+        """Test that resume continues from interrupted hotels, then after the last finished one."""
+        queryset = MagicMock()
+        aggregate = MockState.objects.filter.return_value.filter.return_value.aggregate
+        aggregate.side_effect = [{'hotel_id': 7}]
+        self.assertEqual(self.command.resume_start_id(queryset), 7)
+
+        aggregate.side_effect = [{'hotel_id': None}, {'hotel_id': 12}]
+        self.assertEqual(self.command.resume_start_id(queryset), 13)
+
+        aggregate.side_effect = [{'hotel_id': None}, {'hotel_id': None}]
+        self.assertIsNone(self.command.resume_start_id(queryset))
+
+        # Only the states of the hotels the run selects are considered
+        MockState.objects.filter.assert_called_with(hotel__in=queryset.values.return_value)
+        queryset.values.assert_called_with('id')
+
+    @patch.object(Command, 'resume_start_id', return_value=40)
+    @patch.object(Command, 'plan_batch')
+    @patch('properties.management.commands.process_hotels.Hotel.objects')
+    def test_resume_combines_with_city_and_start_id(self, mock_hotels, mock_plan, mock_resume):
+        """Test that --resume is computed over the filtered hotels and never goes below --start-id."""
+        queryset = MagicMock()
+        queryset.filter.return_value = queryset
+        mock_hotels.all.return_value = queryset
+
+        call_command('process_hotels', '--plan', '--resume', '--city-id', '3', '--start-id', '50', stdout=StringIO())
+
+        self.assertIs(mock_resume.call_args.args[0], queryset)
+        self.assertEqual(
+            [call.kwargs for call in queryset.filter.call_args_list],
+            [{'id__gte': 50}, {'city_id': 3}, {'id__gte': 50}],
+        )
+
+    @patch.object(Command, 'generate_ollama_content')
+    def test_process_hotel_records_failure(self, mock_generate):
+        """Test that a failed hotel is returned with its error so it can be retried."""
+        mock_generate.side_effect = Exception("Test error")
+
+        result = self.command.process_hotel(self.mock_hotel)
+
+        self.assertEqual(result.error, "Test error")
+        self.assertIs(result.hotel, self.mock_hotel)
+
+    @patch.object(Command, 'process_hotel')
+    def test_process_concurrently_records_results_in_order(self, mock_process_hotel):
+        """Test that concurrent results reach the writer in submission order."""
+        hotels = [MagicMock(id=index, delay=(5 - index) * 0.01) for index in range(5)]
+
+        def process(hotel):
+            time.sleep(hotel.delay)
+            return hotel
+        mock_process_hotel.side_effect = process
+        self.command.writer = MagicMock()
+
+        self.command.process_concurrently(hotels, len(hotels), workers=3)
+
+        written = [call.args[0] for call in self.command.writer.add.call_args_list]
+        self.assertEqual(written, hotels)
+
+    @patch('properties.management.commands.process_hotels.connections')
+    @patch.object(Command, 'process_hotel')
+    def test_process_concurrently_closes_connections_after_an_error(self, mock_process_hotel, mock_connections):
+        """Test that worker threads close their database connections even when the run fails."""
+        mock_process_hotel.side_effect = RuntimeError("Writer failed")
+        self.command.writer = MagicMock()
+
+        with self.assertRaises(RuntimeError):
+            self.command.process_concurrently([MagicMock(id=index) for index in range(6)], 6, workers=2)
+
+        self.assertEqual(mock_connections.close_all.call_count, 2)
+
+    def _stream_response(self, tokens):
+        response = MagicMock(status_code=200)
+        response.__enter__.return_value = response
+        chunks = [json.dumps({"response": token, "done": False}).encode() for token in tokens]
+        chunks.append(json.dumps({"response": "", "done": True}).encode())
+        response.iter_lines.return_value = iter(chunks)
+        return response
+
+    @patch('properties.ollama.requests.Session.post')
+    def test_stream_stops_title_at_first_line(self, mock_post):
+        """Test that streamed titles stop at the first newline and use a token budget."""
+        self.command.stream = True
+        response = self._stream_response(["\n", "Grand", " Hotel", "\nThis title", " keeps going"])
+        mock_post.return_value = response
+
+        title = self.command.generate_ollama_content("Title prompt", field="title")
+
+        self.assertEqual(title, "Grand Hotel")
+        payload = mock_post.call_args.kwargs['json']
+        self.assertTrue(payload['stream'])
+        self.assertEqual(payload['options']['num_predict'], Command.FIELD_TOKEN_BUDGETS['title'])
+        response.__exit__.assert_called_once()
+        self.assertEqual(len(self.command.metrics.first_token_times), 1)
+
+    @patch('properties.ollama.requests.Session.post')
+    def test_stream_reads_multi_line_fields_to_the_end(self, mock_post):
+        """Test that streamed multi-line fields are read until Ollama reports done."""
+        self.command.stream = True
+        mock_post.return_value = self._stream_response(["First line.", "\n", "Second line."])
+
+        description = self.command.generate_ollama_content("Description prompt", field="description")
+
+        self.assertEqual(description, "First line.\nSecond line.")
+
@@ -0,0 +1,30 @@
+from unittest.mock import MagicMock, patch
+from django.test import TestCase
+from properties import prompts
+
+
+class PromptRegistryTests(TestCase):
+    databases = []
+
+    def test_every_field_has_a_template(self):
+        for field in prompts.FIELDS + ("structured",):
+            self.assertIn(field, prompts.PROMPTS)
+
+    def test_render_fills_hotel_context(self):
+        hotel = MagicMock(hotel_name="Grand Hotel", hotel_address="1 Main St")
+        context = prompts.hotel_context(hotel)
+        self.assertTrue(prompts.render("title", **context).endswith(": Grand Hotel"))
+        self.assertIn("Address: 1 Main St", prompts.render("summary", **context))
+
+    def test_is_current(self):
+        self.assertTrue(prompts.is_current(prompts.PROMPTS["title"].key))
+        self.assertFalse(prompts.is_current("title:0"))
+        self.assertFalse(prompts.is_current("unknown:1"))
+        self.assertFalse(prompts.is_current(None))
+
+    @patch.dict(prompts.PROMPTS)
+    def test_registry_version_changes_with_templates(self):
+        before = prompts.registry_version()
+        prompts.register("title", "2", "New title prompt: {hotel_name}")
+        self.assertNotEqual(prompts.registry_version(), before)
+        self.assertFalse(prompts.is_current("title:1"))
@@ -0,0 +1,67 @@
+import os
+import tempfile
+import time
+from functools import partial
+
+from django.test import TestCase
+
+from properties.benchmark import FakeOllamaServer
+from properties.ollama import OllamaClient
+from properties.transport import Cassette, CassetteMiss, RecordingAdapter, ReplayAdapter, request_key
+
+
+class TransportTests(TestCase):
+    databases = []
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "ollama.cassette")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def record(self, latency=0.0):
+        with FakeOllamaServer(latency=latency, jitter=0) as fake:
+            client = OllamaClient(base_url=fake.base_url, transport=partial(RecordingAdapter, Cassette(self.path)))
+            generated = client.generate({"model": "llama3.2", "prompt": "Write a review", "stream": False}).json()
+            with client.generate_stream({"model": "llama3.2", "prompt": "Write a title"}) as response:
+                streamed = list(client.iter_stream(response))
+            client.close()
+        return generated, streamed
+
+    def replay_client(self, speed=0):
+        cassette = Cassette.load(self.path)
+        # A different host: requests are matched on their path and body
+        return OllamaClient(base_url="http://replay:11434", transport=partial(ReplayAdapter, cassette, speed=speed))
+
+    def test_replay_returns_recorded_responses(self):
+        generated, streamed = self.record()
+
+        client = self.replay_client()
+        self.assertEqual(client.generate({"model": "llama3.2", "prompt": "Write a review", "stream": False}).json(), generated)
+        with client.generate_stream({"model": "llama3.2", "prompt": "Write a title", "keep_alive": "5m"}) as response:
+            self.assertEqual(list(client.iter_stream(response)), streamed)
+        with self.assertRaises(CassetteMiss):
+            client.generate({"model": "llama3.2", "prompt": "Never recorded", "stream": False})
+
+    def test_replay_at_recorded_latency(self):
+        self.record(latency=0.2)
+        payload = {"model": "llama3.2", "prompt": "Write a review", "stream": False}
+
+        started = time.monotonic()
+        self.replay_client().generate(payload)
+        instant = time.monotonic() - started
+        started = time.monotonic()
+        self.replay_client(speed=1).generate(payload)
+        paced = time.monotonic() - started
+
+        self.assertLess(instant, 0.1)
+        self.assertGreaterEqual(paced, 0.18)
+
+    def test_repeated_requests_replay_in_order(self):
+        cassette = Cassette(self.path)
+        key = request_key("POST", "http://a/api/show", b'{"name": "llama3.2"}')
+        for status in (500, 200):
+            cassette.add({"key": key, "status": status, "headers": {}, "headers_at": 0, "chunks": []})
+        self.assertEqual([cassette.next(key)["status"] for _ in range(3)], [500, 200, 200])
+        self.assertEqual(key, request_key("POST", "http://b/api/show", b'{"name":"llama3.2"}'))
@@ -0,0 +1,95 @@
+import json
+from unittest.mock import MagicMock, patch
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from properties import views
+from properties.api_cache import city_page_key, hotel_key, invalidate_hotels
+
+
+def make_hotel(hotel_id, city_id=3):
+    hotel = MagicMock(
+        id=hotel_id, hotel_id=1000 + hotel_id, city_id=city_id, hotel_name=f"Hotel {hotel_id}",
+        description="Generated description", hotel_address="1 Main St", hotel_img="hotel.jpg",
+        price=100.0, rating=4.5, room_type="Double", lat=1.0, lng=2.0,
+    )
+    hotel.summaries = [MagicMock(summary="Latest summary", prompt_version="summary:1")]
+    hotel.reviews = []
+    hotel.processing_state = None
+    return hotel
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class HotelApiTests(TestCase):
+    databases = []
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    @patch('properties.views.hotels_with_content')
+    def test_hotel_detail_is_cached_with_etag(self, mock_hotels):
+        mock_hotels.return_value.filter.return_value.first.return_value = make_hotel(1)
+
+        response = views.hotel_detail(self.factory.get('/api/hotels/1/'), pk=1)
+        payload = json.loads(response.content)
+        self.assertEqual(payload['title'], "Hotel 1")
+        self.assertEqual(payload['summary'], {'text': "Latest summary", 'prompt_version': "summary:1"})
+        self.assertIsNone(payload['review'])
+        etag = response['ETag']
+
+        # Served from the cache, and not sent again when the client already has it
+        response = views.hotel_detail(self.factory.get('/api/hotels/1/', HTTP_IF_NONE_MATCH=etag), pk=1)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(mock_hotels.call_count, 1)
+
+        # New content from process_hotels invalidates the cached response
+        updated = make_hotel(1)
+        updated.hotel_name = "Rewritten title"
+        mock_hotels.return_value.filter.return_value.first.return_value = updated
+        invalidate_hotels([updated])
+        response = views.hotel_detail(self.factory.get('/api/hotels/1/', HTTP_IF_NONE_MATCH=etag), pk=1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['title'], "Rewritten title")
+        self.assertNotEqual(response['ETag'], etag)
+
+    @patch('properties.views.hotels_with_content')
+    def test_hotel_detail_not_found(self, mock_hotels):
+        mock_hotels.return_value.filter.return_value.first.return_value = None
+        response = views.hotel_detail(self.factory.get('/api/hotels/9/'), pk=9)
+        self.assertEqual(response.status_code, 404)
+
+    @patch('properties.views.hotels_with_content')
+    def test_hotel_list_pages_with_cursor(self, mock_hotels):
+        ordered = mock_hotels.return_value.filter.return_value.order_by.return_value
+        ordered.__getitem__.return_value = [make_hotel(1), make_hotel(2), make_hotel(3)]
+
+        response = views.hotel_list(self.factory.get('/api/hotels/', {'city_id': 3, 'limit': 2}))
+        payload = json.loads(response.content)
+        self.assertEqual([hotel['id'] for hotel in payload['results']], [1, 2])
+        self.assertEqual(views.decode_cursor(payload['next_cursor']), 2)
+        mock_hotels.return_value.filter.assert_called_with(city_id=3)
+        ordered.__getitem__.assert_called_with(slice(None, 3))
+
+        ordered.filter.return_value.__getitem__.return_value = [make_hotel(3)]
+        response = views.hotel_list(
+            self.factory.get('/api/hotels/', {'city_id': 3, 'limit': 2, 'cursor': payload['next_cursor']})
+        )
+        payload = json.loads(response.content)
+        ordered.filter.assert_called_with(id__gt=2)
+        self.assertEqual([hotel['id'] for hotel in payload['results']], [3])
+        self.assertIsNone(payload['next_cursor'])
+
+    def test_hotel_list_validates_parameters(self):
+        self.assertEqual(views.hotel_list(self.factory.get('/api/hotels/')).status_code, 400)
+        self.assertEqual(views.hotel_list(self.factory.get('/api/hotels/', {'city_id': 'x'})).status_code, 400)
+        self.assertEqual(
+            views.hotel_list(self.factory.get('/api/hotels/', {'city_id': 3, 'cursor': '!!'})).status_code, 400
+        )
+
+    def test_invalidation_bumps_city_page_keys(self):
+        before = city_page_key(3, None, 50)
+        cache.set(hotel_key(1), {'etag': '"x"', 'body': '{}'})
+        invalidate_hotels([make_hotel(1, city_id=3)])
+        self.assertIsNone(cache.get(hotel_key(1)))
+        self.assertNotEqual(city_page_key(3, None, 50), before)
@@ -0,0 +1,72 @@
+from unittest.mock import MagicMock, patch
+from django.test import TestCase
+from properties.writer import BulkWriter, HotelResult
+
+
+@patch('properties.writer.invalidate_hotels', MagicMock())
+@patch('properties.writer.transaction.atomic', MagicMock())
+class BulkWriterTests(TestCase):
+    databases = []
+
+    def setUp(self):
+        self.hotel = MagicMock(id=1, hotel_id=101, hotel_name="Old Name", description=None)
+
+    @patch('properties.writer.HotelProcessingState')
+    @patch('properties.writer.Hotel')
+    @patch('properties.writer.HotelReview')
+    @patch('properties.writer.HotelSummary')
+    def test_flushes_when_batch_is_full(self, MockSummary, MockReview, MockHotel, MockState):
+        writer = BulkWriter(flush_size=2)
+        writer.add(HotelResult(self.hotel, summary="Summary"))
+        MockSummary.objects.bulk_create.assert_not_called()
+
+        writer.add(HotelResult(self.hotel, title="New Name", review="Review", rating=4.0))
+        MockSummary.objects.bulk_create.assert_called_once()
+        self.assertEqual(len(MockReview.objects.bulk_create.call_args.args[0]), 1)
+        MockHotel.objects.bulk_update.assert_called_once_with([self.hotel], ['hotel_name', 'description'])
+        self.assertEqual(self.hotel.hotel_name, "New Name")
+
+    @patch('properties.writer.HotelProcessingState')
+    @patch('properties.writer.Hotel')
+    @patch('properties.writer.HotelReview')
+    @patch('properties.writer.HotelSummary')
+    def test_flush_upserts_outputs_and_records_state(self, MockSummary, MockReview, MockHotel, MockState):
+        failed_hotel = MagicMock(id=2, hotel_id=102)
+        writer = BulkWriter()
+        writer.add(HotelResult(self.hotel, summary="Summary"))
+        writer.add(HotelResult(failed_hotel, error="Test error"))
+        writer.flush()
+
+        summaries = MockSummary.objects.bulk_create.call_args
+        self.assertEqual(len(summaries.args[0]), 1)
+        self.assertTrue(summaries.kwargs['update_conflicts'])
+        self.assertEqual(summaries.kwargs['unique_fields'], ['hotel'])
+        MockSummary.objects.filter.assert_not_called()
+        MockHotel.objects.bulk_update.assert_not_called()
+        MockState.objects.filter.assert_any_call(hotel_id__in=[1])
+        MockState.objects.filter.assert_any_call(hotel_id=2)
+
+    @patch('properties.writer.HotelProcessingState')
+    @patch('properties.writer.Hotel')
+    @patch('properties.writer.HotelReview')
+    @patch('properties.writer.HotelSummary')
+    def test_partial_results_keep_other_outputs(self, MockSummary, MockReview, MockHotel, MockState):
+        state = MagicMock(hotel_id=1, field_versions={"summary": "summary:1", "title": "title:1", "description": "description:1"})
+        MockState.objects.filter.return_value.only.return_value = [state]
+        writer = BulkWriter()
+        writer.add(HotelResult(
+            self.hotel, description="New", fields=("description", "title"),
+            prompt_versions={"description": "description:2"},
+        ))
+        writer.flush()
+
+        MockSummary.objects.filter.assert_not_called()
+        MockReview.objects.filter.assert_not_called()
+        # The title was requested but not generated, so it is retried next time
+        self.assertEqual(state.field_versions, {"summary": "summary:1", "description": "description:2"})
+        MockState.objects.bulk_update.assert_called_once_with([state], ['field_versions'])
+
+    @patch('properties.writer.HotelSummary')
+    def test_flush_without_results_does_nothing(self, MockSummary):
+        BulkWriter().flush()
+        self.assertFalse(MockSummary.objects.method_calls)
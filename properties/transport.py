@@ -0,0 +1,240 @@
+"""Record Ollama traffic to a cassette file and replay it without a GPU.
+
+A cassette is a gzip-compressed JSON lines file with one request/response pair per line.
+It keeps the response body as the chunks that arrived and when each one arrived, so a
+replay can serve the responses instantly or at the recorded latency. Both transports are
+requests adapters, which OllamaClient mounts in place of its HTTPAdapter.
+
+Requests are matched on their prompts, which include the hotel's current name. A replay
+must therefore run against the data the recording started from, not the data it wrote.
+"""
+import gzip
+import json
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+# Request fields that do not change the response
+IGNORED_FIELDS = ("keep_alive",)
+# The recorded body is stored decoded, so these headers no longer describe it
+DROPPED_HEADERS = ("content-encoding", "content-length", "transfer-encoding", "connection", "date")
+
+
+class CassetteMiss(requests.exceptions.ConnectionError):
+    """Replay has no recorded response for a request"""
+
+
+def request_key(method, url, body):
+    """Identify a request by method, path and JSON body, whichever Ollama host it went to"""
+    try:
+        payload = json.loads(body) if body else None
+    except ValueError:
+        payload = body.decode("utf-8", "replace") if isinstance(body, bytes) else body
+    if isinstance(payload, dict):
+        payload = {key: value for key, value in payload.items() if key not in IGNORED_FIELDS}
+    return f"{method} {urlsplit(url).path} {json.dumps(payload, sort_keys=True)}"
+
+
+class Cassette:
+    """Recorded exchanges, indexed by request for replay.
+
+    A request recorded several times is replayed in the recorded order, and the last
+    response is repeated once they run out.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = []
+        self._index = defaultdict(list)
+        self._served = defaultdict(int)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        cassette = cls(path)
+        with gzip.open(path, "rt", encoding="utf-8") as lines:
+            for line in lines:
+                if line.strip():
+                    cassette.add(json.loads(line))
+        return cassette
+
+    def add(self, entry):
+        with self._lock:
+            self.entries.append(entry)
+            self._index[entry["key"]].append(entry)
+
+    def next(self, key):
+        """The response to serve for a request, or None if it was never recorded"""
+        with self._lock:
+            recorded = self._index.get(key)
+            if not recorded:
+                return None
+            position = self._served[key]
+            self._served[key] += 1
+            return recorded[min(position, len(recorded) - 1)]
+
+    def save(self):
+        with self._lock:
+            entries = list(self.entries)
+        with gzip.open(self.path, "wt", encoding="utf-8") as lines:
+            for entry in entries:
+                lines.write(json.dumps(entry) + "\n")
+
+
+class _RecordingBody:
+    """Wraps a urllib3 response body, recording each chunk and its arrival time as it is read"""
+
+    def __init__(self, raw, started, finish):
+        self._raw = raw
+        self._started = started
+        self._finish = finish
+        self.chunks = []
+        self._finished = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def _record(self, data):
+        if data:
+            # latin-1 maps every byte to one character, so multi-byte characters split across chunks survive
+            self.chunks.append([round(time.monotonic() - self._started, 6), data.decode("latin-1")])
+        return data
+
+    def stream(self, amt=2 ** 16, decode_content=None):
+        for data in self._raw.stream(amt, decode_content=True):
+            yield self._record(data)
+        self._done(complete=True)
+
+    def read(self, amt=None, decode_content=None, **kwargs):
+        data = self._raw.read(amt, decode_content=True, **kwargs)
+        self._record(data)
+        if not data or amt is None:
+            self._done(complete=True)
+        return data
+
+    def close(self):
+        # Closing before the end, e.g. once a title has its line, records what was read so far
+        self._done(complete=False)
+        self._raw.close()
+
+    def _done(self, complete):
+        if not self._finished:
+            self._finished = True
+            self._finish(self.chunks, complete)
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Sends requests to Ollama as usual and records every exchange to a cassette"""
+
+    def __init__(self, cassette, **kwargs):
+        self.cassette = cassette
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        started = time.monotonic()
+        response = super().send(request, **kwargs)
+        headers_at = time.monotonic() - started
+
+        def finish(chunks, complete):
+            self.cassette.add({
+                "key": request_key(request.method, request.url, request.body),
+                "status": response.status_code,
+                "headers": {
+                    name: value for name, value in response.headers.items() if name.lower() not in DROPPED_HEADERS
+                },
+                "headers_at": round(headers_at, 6),
+                "chunks": chunks,
+                "complete": complete,
+            })
+
+        response.raw = _RecordingBody(response.raw, started, finish)
+        return response
+
+    def close(self):
+        super().close()
+        self.cassette.save()
+
+
+class _ReplayBody:
+    """Serves a recorded body, waiting for each chunk's recorded arrival time divided by speed"""
+
+    retries = None
+
+    def __init__(self, chunks, started, speed):
+        self._chunks = [(offset, data.encode("latin-1")) for offset, data in chunks]
+        self._started = started
+        self._speed = speed
+        self._buffer = b""
+        self.closed = False
+
+    def _next_chunk(self):
+        offset, data = self._chunks.pop(0)
+        if self._speed:
+            delay = self._started + offset / self._speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        return data
+
+    def stream(self, amt=2 ** 16, decode_content=None):
+        while self._chunks and not self.closed:
+            yield self._next_chunk()
+
+    def read(self, amt=None, decode_content=None, **kwargs):
+        while self._chunks and (amt is None or len(self._buffer) < amt):
+            self._buffer += self._next_chunk()
+        if amt is None:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:amt], self._buffer[amt:]
+        return data
+
+    def close(self):
+        self.closed = True
+
+    def release_conn(self):
+        pass
+
+
+class ReplayAdapter(BaseAdapter):
+    """Answers requests from a cassette without any network access.
+
+    speed 0 serves responses instantly; 1 reproduces the recorded latency and streaming
+    pace, 2 runs twice as fast.
+    """
+
+    def __init__(self, cassette, speed=0, **kwargs):
+        super().__init__()
+        self.cassette = cassette
+        self.speed = speed
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        started = time.monotonic()
+        key = request_key(request.method, request.url, request.body)
+        entry = self.cassette.next(key)
+        if entry is None:
+            raise CassetteMiss(
+                f"No recorded response for {key[:200]}; was the database restored to its state before recording?",
+                request=request,
+            )
+        if self.speed:
+            delay = started + entry["headers_at"] / self.speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.raw = _ReplayBody(entry["chunks"], started, self.speed)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+    def close(self):
+        pass
@@ -0,0 +1,8 @@
+from django.urls import path
+
+from properties import views
+
+urlpatterns = [
+    path('hotels/', views.hotel_list, name='hotel-list'),
+    path('hotels/<int:pk>/', views.hotel_detail, name='hotel-detail'),
+]
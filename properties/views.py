@@ -1,3 +1,136 @@
-from django.shortcuts import render
+import base64
+import hashlib
+import json
 
-# Create your views here.
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.utils.http import parse_etags, quote_etag
+from django.views.decorators.http import require_GET
+
+from properties.api_cache import city_page_key, hotel_key
+from properties.models import Hotel, HotelReview, HotelSummary
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def hotels_with_content():
+    """Hotels with their processing state, latest summary and latest review loaded in three queries"""
+    return Hotel.objects.select_related('processing_state').prefetch_related(
+        Prefetch('hotelsummary_set', queryset=HotelSummary.objects.order_by('-id'), to_attr='summaries'),
+        Prefetch('hotelreview_set', queryset=HotelReview.objects.order_by('-id'), to_attr='reviews'),
+    )
+
+
+def serialize_hotel(hotel):
+    summary = hotel.summaries[0] if hotel.summaries else None
+    review = hotel.reviews[0] if hotel.reviews else None
+    state = getattr(hotel, 'processing_state', None)
+    return {
+        'id': hotel.id,
+        'hotel_id': hotel.hotel_id,
+        'city_id': hotel.city_id,
+        'title': hotel.hotel_name,
+        'description': hotel.description,
+        'address': hotel.hotel_address,
+        'image': hotel.hotel_img,
+        'price': hotel.price,
+        'rating': hotel.rating,
+        'room_type': hotel.room_type,
+        'lat': hotel.lat,
+        'lng': hotel.lng,
+        'summary': summary and {
+            'text': summary.summary,
+            'prompt_version': summary.prompt_version,
+        },
+        'review': review and {
+            'text': review.review,
+            'rating': review.rating,
+            'prompt_version': review.prompt_version,
+        },
+        'processing': state and {
+            'status': state.status,
+            'model': state.model,
+            'finished_at': state.finished_at,
+        },
+    }
+
+
+def encode_cursor(hotel_id):
+    return base64.urlsafe_b64encode(str(hotel_id).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def cached_json(request, key, build):
+    """Serve a JSON body from the cache with an ETag, building and caching it on a miss.
+
+    build returns the payload, or None when the resource does not exist.
+    """
+    entry = cache.get(key)
+    if entry is None:
+        payload = build()
+        if payload is None:
+            return JsonResponse({'error': 'Not found'}, status=404)
+        body = json.dumps(payload, cls=DjangoJSONEncoder)
+        entry = {'etag': quote_etag(hashlib.md5(body.encode()).hexdigest()), 'body': body}
+        cache.set(key, entry)
+
+    if entry['etag'] in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(entry['body'], content_type='application/json')
+    response['ETag'] = entry['etag']
+    # Content changes whenever process_hotels runs, so clients revalidate with the ETag
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+@require_GET
+def hotel_detail(request, pk):
+    """A hotel with its generated title, description, latest summary and latest review"""
+    def build():
+        hotel = hotels_with_content().filter(pk=pk).first()
+        return serialize_hotel(hotel) if hotel is not None else None
+
+    return cached_json(request, hotel_key(pk), build)
+
+
+@require_GET
+def hotel_list(request):
+    """Hotels of one city ordered by id, paginated with an opaque cursor"""
+    try:
+        city_id = int(request.GET['city_id'])
+        limit = min(int(request.GET.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'city_id is required and city_id and limit must be integers'}, status=400)
+    if limit < 1:
+        return JsonResponse({'error': 'limit must be positive'}, status=400)
+
+    cursor = request.GET.get('cursor')
+    after_id = None
+    if cursor:
+        after_id = decode_cursor(cursor)
+        if after_id is None:
+            return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+    def build():
+        hotels = hotels_with_content().filter(city_id=city_id).order_by('id')
+        if after_id is not None:
+            hotels = hotels.filter(id__gt=after_id)
+        # Fetch one extra row to know whether there is a next page
+        page = list(hotels[:limit + 1])
+        next_cursor = encode_cursor(page[limit - 1].id) if len(page) > limit else None
+        return {
+            'results': [serialize_hotel(hotel) for hotel in page[:limit]],
+            'next_cursor': next_cursor,
+        }
+
+    return cached_json(request, city_page_key(city_id, cursor, limit), build)
@@ -0,0 +1,118 @@
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from properties.api_cache import invalidate_hotels
+from properties.models import Hotel, HotelSummary, HotelReview, HotelProcessingState
+from properties.prompts import FIELDS
+
+
+@dataclass
+class HotelResult:
+    """Content generated for one hotel, waiting to be written"""
+    hotel: Hotel
+    title: Optional[str] = None
+    description: Optional[str] = None
+    summary: Optional[str] = None
+    review: Optional[str] = None
+    rating: Optional[float] = None
+    error: Optional[str] = None
+    # Fields this run was asked to (re)generate, and the prompt template key of each one it generated
+    fields: Tuple[str, ...] = FIELDS
+    prompt_versions: Dict[str, str] = field(default_factory=dict)
+
+
+class BulkWriter:
+    """Buffer generated hotel content and write it in batches, one transaction per batch"""
+
+    def __init__(self, flush_size=50, track_state=True, metrics=None, on_flush=None):
+        self.flush_size = max(flush_size, 1)
+        self.track_state = track_state
+        self.metrics = metrics
+        # Called with each batch inside its transaction, so callers can commit related rows atomically
+        self.on_flush = on_flush
+        self._pending = []
+
+    def add(self, result):
+        self._pending.append(result)
+        if len(self._pending) >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        started = time.monotonic()
+        summaries = [
+            HotelSummary(
+                hotel=result.hotel, property_id=result.hotel.hotel_id, summary=result.summary,
+                prompt_version=result.prompt_versions.get('summary', ''),
+            )
+            for result in batch if result.summary
+        ]
+        reviews = [
+            HotelReview(
+                hotel=result.hotel, property_id=result.hotel.hotel_id, rating=result.rating, review=result.review,
+                prompt_version=result.prompt_versions.get('review', ''),
+            )
+            for result in batch if result.review
+        ]
+        changed_hotels = []
+        for result in batch:
+            if result.title:
+                result.hotel.hotel_name = result.title
+            if result.description:
+                result.hotel.description = result.description
+            if result.title or result.description:
+                changed_hotels.append(result.hotel)
+
+        with transaction.atomic():
+            # Each hotel has one summary and one review, so new content overwrites the old row
+            HotelSummary.objects.bulk_create(
+                summaries, update_conflicts=True, unique_fields=['hotel'],
+                update_fields=['property_id', 'summary', 'prompt_version'],
+            )
+            HotelReview.objects.bulk_create(
+                reviews, update_conflicts=True, unique_fields=['hotel'],
+                update_fields=['property_id', 'rating', 'review', 'prompt_version'],
+            )
+            if changed_hotels:
+                Hotel.objects.bulk_update(changed_hotels, ['hotel_name', 'description'])
+            if self.track_state:
+                self.finish_states(batch)
+            if self.on_flush is not None:
+                self.on_flush(batch)
+        # After the commit, so the API cannot re-cache the old content in between
+        invalidate_hotels(result.hotel for result in batch)
+        if self.metrics is not None:
+            self.metrics.record_db_write(time.monotonic() - started)
+
+    def finish_states(self, batch):
+        now = timezone.now()
+        done_ids = [result.hotel.id for result in batch if not result.error]
+        HotelProcessingState.objects.filter(hotel_id__in=done_ids).update(
+            status=HotelProcessingState.DONE, error='', finished_at=now
+        )
+        for result in batch:
+            if result.error:
+                HotelProcessingState.objects.filter(hotel_id=result.hotel.id).update(
+                    status=HotelProcessingState.FAILED, error=result.error, finished_at=now
+                )
+        self.record_prompt_versions(batch)
+
+    def record_prompt_versions(self, batch):
+        """Store which prompt template produced each field, so later runs only redo changed fields"""
+        results = {result.hotel.id: result for result in batch}
+        states = list(
+            HotelProcessingState.objects.filter(hotel_id__in=list(results)).only('id', 'hotel_id', 'field_versions')
+        )
+        for state in states:
+            result = results[state.hotel_id]
+            # Versions of requested fields that failed this time are dropped so the next run retries them
+            kept = {name: key for name, key in state.field_versions.items() if name not in result.fields}
+            state.field_versions = {**kept, **result.prompt_versions}
+        HotelProcessingState.objects.bulk_update(states, ['field_versions'])